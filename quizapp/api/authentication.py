@@ -0,0 +1,120 @@
+"""
+Token authentication which doesn't query the database for known tokens.
+
+Users of tokens are kept in a small in-process LRU and in the shared cache. Both are invalidated
+by api.signals when a token is deleted (logout) or its user is saved (password change, deactivation).
+The in-process LRU of other workers can't be reached, so they keep a user for TOKEN_AUTH_LOCAL_TIMEOUT
+seconds at most, keep it short.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from main_app import metrics
+
+# seconds, None or 0 disables the cache
+TOKEN_AUTH_CACHE_TIMEOUT = getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 5 * 60)
+TOKEN_AUTH_LOCAL_TIMEOUT = getattr(settings, 'TOKEN_AUTH_LOCAL_TIMEOUT', 30)
+TOKEN_AUTH_LOCAL_SIZE = getattr(settings, 'TOKEN_AUTH_LOCAL_SIZE', 1024)
+
+
+class LRUCache:
+    """Thread safe mapping of at most size items, each expiring timeout seconds after it was set."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.size or not self.timeout:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = LRUCache(TOKEN_AUTH_LOCAL_SIZE, TOKEN_AUTH_LOCAL_TIMEOUT)
+
+
+def _cache_key(key):
+    # tokens are credentials, so they are not put into the cache as is
+    return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _user_cache_key(user_id):
+    return f'auth_token_user:{user_id}'
+
+
+def _store(cache_key, token):
+    # the user's token is remembered as well, so saving the user invalidates it without a query
+    user_key = _user_cache_key(token.user_id)
+    _local_cache.set(cache_key, token)
+    _local_cache.set(user_key, cache_key)
+    if TOKEN_AUTH_CACHE_TIMEOUT:
+        cache.set_many({cache_key: token, user_key: cache_key}, TOKEN_AUTH_CACHE_TIMEOUT)
+
+
+def _invalidate(*keys):
+    for key in keys:
+        _local_cache.delete(key)
+    cache.delete_many(keys)
+
+
+def invalidate_token(key):
+    _invalidate(_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    user_key = _user_cache_key(user_id)
+    cache_key = _local_cache.get(user_key) or cache.get(user_key)
+    _invalidate(*filter(None, (cache_key, user_key)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement of TokenAuthentication, known tokens cost no queries."""
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        token = _local_cache.get(cache_key)
+        if token is None and TOKEN_AUTH_CACHE_TIMEOUT:
+            token = cache.get(cache_key)
+            if token is not None:
+                _local_cache.set(cache_key, token)
+        metrics.count_cache(token is not None)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            _store(cache_key, token)
+        # copies, so changes made by a view never leak into other requests
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
@@ -0,0 +1,14 @@
+from rest_framework import filters
+
+from main_app import search
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter served from the search index of tests (main_app.search) instead of icontains lookups.
+    Results are ordered by relevance unless ordering is given.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        return search.search(queryset, query)
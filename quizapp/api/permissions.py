@@ -10,22 +10,37 @@ class EmailIsConfirmed(permissions.BasePermission):
         return request.user.email_confirmed
 
 
+def owner_id(obj):
+    """Id of the owner of the test or of the test of the question, querysets of questions select the test."""
+    if isinstance(obj, Test):
+        return obj.owner_id
+    return obj.test.owner_id
+
+
+class OwnedObjectMixin:
+    """
+    Views checked by UserIsOwnerOrStaff: the object is loaded once, by the permission,
+    and the view gets the same instance from get_object().
+    """
+
+    def get_object(self):
+        if not hasattr(self, '_object'):
+            self._object = self.load_object()
+        return self._object
+
+    def load_object(self):
+        return super().get_object()
+
+
 class UserIsOwnerOrStaff(permissions.BasePermission):
     message = "Object doesn't exist or you are not the owner."
 
     def has_permission(self, request, view):
-        obj = view.get_object()
-        if not request.user.is_staff:
-            if isinstance(obj, Test):
-                return bool(request.user == obj.owner)
-            elif isinstance(obj, Questions):
-                return bool(request.user == obj.test.owner)
+        # runs has_object_permission()
+        view.get_object()
         return True
 
     def has_object_permission(self, request, view, obj):
-        if not request.user.is_staff:
-            if isinstance(obj, Test):
-                return bool(request.user == obj.owner)
-            elif isinstance(obj, Questions):
-                return bool(request.user == obj.test.owner)
+        if not request.user.is_staff and isinstance(obj, (Test, Questions)):
+            return owner_id(obj) == request.user.pk
         return True
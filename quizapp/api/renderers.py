@@ -0,0 +1,33 @@
+import json
+
+from rest_framework import renderers
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # errors, e.g. {'detail': 'Authentication credentials were not provided.'}
+            data = '\n'.join(f'# {k}: {v}' for k, v in data.items()) + '\n'
+        return data.encode(self.charset)
+
+
+class QuestionsFileRenderer(renderers.BaseRenderer):
+    """Questions are streamed by main_app.questions_bulk, only errors are rendered, as a JSON line."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data) + '\n').encode(self.charset)
+
+
+class CSVRenderer(QuestionsFileRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONLinesRenderer(QuestionsFileRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
@@ -1,15 +1,15 @@
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.sites.shortcuts import get_current_site
 from django.core import validators
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, smart_bytes, force_str
 from rest_framework.exceptions import AuthenticationFailed
 
-from main_app.models import Test, Questions, PassedTests
-from random import shuffle
+from main_app.mail import enqueue_email
+from main_app.models import Test, Questions, PassedTests, TestStats, QuestionStats
+from main_app.questions_bulk import QUESTIONS_IMPORT_LIMIT
 from rest_framework import serializers
 
 from users.models import CustomUser
@@ -27,13 +27,9 @@ def activate_email(user, request):
         'token': account_activation_token.make_token(user),
         'protocol': 'https' if request.is_secure() else 'http',
     })
-    email = EmailMessage(mail_subject, message, to=[user.email])
-    if email.send():
-        activate_email_message['message'] = f'Dear {user}, we sent activation link to your email ' \
-                                            f'{user.email}, please click on it to confirm and complete registration.'
-    else:
-        activate_email_message['message'] = f'A problem while sending verification link' \
-                                            f' to {user.email} occurred, check if you typed it correctly!'
+    enqueue_email(mail_subject, message, to=[user.email])
+    activate_email_message['message'] = f'Dear {user}, we sent activation link to your email ' \
+                                        f'{user.email}, please click on it to confirm and complete registration.'
 
 
 class TestSerializer(serializers.ModelSerializer):
@@ -64,23 +60,16 @@ class QuestionsSerializer(serializers.ModelSerializer):
 
 
 class PassTestSerializer(serializers.BaseSerializer):
+    """Question shuffled by main_app.scoring.shuffle_questions(), options are listed in the order they are shown."""
 
     def to_representation(self, instance):
-        questions = {}
-        for n, i in enumerate(instance, 1):
-            answers = [i.correct_answer, i.answer_1, i.answer_2, i.answer_3]
-            shuffle(answers)
-            questions_and_answers = {
-                'question': i.question,
-                'answer_1': answers.pop(),
-                'answer_2': answers.pop(),
-                'answer_3': answers.pop(),
-                'answer_4': answers.pop(),
-                'value': i.value
-            }
-            questions['question_' + str(n)] = questions_and_answers
-
-        return questions
+        return {
+            'id': instance.id,
+            'field': instance.field,
+            'question': instance.question,
+            'options': [option for _, _, option in instance.options],
+            'value': instance.value,
+        }
 
 
 class ContactUsSerializer(serializers.Serializer):
@@ -103,10 +92,58 @@ class UpdateDestroyQuestionsSerializer(serializers.ModelSerializer):
         read_only_fields = ('test',)
 
 
+class QuestionsBatchItemSerializer(serializers.Serializer):
+    """
+    Types of the fields of an upsert item, only the given ones are passed on. The questions themselves
+    are validated by main_app.questions_bulk.apply_questions_batch().
+    """
+    id = serializers.IntegerField(required=False, min_value=1)
+    question = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    correct_answer = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    answer_1 = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    answer_2 = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    answer_3 = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    value = serializers.IntegerField(required=False, allow_null=True)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and any(k not in self.fields for k in data):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Unknown keys, the keys are ' + ', '.join(self.fields) + '.']})
+        return super().to_internal_value(data)
+
+
+class QuestionsBatchSerializer(serializers.Serializer):
+    upsert = serializers.ListField(child=QuestionsBatchItemSerializer(), default=list,
+                                   max_length=QUESTIONS_IMPORT_LIMIT)
+    delete = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list,
+                                   max_length=QUESTIONS_IMPORT_LIMIT)
+
+
+class QuestionStatsSerializer(serializers.ModelSerializer):
+    text = serializers.CharField(source='question.question')
+
+    class Meta:
+        model = QuestionStats
+        fields = ('question', 'text', 'attempts', 'correct', 'correct_rate')
+
+
+class TestStatsSerializer(serializers.ModelSerializer):
+    questions = serializers.SerializerMethodField()
+
+    def get_questions(self, obj):
+        questions = QuestionStats.objects.filter(test=obj.test_id).select_related('question').order_by('question')
+        return QuestionStatsSerializer(questions, many=True).data
+
+    class Meta:
+        model = TestStats
+        fields = ('test', 'attempts', 'average_grade', 'median_grade', 'min_grade', 'max_grade', 'questions')
+
+
 class PassedTestsSerializer(serializers.ModelSerializer):
     class Meta:
         model = PassedTests
-        fields = '__all__'
+        # answers are shown by the result page of the attempt
+        exclude = ('answers',)
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -166,9 +203,7 @@ class RestorePasswordSerializer(serializers.Serializer):
                              f'{abs_url}' \
                              f"\n\nIf clicking the link above doesn't work, please copy and paste the URL in a new browser window instead." \
                              f"\n\nBest regards,\nQuizapp team."
-                email = EmailMessage(subject='Reset your password', body=email_body, to=[user.email])
-                if not email.send():
-                    print("Email wasn't sent because of reasons.")
+                enqueue_email(subject='Reset your password', body=email_body, to=[user.email])
         #     else:
         #         print(f'Email "{email}" was not sent because mail was never confirmed.')
         # else:
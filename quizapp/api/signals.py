@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cached_tokens(sender, instance, created, update_fields=None, **kwargs):
+    # e.g. a new password or is_active, cached tokens keep the old user; logins only update last_login
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user_tokens(instance.pk)
+    # once more after commit, other workers could cache the old user while the transaction was open
+    transaction.on_commit(lambda: invalidate_user_tokens(instance.pk))
@@ -1,8 +1,15 @@
+from unittest import mock
+
+from django.contrib import auth
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.test.client import Client
-from django.contrib import auth
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from api import authentication
+
 from users.models import CustomUser
 
 
@@ -112,3 +119,77 @@ class TokenAuthorizationTestCase(TestCase):
         self.assertEqual(400, resp.status_code)
         self.assertEqual('Unable to log in with provided credentials.', resp.data['non_field_errors'][0])
         self.assertEqual(1, len(resp.data['non_field_errors']))
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._local_cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='user',
+            email='user@test.com',
+            email_confirmed=True,
+            password='testpassword1!'
+        )
+        resp = self.client.post('/api/v1/auth/token/login/', data={'username': 'user', 'password': 'testpassword1!'})
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {resp.data["auth_token"]}'}
+
+    def get_token_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            resp = self.client.get(reverse('api:passed'), **self.headers)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(self.user, resp.wsgi_request.user)
+        return [q for q in context.captured_queries if 'authtoken_token' in q['sql']]
+
+    def test_known_token_costs_no_queries(self):
+        self.assertEqual(1, len(self.get_token_queries()))
+        self.assertEqual([], self.get_token_queries())
+        # other workers find it in the shared cache
+        authentication._local_cache.clear()
+        self.assertEqual([], self.get_token_queries())
+
+    def test_logout_invalidates_token(self):
+        self.get_token_queries()
+        resp = self.client.post('/api/v1/auth/token/logout/', **self.headers)
+        self.assertEqual(204, resp.status_code)
+        resp = self.client.get(reverse('api:passed'), **self.headers)
+        self.assertEqual(401, resp.status_code)
+        self.assertEqual('Invalid token.', resp.data['detail'])
+
+    def test_saving_user_invalidates_token(self):
+        self.get_token_queries()
+        resp = self.client.put(reverse('api:change_password'), content_type='application/json',
+                               data={'old_password': 'testpassword1!', 'new_password': 'testpassword2!'},
+                               **self.headers)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(1, len(self.get_token_queries()))
+        self.user.is_active = False
+        self.user.save()
+        resp = self.client.get(reverse('api:passed'), **self.headers)
+        self.assertEqual(401, resp.status_code)
+        self.assertEqual('User inactive or deleted.', resp.data['detail'])
+
+    def test_views_get_copies_of_cached_user(self):
+        first = self.client.get(reverse('api:passed'), **self.headers).wsgi_request.user
+        first.first_name = 'changed'
+        second = self.client.get(reverse('api:passed'), **self.headers).wsgi_request.user
+        self.assertNotEqual('changed', second.first_name)
+
+
+class LRUCacheTestCase(TestCase):
+    def test_keeps_last_used_items(self):
+        lru = authentication.LRUCache(2, 60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((1, None, 3), (lru.get('a'), lru.get('b'), lru.get('c')))
+
+    def test_items_expire(self):
+        lru = authentication.LRUCache(2, 60)
+        with mock.patch('api.authentication.time.monotonic', return_value=0):
+            lru.set('a', 1)
+        with mock.patch('api.authentication.time.monotonic', return_value=59):
+            self.assertEqual(1, lru.get('a'))
+        with mock.patch('api.authentication.time.monotonic', return_value=60):
+            self.assertIsNone(lru.get('a'))
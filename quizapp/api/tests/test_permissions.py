@@ -0,0 +1,59 @@
+from django.http import Http404
+from django.test import TestCase
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import TestQuestionsCreateAPIView, UpdateDestroyQuestionsAPIView, UpdateDestroyTestAPIView
+from main_app.models import Questions, Test
+from users.models import CustomUser
+
+
+class UserIsOwnerOrStaffTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.user = CustomUser.objects.create_user(username='user2', email='u2@test.com', password='testpassword1!')
+        cls.staff = CustomUser.objects.create_user(username='staff', email='s@test.com', password='testpassword1!',
+                                                   is_staff=True)
+        cls.test = Test.objects.create(name='test1', owner=cls.owner)
+        cls.question = Questions.objects.create(question='why', correct_answer='because', answer_1='idk',
+                                                test=cls.test)
+
+    def view(self, view_class, user, pk):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user)
+        view = view_class()
+        view.setup(request, pk=pk)
+        view.request = view.initialize_request(request)
+        view.format_kwarg = None
+        return view
+
+    def test_ownership_is_checked_with_one_query(self):
+        for view_class, pk in ((UpdateDestroyTestAPIView, self.test.pk),
+                               (TestQuestionsCreateAPIView, self.test.pk),
+                               (UpdateDestroyQuestionsAPIView, self.question.pk)):
+            with self.subTest(view=view_class.__name__):
+                view = self.view(view_class, self.owner, pk)
+                with self.assertNumQueries(1):
+                    view.check_permissions(view.request)
+                with self.assertNumQueries(0):
+                    obj = view.get_object()
+                self.assertEqual(pk, obj.pk)
+
+    def test_not_owner_is_denied(self):
+        for view_class, pk in ((UpdateDestroyTestAPIView, self.test.pk),
+                               (TestQuestionsCreateAPIView, self.test.pk),
+                               (UpdateDestroyQuestionsAPIView, self.question.pk)):
+            with self.subTest(view=view_class.__name__):
+                view = self.view(view_class, self.user, pk)
+                with self.assertNumQueries(1), self.assertRaises(PermissionDenied):
+                    view.check_permissions(view.request)
+                view = self.view(view_class, self.staff, pk)
+                view.check_permissions(view.request)
+
+    def test_missing_object_is_not_found(self):
+        for view_class in (UpdateDestroyTestAPIView, TestQuestionsCreateAPIView, UpdateDestroyQuestionsAPIView):
+            with self.subTest(view=view_class.__name__):
+                view = self.view(view_class, self.owner, 1000)
+                with self.assertRaises(Http404):
+                    view.check_permissions(view.request)
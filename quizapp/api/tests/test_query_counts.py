@@ -0,0 +1,125 @@
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from main_app.models import Questions
+from main_app.tests.utils import QueryCountMixin, cached_sessions, get_streamed, seed_catalog, submission
+from rest_framework.authtoken.models import Token
+from users.models import CustomUser
+from users.tokens import account_activation_token
+
+
+@cached_sessions()
+class APIQueryCountTestCase(QueryCountMixin, TestCase):
+    """Number of queries of every endpoint with 50 tests, 30 questions each and 100 results."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.user, cls.test = seed_catalog()
+        cls.question = Questions.objects.filter(test=cls.test).first()
+        cls.uid = urlsafe_base64_encode(force_bytes(cls.owner.pk))
+        cls.answers = submission(cls.test.pk, ['yes'] * 30)
+
+    def setUp(self):
+        cache.clear()
+
+    def check(self, cases):
+        for limit, method, url, data in cases:
+            with self.subTest(url=url, method=method, data=data):
+                resp = self.assertMaxQueries(limit, getattr(self.client, method), url, data,
+                                             content_type='application/json')
+                self.assertLess(resp.status_code, 400, resp.content)
+
+    def test_anonymous_endpoints(self):
+        pk = {'pk': self.test.pk}
+        self.check([
+            (1, 'get', reverse('api:tests'), {}),
+            (1, 'get', reverse('api:tests') + '?ordering=name', None),
+            (1, 'get', reverse('api:tests') + '?search=test1', None),
+            (1, 'get', reverse('api:pass', kwargs=pk), None),
+            # savepoint, the result, test and question statistics, release
+            (6, 'post', reverse('api:pass', kwargs=pk), self.answers),
+            (2, 'post', reverse('api:contacts'), {'name': 'user', 'email': 'user@test.com', 'message': 'hello'}),
+            (5, 'post', reverse('api:create_user'), {
+                'username': 'new', 'email': 'new@test.com', 'password': 'testpassword1!'}),
+            (5, 'post', reverse('api:activate', kwargs={
+                'uidb64': self.uid, 'token': account_activation_token.make_token(self.owner)}), None),
+            (4, 'post', reverse('api:password_reset'), {'email': 'owner@test.com'}),
+            (1, 'post', reverse('api:password_reset_confirm', kwargs={
+                'uidb64': self.uid, 'token': PasswordResetTokenGenerator().make_token(self.owner)}), None),
+            (5, 'post', reverse('api:password_reset_complete'), {
+                'uidb64': self.uid, 'token': PasswordResetTokenGenerator().make_token(self.owner),
+                'password': 'testpassword2!'}),
+        ])
+
+    def test_owner_endpoints(self):
+        self.client.force_login(self.owner)
+        pk = {'pk': self.test.pk}
+        self.check([
+            (3, 'get', reverse('api:tests_my'), None),
+            (3, 'get', reverse('api:passed'), None),
+            (6, 'post', reverse('api:tests_create'), {'name': 'new test'}),
+            (2, 'get', reverse('api:tests_update', kwargs=pk), None),
+            (6, 'patch', reverse('api:tests_update', kwargs=pk), {'description': 'new description'}),
+            (4, 'get', reverse('api:tests_questions', kwargs=pk), None),
+            (4, 'get', reverse('api:tests_stats', kwargs=pk), None),
+            (2, 'get', reverse('api:questions_update', kwargs={'pk': self.question.pk}), None),
+            (4, 'patch', reverse('api:questions_update', kwargs={'pk': self.question.pk}), {'value': 2}),
+            (3, 'get', reverse('api:pass', kwargs=pk), None),
+            (8, 'post', reverse('api:pass', kwargs=pk), self.answers),
+            (5, 'post', reverse('api:tests_questions', kwargs=pk), {
+                'question': 'new', 'correct_answer': 'yes', 'answer_1': 'no', 'test': self.test.pk}),
+            (11, 'post', reverse('api:tests_questions_batch', kwargs=pk), {
+                'upsert': [{'id': self.question.pk, 'value': 2}, {
+                    'question': 'batch', 'correct_answer': 'yes', 'answer_1': 'no'}]}),
+            (3, 'get', reverse('api:update_user'), None),
+            (7, 'patch', reverse('api:update_user'), {'first_name': 'owner'}),
+            (6, 'put', reverse('api:change_password'), {
+                'old_password': 'testpassword1!', 'new_password': 'testpassword2!'}),
+        ])
+
+    def test_token_endpoints(self):
+        headers = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.owner).key}'}
+        pk = {'pk': self.test.pk}
+        # the first request caches the token and the answer key
+        self.client.get(reverse('api:pass', kwargs=pk), **headers)
+        for limit, url in ((0, reverse('api:pass', kwargs=pk)), (1, reverse('api:tests')),
+                           (1, reverse('api:tests_my')), (1, reverse('api:passed'))):
+            with self.subTest(url=url):
+                resp = self.assertMaxQueries(limit, self.client.get, url, **headers)
+                self.assertEqual(200, resp.status_code)
+
+    def test_next_pages(self):
+        self.client.force_login(self.owner)
+        for name, limit in (('api:tests', 3), ('api:tests_my', 3), ('api:passed', 3)):
+            url = self.client.get(reverse(name)).data['next']
+            self.check([(limit, 'get', url, None)])
+
+    def test_metrics_endpoint(self):
+        staff = CustomUser.objects.create_user(username='staff', email='staff@test.com', password='testpassword1!',
+                                               is_staff=True)
+        self.client.force_login(staff)
+        for _ in range(2):
+            # only the user, however many requests the counters hold
+            resp = self.assertMaxQueries(1, self.client.get, reverse('api:metrics'))
+            self.assertEqual(200, resp.status_code)
+
+    def test_bulk_questions_endpoint(self):
+        self.client.force_login(self.owner)
+        url = reverse('api:tests_questions_bulk', kwargs={'pk': self.test.pk})
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(format=fmt):
+                # the questions are read while the response is streamed
+                resp, content = self.assertMaxQueries(3, get_streamed, self.client, url, {'format': fmt})
+                self.assertEqual(200, resp.status_code)
+                self.assertEqual(30 + (fmt == 'csv'), len(content.decode().splitlines()))
+        content = 'question,correct_answer,answer_1\n' + ''.join(f'imported{n},yes,no\n' for n in range(100))
+        # the 130 questions of the test are deleted 100 per query
+        for limit, replace in ((8, False), (11, True)):
+            with self.subTest(replace=replace):
+                resp = self.assertMaxQueries(limit, self.client.post, url, {
+                    'file': SimpleUploadedFile('questions.csv', content.encode()), 'replace': replace})
+                self.assertEqual(201, resp.status_code, resp.content)
@@ -3,6 +3,7 @@ from django.test import TestCase
 from api.serializers import TestSerializer, CreateTestSerializer, UpdateTestSerializer, QuestionsSerializer, \
     PassTestSerializer, ContactUsSerializer, UpdateDestroyQuestionsSerializer, PassedTestsSerializer
 from main_app.models import Categories, Test, Questions, PassedTests
+from main_app.scoring import load_answer_key, shuffle_questions
 from users.models import CustomUser
 
 
@@ -160,27 +161,13 @@ class PassTestSerializerTestCase(TestCase):
         self.question2 = Questions.objects.create(**data2)
 
     def test_to_representation(self):
-        questions = Questions.objects.filter(test=self.test.pk)
-        self.maxDiff = None
-        serialized_data = PassTestSerializer(questions).data
-        expected_data = {
-            'question_1': {
-                'question': '2 + 1',
-                'answers': ['26', '10', '23', '3'],
-                'value': 4},
-            'question_2': {
-                'question': '2 + 6',
-                'answers': ['26', '10', '23', '8'],
-                'value': 4}}
-        self.assertEqual(expected_data['question_1']['question'], serialized_data['question_1']['question'])
-        self.assertEqual(expected_data['question_1']['value'], serialized_data['question_1']['value'])
-        for i in serialized_data['question_1']:
-            if i.startswith('answer'):
-                self.assertTrue(serialized_data['question_1'][i] in expected_data['question_1']['answers'])
-
-        for i in serialized_data['question_2']:
-            if i.startswith('answer'):
-                self.assertTrue(serialized_data['question_2'][i] in expected_data['question_2']['answers'])
+        questions = shuffle_questions(load_answer_key(self.test.pk), 3)
+        serialized_data = PassTestSerializer(questions, many=True).data
+        self.assertEqual([(self.question.pk, f'q{self.question.pk}', '2 + 6', 4),
+                          (self.question2.pk, f'q{self.question2.pk}', '2 + 1', 4)],
+                         [(q['id'], q['field'], q['question'], q['value']) for q in serialized_data])
+        self.assertEqual(['10', '23', '26', '8'], sorted(serialized_data[0]['options']))
+        self.assertEqual([o for _, _, o in questions[1].options], serialized_data[1]['options'])
 
 
 class ContactUsSerializerTestCase(TestCase):
@@ -1,9 +1,14 @@
+import json
 import random
+import time
 
 from django.contrib import auth
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from django.core import mail
 from main_app.models import Categories, Test, Questions, PassedTests
+from main_app.tests.utils import cached_sessions, submission
 from users.models import CustomUser
 from django.urls import reverse
 from django.test.client import Client
@@ -69,13 +74,14 @@ class TestAPIViewTestCase(TestCase):
         self.assertEqual(10, len(resp.data['results']))
 
     def test_three_tests_in_second_page_of_pagination(self):
-        resp = self.client.get(reverse('api:tests') + '?page=2')
+        resp = self.client.get(reverse('api:tests'))
+        resp = self.client.get(resp.data['next'])
         self.assertEqual(200, resp.status_code)
         self.assertEqual(3, len(resp.data['results']))
 
     def test_test0_not_in_queryset_cause_its_private(self):
         resp = self.client.get(reverse('api:tests'))
-        resp_2 = self.client.get(reverse('api:tests') + '?page=2')
+        resp_2 = self.client.get(resp.data['next'])
         t0 = Test.objects.get(name='test0')
         self.assertEqual(200, resp.status_code)
         self.assertFalse(t0 in resp.data['results'])
@@ -83,7 +89,7 @@ class TestAPIViewTestCase(TestCase):
 
     def test_test4_not_in_queryset_cause_it_doesnt_have_any_questions(self):
         resp = self.client.get(reverse('api:tests'))
-        resp_2 = self.client.get(reverse('api:tests') + '?page=2')
+        resp_2 = self.client.get(resp.data['next'])
         t4 = Test.objects.get(name='test4')
         self.assertEqual(200, resp.status_code)
         self.assertFalse(t4 in resp.data['results'])
@@ -187,6 +193,31 @@ class ContactViewTestCase(TestCase):
         self.assertEqual(1, len(mail.outbox))
 
 
+class MetricsAPIViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='user', email='user@test.com', password='password!@#')
+        cls.staff = CustomUser.objects.create_user(username='staff', email='staff@test.com', password='password!@#',
+                                                   is_staff=True)
+
+    def test_anonymous_and_not_staff_users_are_denied(self):
+        resp = self.client.get(reverse('api:metrics'))
+        self.assertIn(resp.status_code, (401, 403))
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse('api:metrics'))
+        self.assertEqual(403, resp.status_code)
+        self.assertNotIn(b'quizapp_requests_total', resp.content)
+
+    def test_staff_gets_prometheus_text(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('api:tests'))
+        resp = self.client.get(reverse('api:metrics'))
+        self.assertEqual(200, resp.status_code)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'# TYPE quizapp_requests_total counter', resp.content)
+        self.assertIn(b'quizapp_requests_total{view="api:tests",method="GET",status="2xx"}', resp.content)
+
+
 class MyTestsAPIViewTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -252,12 +283,14 @@ class MyTestsAPIViewTestCase(TestCase):
 
     def test_5_tests_in_second_page_of_pagination(self):
         self.client.force_login(user=self.u1)
-        resp = self.client.get(reverse('api:tests_my') + '?page=2')
+        resp = self.client.get(reverse('api:tests_my'))
+        resp = self.client.get(resp.data['next'])
         self.assertEqual(200, resp.status_code)
         self.assertEqual(5, len(resp.data['results']))
         self.client.logout()
         self.client.force_login(user=self.u2)
-        resp2 = self.client.get(reverse('api:tests_my') + '?page=2')
+        resp2 = self.client.get(reverse('api:tests_my'))
+        resp2 = self.client.get(resp2.data['next'])
         self.assertEqual(200, resp2.status_code)
         # 5 cause test without questions are showed in "my_tests" too
         self.assertEqual(5, len(resp2.data['results']))
@@ -580,6 +613,97 @@ class TestQuestionsCreateAPIViewTestCase(TestCase):
         self.assertEqual('Invalid pk "150" - object does not exist.', resp.data['test'][0])
 
 
+class BulkQuestionsAPIViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u1 = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        self.u2 = CustomUser.objects.create_user(username='user2', email='u2@test.com', password='testpassword1!')
+        self.test = Test.objects.create(name='test1', owner=self.u1)
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.test)
+        self.url = reverse('api:tests_questions_bulk', kwargs={'pk': self.test.pk})
+
+    def test_owner_exports_questions(self):
+        self.client.force_login(user=self.u1)
+        resp = self.client.get(self.url)
+        self.assertEqual('text/csv; charset=utf-8', resp['Content-Type'])
+        self.assertEqual(b'question,correct_answer,answer_1,answer_2,answer_3,value\r\nwhy,because,idk,,,1\r\n',
+                         b''.join(resp.streaming_content))
+        resp = self.client.get(self.url, {'format': 'jsonl'})
+        self.assertEqual('why', json.loads(b''.join(resp.streaming_content))['question'])
+
+    def test_owner_imports_questions(self):
+        self.client.force_login(user=self.u1)
+        file = SimpleUploadedFile('q.jsonl', b'{"question": "how", "correct_answer": "so", "answer_1": "idk"}\n')
+        resp = self.client.post(self.url, {'file': file, 'replace': 'true'})
+        self.assertEqual(201, resp.status_code)
+        self.assertEqual({'created': 1}, resp.data)
+        self.assertEqual(['how'], list(Questions.objects.values_list('question', flat=True)))
+
+    def test_invalid_file_cause_errors(self):
+        self.client.force_login(user=self.u1)
+        resp = self.client.post(self.url, {'file': SimpleUploadedFile('q.csv', b'question,correct_answer,answer_1\n'
+                                                                               b'why,because,idk\n')})
+        self.assertEqual(400, resp.status_code)
+        self.assertEqual([{'line': 2, 'error': 'The question is already in the test.'}], resp.data['errors'])
+        resp = self.client.post(self.url, {'file': SimpleUploadedFile('q.txt', b'why')})
+        self.assertEqual(400, resp.status_code)
+        self.assertEqual('Upload a .csv or .jsonl file.', resp.data['file'][0])
+
+    def test_not_owner_doesnt_have_access_to_questions(self):
+        self.client.force_login(user=self.u2)
+        self.assertEqual(403, self.client.get(self.url).status_code)
+        resp = self.client.post(self.url, {'file': SimpleUploadedFile('q.csv', b'question\n')})
+        self.assertEqual(403, resp.status_code)
+
+
+class QuestionsBatchAPIViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u1 = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        self.u2 = CustomUser.objects.create_user(username='user2', email='u2@test.com', password='testpassword1!')
+        self.test = Test.objects.create(name='test1', owner=self.u1)
+        self.q1 = Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.test)
+        self.url = reverse('api:tests_questions_batch', kwargs={'pk': self.test.pk})
+
+    def test_owner_changes_questions(self):
+        self.client.force_login(user=self.u1)
+        resp = self.client.post(self.url, {'upsert': [{'question': 'how', 'correct_answer': 'so', 'answer_1': 'idk'}],
+                                           'delete': [self.q1.pk]}, content_type='application/json')
+        self.assertEqual(200, resp.status_code)
+        q = Questions.objects.get()
+        self.assertEqual({'upsert': [{'id': q.pk, 'status': 'created'}],
+                          'delete': [{'id': self.q1.pk, 'status': 'deleted'}]}, resp.data)
+
+    def test_invalid_items_cause_errors(self):
+        self.client.force_login(user=self.u1)
+        resp = self.client.post(self.url, {'upsert': [{'id': self.q1.pk, 'value': 2}, {'question': 'why'}]},
+                                content_type='application/json')
+        self.assertEqual(400, resp.status_code)
+        self.assertEqual({}, resp.data['upsert'][0])
+        self.assertIn('correct_answer', resp.data['upsert'][1])
+        self.assertEqual(1, Questions.objects.get().value)
+        resp = self.client.post(self.url, {'upsert': {'question': 'why'}}, content_type='application/json')
+        self.assertEqual(400, resp.status_code)
+        self.assertIn('upsert', resp.data)
+
+    def test_items_of_wrong_types_cause_errors(self):
+        self.client.force_login(user=self.u1)
+        for item, field in (({'id': [self.q1.pk]}, 'id'), ({'id': self.q1.pk, 'question': {'x': 1}}, 'question'),
+                            ({'id': self.q1.pk, 'value': 'many'}, 'value'), ({'id': self.q1.pk, 'x': 1},
+                                                                            'non_field_errors')):
+            with self.subTest(item=item):
+                resp = self.client.post(self.url, {'upsert': [item]}, content_type='application/json')
+                self.assertEqual(400, resp.status_code)
+                self.assertIn(field, resp.data['upsert'][0])
+        self.assertEqual('why', Questions.objects.get().question)
+
+    def test_not_owner_doesnt_have_access_to_questions(self):
+        self.client.force_login(user=self.u2)
+        resp = self.client.post(self.url, {'delete': [self.q1.pk]}, content_type='application/json')
+        self.assertEqual(403, resp.status_code)
+        self.assertTrue(Questions.objects.exists())
+
+
 class PassTestAPITestCase(TestCase):
 
     @classmethod
@@ -606,6 +730,8 @@ class PassTestAPITestCase(TestCase):
                     test=t)
 
     def setUp(self):
+        # answer keys are cached, and the cache outlives rolled back test data
+        cache.clear()
         self.u1 = CustomUser.objects.get(username='user1')
         self.u2 = CustomUser.objects.create_user(
             username='user2',
@@ -646,30 +772,118 @@ class PassTestAPITestCase(TestCase):
 
     def test_correct_answers_increase_score(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'question_1': 'correct_answer', 'question_2': 'correct_answer'}
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
         resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
         self.assertEqual(100.0, resp.data['results']['grade'])
         self.assertEqual(2, resp.data['results']['correct_answers'])
-        self.assertTrue(data['question_1'] == resp.data['question_1']['your_answer'])
-        self.assertTrue(data['question_2'] == resp.data['question_2']['your_answer'])
+        self.assertEqual(['correct_answer', 'correct_answer'], [q['your_answer'] for q in resp.data['questions']])
 
     def test_incorrect_answers_doesnt_increase_score(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'question_1': 'correct_answer', 'question_2': 'asd'}
+        data = submission(self.t1.pk, ['correct_answer', None])
         resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
         self.assertEqual(50.0, resp.data['results']['grade'])
         self.assertEqual(1, resp.data['results']['correct_answers'])
-        self.assertTrue(data['question_1'] == resp.data['question_1']['your_answer'])
-        self.assertTrue(data['question_2'] == resp.data['question_2']['your_answer'])
+        self.assertEqual(['correct_answer', None], [q['your_answer'] for q in resp.data['questions']])
 
     def test_context_is_reduced_if_not_show_results(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'question_1': 'correct_answer', 'question_2': 'correct_answer'}
+        data = submission(self.t4.pk, ['correct_answer', 'correct_answer'])
         resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t4.pk}), data=data)
-        self.assertFalse('question_1' in resp.data)
-        self.assertFalse('question_2' in resp.data)
+        self.assertFalse('questions' in resp.data)
         self.assertEqual(100.0, resp.data['results']['grade'])
 
+    def test_answers_after_ninth_question_are_scored(self):
+        for q in range(2, 12):
+            Questions.objects.create(question='why' + str(q), correct_answer='correct_answer',
+                                     answer_1='wrong_answer1', value=q, test=self.t1)
+        data = submission(self.t1.pk, ['correct_answer'] * 11 + ['wrong_answer1'])
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
+        self.assertEqual(11, resp.data['results']['correct_answers'])
+        self.assertEqual(56, resp.data['results']['scored'])
+        self.assertEqual(67, resp.data['results']['max_result'])
+        self.assertEqual('correct_answer', resp.data['questions'][10]['your_answer'])
+        self.assertEqual('why11', resp.data['questions'][11]['question'])
+
+    def test_shown_options_are_submitted_by_index(self):
+        resp = self.client.get(reverse('api:pass', kwargs={'pk': self.t1.pk}))
+        data = {'attempt': resp.data['attempt']}
+        for q in resp.data['questions']:
+            data[q['field']] = q['options'].index('correct_answer')
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data,
+                                content_type='application/json')
+        self.assertEqual(2, resp.data['results']['correct_answers'])
+
+    def test_duration_is_measured_by_the_server(self):
+        self.client.force_login(user=self.u2)
+        data = submission(self.t1.pk, ['correct_answer', None], started=time.time() - 42)
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
+        self.assertEqual(42, resp.data['results']['duration'])
+        self.assertEqual(42, PassedTests.objects.get(user=self.u2).duration)
+
+    def test_submission_without_attempt_is_rejected(self):
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        del data['attempt']
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
+        self.assertEqual(400, resp.status_code)
+        self.assertFalse(PassedTests.objects.filter(test=self.t1).exists())
+
+    @cached_sessions()
+    def test_submission_makes_fixed_number_of_queries(self):
+        self.client.force_login(user=self.u2)
+        # answer key is cached and statistics rows are created by the first submission
+        self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=submission(self.t1.pk, ['correct_answer']))
+        data = submission(self.t1.pk, ['correct_answer', None])
+        # user (the session is cached), savepoint, insert of the result, select for update and update
+        # of test statistics, update of questions statistics, release savepoint
+        with self.assertNumQueries(7):
+            resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(2, PassedTests.objects.filter(user=self.u2, test=self.t1).count())
+
+    def test_resubmitted_attempt_returns_the_saved_result(self):
+        self.client.force_login(user=self.u2)
+        data = submission(self.t1.pk, ['correct_answer', None])
+        first = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=data)
+        changed = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        changed['attempt'] = data['attempt']
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t1.pk}), data=changed)
+        self.assertEqual(first.data['results'], resp.data['results'])
+        self.assertEqual(1, resp.data['results']['correct_answers'])
+        self.assertEqual(1, PassedTests.objects.filter(user=self.u2, test=self.t1).count())
+
+
+class TestStatsAPIViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.u1 = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        self.u2 = CustomUser.objects.create_user(username='user2', email='u2@test.com', password='testpassword1!')
+        self.test = Test.objects.create(name='test1', owner=self.u1)
+        self.q1 = Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.test)
+
+    def test_owner_gets_statistics(self):
+        self.client.force_login(user=self.u2)
+        self.client.post(reverse('api:pass', kwargs={'pk': self.test.pk}), data=submission(self.test.pk, ['because']))
+        self.client.force_login(user=self.u1)
+        resp = self.client.get(reverse('api:tests_stats', kwargs={'pk': self.test.pk}))
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(1, resp.data['attempts'])
+        self.assertEqual(100, resp.data['median_grade'])
+        self.assertEqual([{'question': self.q1.pk, 'text': 'why', 'attempts': 1, 'correct': 1, 'correct_rate': 100}],
+                         resp.data['questions'])
+
+    def test_statistics_of_not_passed_test_are_empty(self):
+        self.client.force_login(user=self.u1)
+        resp = self.client.get(reverse('api:tests_stats', kwargs={'pk': self.test.pk}))
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(0, resp.data['attempts'])
+        self.assertEqual([], resp.data['questions'])
+
+    def test_not_owner_doesnt_have_access_to_statistics(self):
+        self.client.force_login(user=self.u2)
+        resp = self.client.get(reverse('api:tests_stats', kwargs={'pk': self.test.pk}))
+        self.assertEqual(403, resp.status_code)
+
 
 class UpdateDestroyQuestionsAPIViewTestCase(TestCase):
     def setUp(self):
@@ -837,10 +1051,10 @@ class PassedTestsAPIViewTestCase(TestCase):
         resp = self.client.get(reverse('api:passed'))
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(10, len(resp.data['results']))
-        resp2 = self.client.get(reverse('api:passed') + '?page=2')
+        resp2 = self.client.get(resp.data['next'])
         self.assertEqual(resp2.status_code, 200)
         self.assertEqual(10, len(resp2.data['results']))
-        resp3 = self.client.get(reverse('api:passed') + '?page=3')
+        resp3 = self.client.get(resp2.data['next'])
         self.assertEqual(resp3.status_code, 200)
         self.assertEqual(1, len(resp3.data['results']))
 
@@ -877,7 +1091,7 @@ class PassedTestsAPIViewTestCase(TestCase):
     def test_ordering_by_grade_reversed_returns_correct_order(self):
         resp = self.client.get(reverse('api:passed'), {'ordering': '-grade'})
         max_grade = max(PassedTests.objects.values_list('grade', flat=True))
-        t = PassedTests.objects.filter(grade=max_grade)[0]
+        t = PassedTests.objects.filter(grade=max_grade).order_by('-pk')[0]
         self.assertEqual(200, resp.status_code)
         self.assertEqual(t.id, resp.data['results'][0]['id'])
 
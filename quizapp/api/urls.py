@@ -9,11 +9,15 @@ urlpatterns = [
     path('v1/tests/create/', CreateTestAPIView.as_view(), name='tests_create'),
     path('v1/tests/<int:pk>/', UpdateDestroyTestAPIView.as_view(), name='tests_update'),
     path('v1/tests/<int:pk>/questions/', TestQuestionsCreateAPIView.as_view(), name='tests_questions'),
+    path('v1/tests/<int:pk>/questions/bulk/', BulkQuestionsAPIView.as_view(), name='tests_questions_bulk'),
+    path('v1/tests/<int:pk>/questions/batch/', QuestionsBatchAPIView.as_view(), name='tests_questions_batch'),
     path('v1/tests/<int:pk>/pass/', pass_test, name='pass'),
+    path('v1/tests/<int:pk>/stats/', TestStatsAPIView.as_view(), name='tests_stats'),
     path('v1/tests/passed/', PassedTestsAPIView.as_view(), name='passed'),
     path('v1/questions/<int:pk>/', UpdateDestroyQuestionsAPIView.as_view(), name='questions_update'),
 
     path('v1/contacts/', contact_us, name='contacts'),
+    path('v1/metrics/', metrics, name='metrics'),
 
     path('v1/activate/<uidb64>/<token>/', activate, name='activate'),
 
@@ -4,22 +4,31 @@ from django.utils.encoding import smart_str, DjangoUnicodeDecodeError, force_str
 from django.utils.http import urlsafe_base64_decode
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, filters, status, mixins
-from rest_framework.decorators import api_view
-from rest_framework.generics import GenericAPIView, UpdateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.generics import GenericAPIView, UpdateAPIView, get_object_or_404
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from quizapp.local_settings import EMAIL_FROM
-from django.core.mail import EmailMessage
 
 from users.models import CustomUser
 from users.tokens import account_activation_token
-from .permissions import EmailIsConfirmed, UserIsOwnerOrStaff
+from .filters import FullTextSearchFilter
+from .pagination import KeysetCursorPagination
+from .renderers import PrometheusRenderer, CSVRenderer, JSONLinesRenderer
+from .permissions import EmailIsConfirmed, UserIsOwnerOrStaff, OwnedObjectMixin
 
 from .serializers import TestSerializer, CreateTestSerializer, UpdateTestSerializer, QuestionsSerializer, \
     PassTestSerializer, UpdateDestroyQuestionsSerializer, PassedTestsSerializer, CreateUserSerializer, \
     UpdateUserSerializer, ChangePasswordSerializer, RestorePasswordSerializer, SetNewPasswordSerializer, \
-    ContactUsSerializer
-from main_app.models import Test, Questions, PassedTests
+    ContactUsSerializer, TestStatsSerializer, QuestionsBatchSerializer
+from main_app import metrics as request_metrics
+from main_app.mail import enqueue_email
+from main_app.models import Test, Questions, PassedTests, TestStats
+from main_app.questions_bulk import export_response, file_format, import_questions, apply_questions_batch
+from main_app.scoring import get_answer_key, access_error, shuffle_questions, start_attempt, sign_attempt, \
+    read_attempt, read_choices, submit_attempt, result_questions, InvalidSubmission
 
 
 @api_view(['POST'])
@@ -43,19 +52,27 @@ def activate(request, uidb64, token):
 
 class TestAPIView(generics.ListAPIView):
     serializer_class = TestSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetCursorPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
 
     filterset_fields = ['id', 'name', 'description', 'category__name', 'owner__username', 'show_results']
+    # documents of main_app.search index, shown in the browsable API
     search_fields = ['name', 'description', 'category__name', 'owner__username']
     ordering_fields = ['name', 'category__name', 'owner__username', 'time_create', 'time_update']
 
     def get_queryset(self):
-        tests_with_questions = [b[0] for b in [q for q in Questions.objects.values_list('test').distinct()]]
-        return Test.objects.filter(pk__in=tests_with_questions, is_public=True).select_related('category',
-                                                                                               'owner').order_by(
+        return Test.objects.with_questions().filter(is_public=True).select_related('category', 'owner').order_by(
             '-time_update')
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([PrometheusRenderer])
+def metrics(request):
+    # counters of the process which served the request, scrape every worker to get all of them
+    return Response(request_metrics.render_prometheus())
+
+
 @api_view(['POST'])
 def contact_us(request):
     data = {}
@@ -68,18 +85,15 @@ def contact_us(request):
     if serializer.is_valid():
         mail_subject = f'A Message from Quizapp Contact Us Form'
         message = f"Sender's name: {serializer.data['name']}, sender's email: {serializer.data['email']}\nMessage:\n{serializer.data['message']}"
-        email = EmailMessage(mail_subject, message, to=[EMAIL_FROM])
-        if email.send():
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        else:
-            return Response({'message': "Mail wasn't sent, we are working on fixing this issue."},
-                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        enqueue_email(mail_subject, message, to=[EMAIL_FROM])
+        return Response(serializer.data, status=status.HTTP_200_OK)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class MyTestsAPIView(generics.ListAPIView):
     serializer_class = TestSerializer
+    pagination_class = KeysetCursorPagination
     permission_classes = (IsAuthenticated,)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
@@ -99,7 +113,7 @@ class CreateTestAPIView(generics.CreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class UpdateDestroyTestAPIView(generics.RetrieveUpdateDestroyAPIView):
+class UpdateDestroyTestAPIView(OwnedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UpdateTestSerializer
     permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
 
@@ -107,12 +121,15 @@ class UpdateDestroyTestAPIView(generics.RetrieveUpdateDestroyAPIView):
         return Test.objects.filter(pk=self.kwargs['pk'])
 
 
-class TestQuestionsCreateAPIView(generics.ListCreateAPIView):
+class TestQuestionsCreateAPIView(OwnedObjectMixin, generics.ListCreateAPIView):
     serializer_class = QuestionsSerializer
     permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
 
-    def get_object(self):
-        return Test.objects.get(pk=self.kwargs['pk'])
+    def load_object(self):
+        # the test the questions are listed and created for
+        test = get_object_or_404(Test, pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, test)
+        return test
 
     def get_queryset(self, *args, **kwargs):
         return Questions.objects.filter(test=self.kwargs['pk']).order_by('pk')
@@ -121,91 +138,126 @@ class TestQuestionsCreateAPIView(generics.ListCreateAPIView):
         serializer.save(test_id=self.kwargs['pk'])
 
 
+class BulkQuestionsAPIView(OwnedObjectMixin, GenericAPIView):
+    """
+    GET streams the questions of the test as CSV (?format=csv, the default) or JSON lines (?format=jsonl).
+    POST imports a CSV or JSON lines file uploaded as "file", "replace" replaces the questions of the test.
+    """
+    permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
+    renderer_classes = (JSONRenderer, CSVRenderer, JSONLinesRenderer)
+
+    def get_queryset(self):
+        return Test.objects.filter(pk=self.kwargs['pk'])
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.accepted_renderer.format
+        return export_response(self.get_object(), fmt if fmt != 'json' else 'csv')
+
+    def post(self, request, *args, **kwargs):
+        test = self.get_object()
+        file = request.FILES.get('file')
+        fmt = file_format(file.name) if file else None
+        if fmt is None:
+            raise ValidationError({'file': ['Upload a .csv or .jsonl file.']})
+        replace = str(request.data.get('replace', '')).lower() in ('1', 'true', 'on')
+        result = import_questions(test, file, fmt, replace)
+        if result.errors:
+            return Response({'errors': [{'line': line, 'error': error} for line, error in result.errors]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': result.created}, status=status.HTTP_201_CREATED)
+
+
+class QuestionsBatchAPIView(OwnedObjectMixin, GenericAPIView):
+    """
+    POST {"upsert": [question, ...], "delete": [id, ...]} creates the questions without an "id", updates
+    the given fields of the ones with an "id" and deletes the questions of the test in one transaction.
+    Results are listed item by item, either {"id", "status"} or the errors of the item, nothing is saved
+    if any item is invalid.
+    """
+    serializer_class = QuestionsBatchSerializer
+    permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
+
+    def get_queryset(self):
+        return Test.objects.filter(pk=self.kwargs['pk'])
+
+    def post(self, request, *args, **kwargs):
+        test = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = apply_questions_batch(test, serializer.validated_data['upsert'], serializer.validated_data['delete'])
+        return Response({'upsert': result.upsert, 'delete': result.delete},
+                        status=status.HTTP_200_OK if result.ok else status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET', 'POST'])
 def pass_test(request, pk):
-    try:
-        test = Test.objects.get(pk=pk)
-    except Test.DoesNotExist:
-        test = None
-    questions = Questions.objects.filter(test=pk)
-    if not (questions and test) or ((not test.access_by_link and not test.is_public) and (
-            request.user != test.owner and not request.user.is_staff)):
-        msg = 'You cannot pass the test.'
-        if not test:
-            msg += ' Test does not exist.'
-        else:
-            if not questions:
-                msg += ' Test have no questions.'
-            elif not test.access_by_link and not test.is_public:
-                msg += ' Test is not accessible.'
-        return Response({'detail': msg}, status=status.HTTP_403_FORBIDDEN)
+    key = get_answer_key(pk)
+    error = access_error(key, request.user)
+    if error:
+        return Response({'detail': error}, status=status.HTTP_403_FORBIDDEN)
 
     if request.method == 'GET':
-        serializer = PassTestSerializer(questions)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        attempt = start_attempt(key)
+        # answers are sent back as {"attempt": attempt, "<field>": index of the chosen option}
+        data = {'attempt': sign_attempt(key, attempt),
+                'questions': PassTestSerializer(shuffle_questions(key, attempt.seed), many=True).data}
+        return Response(data, status=status.HTTP_200_OK)
 
     elif request.method == 'POST':
-        answers = {}
-        show_results = Test.objects.filter(pk=pk).values('show_results')[0]['show_results']
-        correct, total_questions = 0, len(questions)
-        result, max_result = 0, 0
-
-        # user answers
-        for i in request.data:
-            if i.startswith('question_'):
-                answers[i] = request.data.get(i).lower()
-
-        correct_answers = {'question_' + str(n): v.correct_answer.lower() for n, v in enumerate(questions, 1)}
-
-        # result, max_result
-        for k, v in correct_answers.items():
-            user_answer = answers.get(k, None)
-            value = questions[int(k[-1]) - 1].value
-            max_result += value
-            if user_answer == v:
-                result += value
-                correct += 1
+        try:
+            attempt = read_attempt(key, request.data.get('attempt'))
+        except InvalidSubmission as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # a resubmitted attempt gets its result back, it isn't saved twice
+        saved = submit_attempt(key, request.user, attempt, read_choices(key, request.data, attempt))
 
         to_return = {
             'results': {
-                'grade': round(result / max_result * 100, 2),
-                'scored': result,
-                'max_result': max_result,
-                'total_questions': total_questions,
-                'correct_answers': correct
+                'attempt': saved.attempt_id,
+                'grade': saved.grade,
+                'scored': saved.score,
+                'max_result': saved.max_score,
+                'total_questions': saved.total,
+                'correct_answers': saved.correct,
+                'duration': saved.duration,
             },
         }
-        if show_results:
-            to_return_questions = {}
-            for n, v in enumerate(questions, 1):
-                to_return_questions['question_' + str(n)] = {
-                    'question': v.question,
-                    'your_answer': answers.get('question_' + str(n), None),
-                    'correct_answer': v.correct_answer,
-                    'value': v.value,
-                }
-            to_return.update(to_return_questions)
-
-        if request.user.is_authenticated:
-            PassedTests.objects.create(test=test,
-                                       user=CustomUser.objects.get(pk=request.user.pk),
-                                       grade=round(result / max_result * 100, 2),
-                                       score=int(result),
-                                       max_score=int(max_result))
+        if key.show_results:
+            to_return['questions'] = [{
+                'id': q.id,
+                'question': q.question,
+                'your_answer': answer,
+                'correct_answer': q.correct_answer,
+                'value': q.value,
+            } for q, answer, _ in result_questions(key, saved)]
 
         return Response(to_return, status=status.HTTP_200_OK)
 
 
-class UpdateDestroyQuestionsAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TestStatsAPIView(OwnedObjectMixin, generics.RetrieveAPIView):
+    serializer_class = TestStatsSerializer
+    permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
+
+    def get_queryset(self, *args, **kwargs):
+        return Test.objects.filter(pk=self.kwargs['pk'])
+
+    def retrieve(self, request, *args, **kwargs):
+        test = self.get_object()
+        stats = TestStats.objects.filter(test=test).first() or TestStats(test=test)
+        return Response(self.get_serializer(stats).data, status=status.HTTP_200_OK)
+
+
+class UpdateDestroyQuestionsAPIView(OwnedObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UpdateDestroyQuestionsSerializer
     permission_classes = (IsAuthenticated, UserIsOwnerOrStaff)
 
     def get_queryset(self, *args, **kwargs):
-        return Questions.objects.filter(pk=self.kwargs['pk'])
+        return Questions.objects.filter(pk=self.kwargs['pk']).select_related('test')
 
 
 class PassedTestsAPIView(generics.ListAPIView):
     serializer_class = PassedTestsSerializer
+    pagination_class = KeysetCursorPagination
     permission_classes = (IsAuthenticated,)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
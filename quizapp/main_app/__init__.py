@@ -2,13 +2,21 @@ from django import forms
 
 
 class InlineFormSet(forms.BaseInlineFormSet):
-    def __init__(self, *args, **kwargs):
-        super(InlineFormSet, self).__init__(*args, **kwargs)
-        for form in self.forms:
-            for name in form.fields:
-                if name == 'DELETE':
-                    form.fields[name].widget.attrs.update({'class': 'form-check-input'})
-                else:
-                    form.fields[name].widget.attrs.update(
-                        {'placeholder': f'enter the {name.replace("_", " ")} here...'})
-                    form.fields[name].widget.attrs.update({'class': 'form-control'})
+    """
+    Formset of the question editor. The editor posts only the id of unchanged questions,
+    so existing questions are validated and saved only if they were changed.
+    """
+    deletion_widget = forms.CheckboxInput(attrs={'class': 'form-check-input'})
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        if index is not None and index < self.initial_form_count():
+            kwargs['empty_permitted'] = True
+        return kwargs
+
+    def add_fields(self, form, index):
+        # the empty form is an extra one, but with can_delete_extra off Django 4.1.1 compares its index, None,
+        # with the number of initial forms
+        if index is None:
+            index = self.total_form_count()
+        super().add_fields(form, index)
@@ -1,4 +1,4 @@
-from .models import Categories, Test, Questions, PassedTests
+from .models import Categories, Test, Questions, PassedTests, OutgoingEmail
 from django.contrib import admin
 
 
@@ -8,12 +8,13 @@ class CategoriesAdmin(admin.ModelAdmin):
 
 
 class TestAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'description', 'category', 'owner', 'time_create', 'time_update',)
-    fields = ('name', 'description', 'category')
+    list_display = ('id', 'name', 'description', 'category', 'owner', 'question_count', 'time_create',
+                    'time_update',)
+    fields = ('name', 'description', 'category', 'question_count', 'max_score')
     list_display_links = ('name',)
     search_fields = ('name', 'owner', 'description', 'time_create')
     list_filter = ('category', 'time_create', 'time_update', 'is_public', 'access_by_link', 'show_results')
-    readonly_fields = ('owner', 'time_create', 'time_update')
+    readonly_fields = ('owner', 'time_create', 'time_update', 'question_count', 'max_score')
 
 
 class QuestionsAdmin(admin.ModelAdmin):
@@ -32,7 +33,16 @@ class PassedTestsAdmin(admin.ModelAdmin):
     readonly_fields = ('data_passed',)
 
 
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'to', 'attempts', 'time_create', 'time_sent')
+    list_display_links = ('subject',)
+    search_fields = ('subject', 'to')
+    list_filter = ('time_create', 'time_sent')
+    readonly_fields = ('time_create',)
+
+
 admin.site.register(Categories, CategoriesAdmin)
 admin.site.register(Test, TestAdmin)
 admin.site.register(Questions, QuestionsAdmin)
 admin.site.register(PassedTests, PassedTestsAdmin)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
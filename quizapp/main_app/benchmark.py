@@ -0,0 +1,317 @@
+"""
+Benchmark of the pass test flow, used by the benchmark_pass_test command.
+
+Workers log in as synthetic users and repeat GET + POST of the pass test page (or endpoint)
+through the Django test client, every request is timed and its queries are counted.
+"""
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+from django.template.loader import get_template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, \
+    teardown_test_environment
+from django.urls import reverse
+
+from . import search
+from .models import Categories, Test, Questions
+from .scoring import AnswerKey, QuestionKey
+
+TARGETS = {
+    # url name and the shown questions of its GET response: attempt token, [(field, question id, options)]
+    'html': ('tests:pass_test', lambda response: (
+        response.context['attempt'],
+        [(q.field, q.id, [option for _, _, option in q.options]) for q in response.context['questions']])),
+    'api': ('api:pass', lambda response: (
+        response.data['attempt'], [(q['field'], q['id'], q['options']) for q in response.data['questions']])),
+}
+
+
+@contextmanager
+def temporary_database():
+    """Create an empty test database for the benchmarks and destroy it afterwards."""
+    setup_test_environment()
+    tmp = None
+    if connection.vendor == 'sqlite':
+        # in-memory database can't be shared by the workers without "table is locked" errors
+        tmp = tempfile.mkdtemp()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    cache.clear()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def seed(users=10, tests=10, questions=20):
+    """Create synthetic users and public tests, returns (list of users, list of test pks)."""
+    User = get_user_model()
+    created_users = [User(username=f'bench{i}', email=f'bench{i}@example.com', email_confirmed=True)
+                     for i in range(users)]
+    for u in created_users:
+        u.set_unusable_password()
+    created_users = User.objects.bulk_create(created_users)
+    category = Categories.objects.get_or_create(name='benchmark')[0]
+    created_tests = Test.objects.bulk_create([
+        Test(name=f'benchmark {i}', description='benchmark', owner=created_users[i % users], category=category)
+        for i in range(tests)
+    ])
+    Questions.objects.bulk_create([
+        Questions(question=f'question {j}', correct_answer=f'answer {j}', answer_1='wrong 1', answer_2='wrong 2',
+                  answer_3='wrong 3', test=t)
+        for t in created_tests for j in range(questions)
+    ])
+    # bulk_create doesn't send signals
+    Test.objects.filter(pk__in=[t.pk for t in created_tests]).refresh_question_stats()
+    search.index_tests(Test.objects.filter(pk__in=[t.pk for t in created_tests]).select_related('category', 'owner'))
+    return created_users, [t.pk for t in created_tests]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(timings, queries, errors):
+    timings = sorted(timings)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3) if timings else None,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3) if timings else None,
+        'p95_ms': round(percentile(timings, 95) * 1000, 3) if timings else None,
+        'p99_ms': round(percentile(timings, 99) * 1000, 3) if timings else None,
+        'max_ms': round(timings[-1] * 1000, 3) if timings else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+class Worker:
+    def __init__(self, target, user, test_pks, cycles, seed=None):
+        self.url_name, self.shown = TARGETS[target]
+        self.user = user
+        self.test_pks = test_pks
+        self.cycles = cycles
+        self.random = random.Random(seed)
+        self.timings = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.correct_answers = dict(Questions.objects.filter(test_id__in=test_pks).values_list('pk', 'correct_answer'))
+
+    def request(self, kind, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.errors[kind] += 1
+        self.timings[kind].append(elapsed)
+        self.queries[kind].append(len(context.captured_queries))
+        return response
+
+    def make_answers(self, response):
+        """Submission of the questions shown by the GET response."""
+        attempt, questions = self.shown(response)
+        answers = {'attempt': attempt}
+        for field, question_id, options in questions:
+            # about two thirds of the answers are correct
+            answer = self.correct_answers[question_id] if self.random.random() < 0.66 else 'wrong 1'
+            answers[field] = str(options.index(answer))
+        return answers
+
+    def run(self):
+        client = Client()
+        client.force_login(self.user)
+        for _ in range(self.cycles):
+            pk = self.random.choice(self.test_pks)
+            url = reverse(self.url_name, kwargs={'pk': pk})
+            response = self.request('get', client.get, url)
+            self.request('post', client.post, url, self.make_answers(response))
+
+
+def _run_in_thread(worker):
+    try:
+        worker.run()
+    finally:
+        connection.close()
+
+
+def run_benchmark(target, users, test_pks, cycles=50, workers=4, seed=None):
+    """
+    Run workers (one user each) concurrently, every one doing cycles of GET + POST.
+    Returns a dict with latency percentiles, throughput and queries per request.
+    """
+    pool = [Worker(target, users[i % len(users)], test_pks, cycles, None if seed is None else seed + i)
+            for i in range(workers)]
+    start = time.perf_counter()
+    if workers == 1:
+        # in the current thread, so it sees data of the current transaction (tests)
+        pool[0].run()
+    else:
+        threads = [threading.Thread(target=_run_in_thread, args=(w,)) for w in pool]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - start
+    result = {'target': target, 'workers': workers, 'cycles_per_worker': cycles, 'seconds': round(elapsed, 3)}
+    total = 0
+    for kind in ('get', 'post'):
+        timings = sum((w.timings[kind] for w in pool), [])
+        queries = sum((w.queries[kind] for w in pool), [])
+        errors = sum(w.errors[kind] for w in pool)
+        result[kind] = summarize(timings, queries, errors)
+        total += len(timings)
+    result['requests_per_second'] = round(total / elapsed, 2) if elapsed else None
+    result['cycles_per_second'] = round(total / 2 / elapsed, 2) if elapsed else None
+    return result
+
+
+SESSION_PAGES = ['tests:home', 'tests:tests', 'tests:my_tests', 'tests:passed_tests', 'users:my_profile',
+                 'tests:test_detail', 'tests:pass_test']
+# pages of a test
+SESSION_TEST_PAGES = ['tests:test_detail', 'tests:pass_test']
+MESSAGE_STORAGES = {
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}
+
+
+def count_session_queries(queries):
+    """Returns (session reads, session writes, all queries) of captured queries."""
+    sessions = [q['sql'] for q in queries if 'django_session' in q['sql']]
+    reads = sum(sql.lstrip().upper().startswith('SELECT') for sql in sessions)
+    return reads, len(sessions) - reads, len(queries)
+
+
+def run_session_benchmark(engine, message_storage, username, password, test_pk, requests=5):
+    """
+    Log in, then open the read-only pages requests times each, with the given session engine
+    and message storage. Returns session reads, writes and all queries of the login and per page view.
+    """
+    with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                           MESSAGE_STORAGE=MESSAGE_STORAGES[message_storage]):
+        cache.clear()
+        client = Client()
+        with CaptureQueriesContext(connection) as context:
+            # follows the redirect, the page shows the "logged in" message
+            client.post(reverse('users:login'), {'username': username, 'password': password, 'remember_me': 'on'},
+                        follow=True)
+        login = count_session_queries(context.captured_queries)
+        pages = []
+        for _ in range(requests):
+            for name in SESSION_PAGES:
+                url = reverse(name, kwargs={'pk': test_pk}) if name in SESSION_TEST_PAGES else reverse(name)
+                with CaptureQueriesContext(connection) as context:
+                    client.get(url)
+                pages.append(count_session_queries(context.captured_queries))
+    return {
+        'engine': engine,
+        'message_storage': message_storage,
+        'login': dict(zip(('session_reads', 'session_writes', 'queries'), login)),
+        'page_view': {key: round(sum(p[i] for p in pages) / len(pages), 2)
+                      for i, key in enumerate(('session_reads', 'session_writes', 'queries'))},
+    }
+
+
+def make_answer_key(questions, show_results=True):
+    """Answer key of a test with the given number of questions, nothing is saved to the database."""
+    keys = tuple(QuestionKey(id=n, question=f'question {n}', correct_answer=f'answer {n}', answer_1='wrong 1',
+                             answer_2='wrong 2', answer_3='wrong 3' if n % 2 else None, value=1)
+                 for n in range(1, questions + 1))
+    return AnswerKey(test_id=0, name='benchmark', description='benchmark', owner_id=None, is_public=True,
+                     access_by_link=False, show_results=show_results, questions=keys, max_score=len(keys))
+
+
+def time_render(template_name, make_context, repeat, request, backend=None):
+    """
+    Render the template repeat times with a fresh context each time, returns render times in seconds.
+    By default the template is loaded once by the configured (cached) engine, with a backend
+    it is loaded on every render as well, like without the cached loader.
+    """
+    timings = []
+    template = None if backend else get_template(template_name)
+    for _ in range(repeat):
+        context = make_context()
+        start = time.perf_counter()
+        (template or backend.get_template(template_name)).render(context, request)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def uncached_backend():
+    """Django templates backend configured like the default one, but without the cached loader."""
+    params = {k: v for k, v in settings.TEMPLATES[0].items() if k != 'BACKEND'}
+    options = dict(params.get('OPTIONS', {}))
+    options['loaders'] = ['django.template.loaders.filesystem.Loader',
+                          'django.template.loaders.app_directories.Loader']
+    return DjangoTemplates(dict(params, NAME='uncached', APP_DIRS=False, OPTIONS=options))
+
+
+EDITOR_FIELDS = ('question', 'correct_answer', 'answer_1', 'answer_2', 'answer_3', 'value')
+
+
+def question_editor_data(test_pk, changed, lean=True):
+    """
+    POST data of the question editor of the test, changed is {question pk: new value}.
+    With lean, unchanged questions post only their id like the editor does, otherwise all their fields.
+    """
+    prefix = 'question_test'
+    questions = Questions.objects.filter(test_id=test_pk).order_by('pk').values('pk', *EDITOR_FIELDS)
+    data = {f'{prefix}-TOTAL_FORMS': len(questions), f'{prefix}-INITIAL_FORMS': len(questions),
+            f'{prefix}-MIN_NUM_FORMS': 0, f'{prefix}-MAX_NUM_FORMS': 50}
+    for i, q in enumerate(questions):
+        pk = q.pop('pk')
+        data[f'{prefix}-{i}-id'] = pk
+        if pk in changed or not lean:
+            q['value'] = changed.get(pk, q['value'])
+            data.update({f'{prefix}-{i}-{k}': '' if v is None else v for k, v in q.items()})
+    return data
+
+
+def run_editor_benchmark(user, test_pk, repeat=20):
+    """
+    Time GET of the question editor and POST of one changed question, posted the lean way
+    (unchanged questions only by id) and with all the questions.
+    """
+    client = Client()
+    client.force_login(user)
+    url = reverse('tests:test_questions_edit', kwargs={'pk': test_pk})
+    question_pk = Questions.objects.filter(test_id=test_pk).order_by('pk').values_list('pk', flat=True).first()
+    results = {}
+    for kind in ('get', 'post_lean', 'post_full'):
+        timings, queries, errors = [], [], 0
+        for n in range(repeat):
+            if kind == 'get':
+                request, args, expected = client.get, (url,), 200
+            else:
+                # a new value every time, so the question is saved by every request
+                data = question_editor_data(test_pk, {question_pk: n % 5 + 2}, lean=kind == 'post_lean')
+                request, args, expected = client.post, (url, data), 302
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = request(*args)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(context.captured_queries))
+            errors += response.status_code != expected
+        results[kind] = summarize(timings, queries, errors)
+    return results
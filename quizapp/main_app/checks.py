@@ -0,0 +1,41 @@
+"""
+System checks of the settings, run by "manage.py check" and before migrate and runserver.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# every process has its own copy of these caches
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+CACHED_SESSION_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+def cache_is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Answer keys (main_app.scoring), users of API tokens (api.authentication), pages and cards
+    of the catalog (main_app.page_cache) are dropped from the cache by the worker which changed them.
+    Other workers never see that with a cache of their own and keep serving stale copies.
+    """
+    if getattr(settings, 'PROFILE', None) != 'prod' or cache_is_shared():
+        return []
+    return [Error(
+        'The default cache is kept by every process, workers would serve stale answer keys, pages and users.',
+        hint='Set CACHES to a cache shared by all workers (redis, memcached), e.g. with QUIZAPP_CACHE_URL.',
+        id='main_app.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """A session flushed by a logout is dropped from the cache of one worker only, the others keep it valid."""
+    if settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES or cache_is_shared(settings.SESSION_CACHE_ALIAS):
+        return []
+    return [Warning(
+        'Sessions are read from a cache kept by every process, a logout ends them on one worker only.',
+        hint='Use a cache shared by all workers or SESSION_ENGINE = "django.contrib.sessions.backends.db".',
+        id='main_app.W001',
+    )]
@@ -1,8 +1,11 @@
+from collections import ChainMap
+
 from . import InlineFormSet
+from .questions_bulk import file_format
 from .models import *
 from captcha.fields import CaptchaField
 from django import forms
-from django.forms.models import inlineformset_factory
+from django.forms.models import inlineformset_factory, model_to_dict
 
 
 class CreateTestForm(forms.ModelForm):
@@ -48,11 +51,36 @@ class UpdateTestForm(forms.ModelForm):
         self.fields['category'].widget.attrs['class'] = 'form-select'
 
 
+def _placeholder(name):
+    return {'class': 'form-control', 'placeholder': f'enter the {name.replace("_", " ")} here...'}
+
+
+class QuestionForm(forms.ModelForm):
+    class Meta:
+        model = Questions
+        fields = ('question', 'correct_answer', 'answer_1', 'answer_2', 'answer_3', 'value')
+        widgets = {
+            'question': forms.TextInput(_placeholder('question')),
+            'correct_answer': forms.TextInput(_placeholder('correct_answer')),
+            'answer_1': forms.TextInput(_placeholder('answer_1')),
+            'answer_2': forms.TextInput(_placeholder('answer_2')),
+            'answer_3': forms.TextInput(_placeholder('answer_3')),
+            'value': forms.NumberInput(_placeholder('value')),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the editor posts only the id of an unchanged question, its other values are the saved ones
+        if self.is_bound and self.instance.pk and self.add_prefix('question') not in self.data:
+            saved = model_to_dict(self.instance, self._meta.fields)
+            self.data = ChainMap({self.add_prefix(k): v for k, v in saved.items() if v is not None}, self.data)
+
+
+# blank rows are added by the editor from the empty form
 TestQuestionsFormset = inlineformset_factory(Test,
                                              Questions,
-                                             fields=('question', 'correct_answer', 'answer_1',
-                                                     'answer_2', 'answer_3', 'value'),
-                                             extra=10,
+                                             form=QuestionForm,
+                                             extra=1,
                                              max_num=50,
                                              can_delete_extra=False,
                                              formset=InlineFormSet)
@@ -67,3 +95,17 @@ class ContactForm(forms.Form):
                               widget=forms.Textarea(attrs={'class': 'form-control', 'cols': 60, 'rows': 5}),
                               min_length=1, max_length=1000)
     captcha = CaptchaField()
+
+
+class QuestionsImportForm(forms.Form):
+    file = forms.FileField(label='File', help_text='CSV with a header row or JSON lines, UTF-8.',
+                           widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl'}))
+    replace = forms.BooleanField(label='Replace the questions of the test', required=False,
+                                 widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        self.cleaned_data['format'] = file_format(file.name)
+        if self.cleaned_data['format'] is None:
+            raise forms.ValidationError('Upload a .csv or .jsonl file.')
+        return file
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+EMAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+EMAIL_OUTBOX_RETRY_DELAY = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+EMAIL_OUTBOX_CLAIM_TIMEOUT = getattr(settings, 'EMAIL_OUTBOX_CLAIM_TIMEOUT', 10 * 60)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """
+    Put the email into the outbox, it's sent later by the send_queued_emails command.
+    With EMAIL_OUTBOX_EAGER setting the email is sent right away.
+    """
+    email = OutgoingEmail.objects.create(subject=subject, body=body, to='\n'.join(to), from_email=from_email)
+    if getattr(settings, 'EMAIL_OUTBOX_EAGER', False):
+        deliver([email])
+        email.save()
+    return email
+
+
+def pending_emails():
+    return OutgoingEmail.objects.filter(time_sent__isnull=True, attempts__lt=EMAIL_OUTBOX_MAX_ATTEMPTS,
+                                        send_after__lte=timezone.now())
+
+
+def deliver(emails, connection=None):
+    """
+    Send emails over one connection and mark them as sent or failed, doesn't save them.
+    Failed emails are retried with exponential backoff.
+    A connection passed by the caller is left open, so it can be reused for the next batch.
+    Returns the number of sent emails.
+    """
+    own_connection = connection is None
+    connection = connection or get_connection()
+    sent = 0
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _failed(email, e)
+        return sent
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients(),
+                                   connection=connection)
+            try:
+                if not message.send():
+                    raise RuntimeError('The email backend did not send the message.')
+            except Exception as e:
+                _failed(email, e)
+            else:
+                email.time_sent = timezone.now()
+                sent += 1
+    finally:
+        if own_connection:
+            connection.close()
+    return sent
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.send_after = timezone.now() + timedelta(seconds=EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1))
+
+
+def send_queued_emails(batch_size=100, connection=None):
+    """
+    Send one batch of pending emails. Returns the numbers of sent and failed emails.
+    The batch is claimed in a short transaction and delivered outside of it, so no rows stay locked
+    while SMTP is slow. Emails of a worker which dies while sending are sent again after the claim runs out.
+    """
+    with transaction.atomic():
+        # skip_locked lets several workers drain the outbox, it's ignored by SQLite
+        emails = list(pending_emails().select_for_update(skip_locked=True).order_by('send_after', 'pk')[:batch_size])
+        if not emails:
+            return 0, 0
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            send_after=timezone.now() + timedelta(seconds=EMAIL_OUTBOX_CLAIM_TIMEOUT))
+    sent = deliver(emails, connection)
+    OutgoingEmail.objects.bulk_update(emails, ['attempts', 'last_error', 'send_after', 'time_sent'])
+    return sent, len(emails) - sent
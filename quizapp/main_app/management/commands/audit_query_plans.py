@@ -0,0 +1,111 @@
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from main_app.models import Test
+from main_app.query_audit import UnsupportedDatabase, audit_view, check_vendor
+from main_app.scoring import invalidate_answer_key
+
+# (url name, needs a test pk, query params), lists are audited on the first and the second page
+HOT_PATHS = [
+    ('tests:tests', False, {}),
+    ('tests:tests', False, {'ordering': 'name'}),
+    ('tests:tests', False, {'search': 'test'}),
+    ('tests:my_tests', False, {}),
+    ('tests:passed_tests', False, {}),
+    ('tests:test_detail', True, {}),
+    ('tests:pass_test', True, {}),
+    ('api:tests', False, {}),
+    ('api:tests', False, {'search': 'test'}),
+    ('api:tests_my', False, {}),
+    ('api:passed', False, {}),
+    ('api:tests_stats', True, {}),
+    ('api:pass', True, {}),
+]
+
+# small lookup tables which are fine to read whole
+IGNORE_TABLES = ['main_app_categories']
+
+
+def _next_cursor(response):
+    page = getattr(response, 'context_data', None) and response.context_data.get('page_obj')
+    if page is not None:
+        return page.next_cursor
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and data.get('next'):
+        return parse_qs(urlsplit(data['next']).query).get('cursor', [None])[0]
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN for the queries of the list and detail views and fail if any of them does a full scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to open the views as (the owner of the test by default).')
+        parser.add_argument('--test', type=int, help='Test for the detail views (the last updated public test '
+                                                      'with questions by default).')
+        parser.add_argument('--ignore-table', action='append', default=[],
+                            help='Table which may be scanned, can be repeated.')
+
+    def get_test(self, pk):
+        tests = Test.objects.all() if pk else Test.objects.with_questions().filter(is_public=True)
+        test = tests.filter(pk=pk).first() if pk else tests.order_by('-time_update').first()
+        if test is None:
+            raise CommandError('No test to audit the detail views with, use --test.')
+        return test
+
+    def get_user(self, username, test):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist.')
+        return test.owner or User.objects.filter(is_staff=True).first()
+
+    def audit(self, name, kwargs, params, user, ignore_tables):
+        url = reverse(name, kwargs=kwargs)
+        request = RequestFactory().get(url, params)
+        request.user = user
+        match = resolve(url)
+        findings, response = audit_view(match.func, request, ignore_tables, **match.kwargs)
+        return findings, _next_cursor(response)
+
+    def handle(self, *args, **options):
+        try:
+            check_vendor()
+        except UnsupportedDatabase as e:
+            raise CommandError(e)
+        test = self.get_test(options['test'])
+        user = self.get_user(options['user'], test)
+        ignore_tables = IGNORE_TABLES + options['ignore_table']
+        failed = 0
+        for name, with_test, params in HOT_PATHS:
+            kwargs = {'pk': test.pk} if with_test else {}
+            if with_test:
+                # the answer key is usually read from the cache
+                invalidate_answer_key(test.pk)
+            pages = [params]
+            findings, cursor = self.audit(name, kwargs, params, user, ignore_tables)
+            results = [findings]
+            if cursor:
+                pages.append(dict(params, cursor=cursor))
+                results.append(self.audit(name, kwargs, pages[-1], user, ignore_tables)[0])
+            for page_params, findings in zip(pages, results):
+                label = name + (f' {page_params}' if page_params else '')
+                bad = [f for f in findings if f.full_scans]
+                failed += len(bad)
+                status = self.style.ERROR('FULL SCAN') if bad else self.style.SUCCESS('ok')
+                self.stdout.write(f'{label}: {len(findings)} queries, {status}')
+                for f in findings:
+                    if f.full_scans or options['verbosity'] > 1:
+                        self.stdout.write(f'  {f.sql}')
+                        for line in f.plan:
+                            self.stdout.write(f'    {line}')
+                    if f.sorts and options['verbosity'] > 1:
+                        self.stdout.write(self.style.WARNING(f'    sorts: {f.sorts}'))
+        if failed:
+            raise CommandError(f'{failed} queries of hot paths do a full scan.')
@@ -0,0 +1,56 @@
+import json
+import platform
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from main_app.benchmark import TARGETS, run_benchmark, seed, temporary_database
+
+
+class Command(BaseCommand):
+    help = ('Benchmark passing tests: seed a temporary database with synthetic users, tests and questions, '
+            'run GET + POST cycles of the pass test views with concurrent workers and report latency '
+            'percentiles, throughput and queries per request as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), action='append',
+                            help='View to benchmark, can be repeated (both by default).')
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--tests', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=30, help='Questions per test.')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent workers (threads).')
+        parser.add_argument('--cycles', type=int, default=50, help='GET + POST cycles per worker.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the answers and the tests order.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        targets = options['target'] or sorted(TARGETS)
+        with temporary_database():
+            users, test_pks = seed(options['users'], options['tests'], options['questions'])
+            cache.clear()
+            results = [run_benchmark(target, users, test_pks, options['cycles'], options['workers'], options['seed'])
+                       for target in targets]
+        report = {
+            'config': {k: options[k] for k in ('users', 'tests', 'questions', 'workers', 'cycles', 'seed')},
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': results,
+        }
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data + '\n')
+            for r in results:
+                self.stdout.write(
+                    f"{r['target']}: {r['cycles_per_second']} cycles/s, "
+                    f"GET p50/p95/p99 {r['get']['p50_ms']}/{r['get']['p95_ms']}/{r['get']['p99_ms']} ms, "
+                    f"POST p50/p95/p99 {r['post']['p50_ms']}/{r['post']['p95_ms']}/{r['post']['p99_ms']} ms, "
+                    f"{r['post']['queries_per_request']} queries per POST, "
+                    f"{r['get']['errors'] + r['post']['errors']} errors")
+        else:
+            self.stdout.write(data)
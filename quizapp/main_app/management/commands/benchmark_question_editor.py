@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from main_app.benchmark import run_editor_benchmark, seed, temporary_database
+
+
+class Command(BaseCommand):
+    help = ('Time GET and POST of the question editor of a test in a temporary database, POST of one changed '
+            'question with only the ids of the unchanged ones and with all the questions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=50, help='Questions of the test (at most 50).')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests of every kind.')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            users, test_pks = seed(users=1, tests=1, questions=options['questions'])
+            results = run_editor_benchmark(users[0], test_pks[0], options['repeat'])
+        if options['verbosity'] > 1:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"request":<10} {"p50 ms":>8} {"p95 ms":>8} {"queries":>8} {"errors":>7}')
+        for kind, r in results.items():
+            self.stdout.write(f'{kind:<10} {r["p50_ms"]:>8} {r["p95_ms"]:>8} {r["queries_per_request"]:>8} '
+                              f'{r["errors"]:>7}')
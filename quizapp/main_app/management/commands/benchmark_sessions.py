@@ -0,0 +1,39 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from main_app.benchmark import MESSAGE_STORAGES, run_session_benchmark, seed, temporary_database
+
+ENGINES = ['db', 'cached_db', 'cache']
+
+
+class Command(BaseCommand):
+    help = ('Count session reads and writes of a login and of read-only page views '
+            'with every session engine and message storage, in a temporary database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', choices=ENGINES, action='append',
+                            help='Session engine, can be repeated (all by default).')
+        parser.add_argument('--message-storage', choices=sorted(MESSAGE_STORAGES), action='append',
+                            help='Message storage, can be repeated (all by default).')
+        parser.add_argument('--requests', type=int, default=5, help='Views of every page.')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            test_pk = seed(users=1, tests=3, questions=10)[1][0]
+            get_user_model().objects.create_user(username='session', email='session@example.com',
+                                                 password='benchmark-password1!', email_confirmed=True)
+            results = [run_session_benchmark(engine, storage, 'session', 'benchmark-password1!', test_pk,
+                                             options['requests'])
+                       for engine in options['engine'] or ENGINES
+                       for storage in options['message_storage'] or sorted(MESSAGE_STORAGES)]
+        if options['verbosity'] > 1:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('session reads / writes / all queries')
+        self.stdout.write(f'{"engine":<10} {"messages":<9} {"login":>12} {"page view":>20}')
+        for r in results:
+            login, page = (' / '.join(str(v) for v in (d['session_reads'], d['session_writes'], d['queries']))
+                           for d in (r['login'], r['page_view']))
+            self.stdout.write(f'{r["engine"]:<10} {r["message_storage"]:<9} {login:>12} {page:>20}')
@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# run in a fresh interpreter for every profile, prints a JSON line with its timings
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import get_resolver
+WSGIHandler()
+get_resolver().url_patterns
+startup = time.perf_counter() - start
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+client = Client()
+urls, requests = json.loads(sys.argv[1])
+timings = []
+for url in urls:
+    client.get(url)
+    for _ in range(requests):
+        t = time.perf_counter()
+        client.get(url)
+        timings.append(time.perf_counter() - t)
+print(json.dumps({'startup': startup, 'modules': len(sys.modules), 'toolbar': 'debug_toolbar' in sys.modules,
+                  'timings': timings}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Compare the startup time, imported modules and per request time of the settings profiles, '
+            'every run is a fresh interpreter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=['dev', 'prod'],
+                            help='Profile to measure, can be repeated (dev and prod by default).')
+        parser.add_argument('--runs', type=int, default=5, help='Interpreters started per profile.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per url in every run.')
+        parser.add_argument('--url', action='append', help='Url to request, can be repeated (/ by default).')
+
+    def measure(self, profile, urls, requests):
+        env = dict(os.environ, QUIZAPP_PROFILE=profile,
+                   DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'quizapp.settings'))
+        result = subprocess.run([sys.executable, '-c', SCRIPT, json.dumps([urls, requests])], env=env,
+                                cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f'The {profile} profile failed:\n{result.stderr}')
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        urls = options['url'] or ['/']
+        report = {}
+        for profile in options['profile'] or ['dev', 'prod']:
+            runs = [self.measure(profile, urls, options['requests']) for _ in range(options['runs'])]
+            timings = sorted(t for r in runs for t in r['timings'])
+            report[profile] = {
+                'startup_ms': round(statistics.median(r['startup'] for r in runs) * 1000, 2),
+                'modules': runs[0]['modules'],
+                'debug_toolbar_imported': runs[0]['toolbar'],
+                'request_mean_ms': round(statistics.mean(timings) * 1000, 3) if timings else None,
+                'request_p50_ms': round(statistics.median(timings) * 1000, 3) if timings else None,
+            }
+        self.stdout.write(json.dumps({'urls': urls, 'runs': options['runs'], 'requests': options['requests'],
+                                      'profiles': report}, indent=2))
@@ -0,0 +1,54 @@
+import json
+import uuid
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from main_app.benchmark import make_answer_key, summarize, time_render, uncached_backend
+from main_app.scoring import invalidate_answer_key, saved_result, score_submission
+from main_app.views import pass_test_context, result_context
+
+
+class Command(BaseCommand):
+    help = ('Time rendering of pass_test.html and result.html for tests of different sizes, '
+            'with the cached loader and with loading the templates on every render.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, nargs='+', default=[10, 100, 500],
+                            help='Sizes of the tests.')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders of every template and size.')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        backend = uncached_backend()
+        results = []
+        for questions in options['questions']:
+            key = make_answer_key(questions)
+            # questions of pass_test.html are cached per seed like in production, but not across sizes
+            invalidate_answer_key(key.test_id)
+            result = saved_result(key, score_submission(key, [0 if q.id % 3 else 1 for q in key.questions]),
+                                  uuid.uuid4(), duration=10)
+            contexts = {
+                'main_app/pass_test.html': lambda: pass_test_context(key),
+                'main_app/result.html': lambda: result_context(key, result),
+            }
+            for template_name, make_context in contexts.items():
+                # the first render compiles the template
+                time_render(template_name, make_context, 1, request)
+                results.append({
+                    'template': template_name,
+                    'questions': questions,
+                    'cached': summarize(time_render(template_name, make_context, options['repeat'], request), [], 0),
+                    'uncached': summarize(
+                        time_render(template_name, make_context, options['repeat'], request, backend), [], 0),
+                })
+        invalidate_answer_key(key.test_id)
+        if options['verbosity'] > 1:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"template":<26} {"questions":>9} {"cached p50 ms":>14} {"uncached p50 ms":>16}')
+        for r in results:
+            self.stdout.write(f'{r["template"]:<26} {r["questions"]:>9} {r["cached"]["p50_ms"]:>14} '
+                              f'{r["uncached"]["p50_ms"]:>16}')
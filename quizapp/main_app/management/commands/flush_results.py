@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app import results_buffer
+
+
+class Command(BaseCommand):
+    help = 'Save passed tests buffered by the RESULTS_BUFFER write-behind mode to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep flushing instead of exiting.')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between flushes.')
+
+    def handle(self, *args, **options):
+        if not results_buffer.is_enabled():
+            raise CommandError('RESULTS_BUFFER setting is not set.')
+        total = 0
+        while True:
+            total += results_buffer.flush(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {total} result(s).'))
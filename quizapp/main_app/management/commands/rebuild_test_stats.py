@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import Test
+from main_app.stats import rebuild_test_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalculate attempts and grades statistics of tests from passed tests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pk', nargs='*', type=int, help='Only rebuild these tests (all tests by default).')
+
+    def handle(self, *args, **options):
+        tests = Test.objects.order_by('pk')
+        if options['pk']:
+            tests = tests.filter(pk__in=options['pk'])
+        rebuilt = rebuild_test_stats(tests.iterator())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {rebuilt} test(s).'))
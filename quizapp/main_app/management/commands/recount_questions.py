@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the denormalized question_count and max_score of tests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pk', nargs='*', type=int, help='Only recount these tests (all tests by default).')
+
+    def handle(self, *args, **options):
+        tests = Test.objects.all()
+        if options['pk']:
+            tests = tests.filter(pk__in=options['pk'])
+        updated = tests.refresh_question_stats()
+        self.stdout.write(self.style.SUCCESS(f'Recounted questions of {updated} test(s).'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from main_app.mail import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send emails from the outbox in batches over a single connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_queued_emails(options['batch_size'], connection)
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    if not options['loop']:
+                        break
+                    # don't keep an idle connection, the server would drop it anyway
+                    connection.close()
+                    time.sleep(options['interval'])
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} email(s), {total_failed} failed.'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_app.template_warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = ('Compile all templates like a worker does at startup when TEMPLATE_WARMUP is on, '
+            'checks that they load and shows how long it takes.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        compiled, failed = warm_templates()
+        self.stdout.write(f'{compiled} templates compiled in {(time.perf_counter() - start) * 1000:.0f} ms.')
+        for name in failed:
+            self.stdout.write(self.style.WARNING(f'  failed: {name}'))
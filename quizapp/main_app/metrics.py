@@ -0,0 +1,162 @@
+"""
+Lightweight per request instrumentation, collected by main_app.middleware.RequestMetricsMiddleware.
+
+Every request is recorded with its view, wall time, number and time of SQL queries and cache hits
+into a ring buffer of the last METRICS_BUFFER_SIZE requests (for latency quantiles) and into
+monotonic per view totals (for counters). Both are per process, like answer_key_cache_stats().
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import NamedTuple
+
+from django.conf import settings
+
+METRICS_BUFFER_SIZE = getattr(settings, 'METRICS_BUFFER_SIZE', 1000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RequestRecord(NamedTuple):
+    view: str
+    method: str
+    status: int
+    duration: float
+    sql_count: int
+    sql_time: float
+    cache_hits: int
+    cache_misses: int
+    timestamp: float
+
+
+class RequestCounters:
+    """Queries and cache lookups of the request being served by the current thread."""
+
+    def __init__(self):
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def sql_time(self):
+        return sum(t for _, t in self.queries)
+
+    def top_queries(self, n):
+        return sorted(self.queries, key=lambda q: q[1], reverse=True)[:n]
+
+
+_local = threading.local()
+_lock = threading.Lock()
+_buffer = deque(maxlen=METRICS_BUFFER_SIZE)
+# (view, method, status class) -> [requests, duration, sql count, sql time, cache hits, cache misses]
+_totals = defaultdict(lambda: [0, 0.0, 0, 0.0, 0, 0])
+
+
+def start_request():
+    _local.counters = RequestCounters()
+    return _local.counters
+
+
+def end_request():
+    _local.counters = None
+
+
+def count_cache(hit):
+    """Count a cache lookup made while serving the current request, called by the cached helpers."""
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        return
+    if hit:
+        counters.cache_hits += 1
+    else:
+        counters.cache_misses += 1
+
+
+def record(view, method, status, duration, counters):
+    entry = RequestRecord(view, method, status, duration, len(counters.queries), counters.sql_time,
+                          counters.cache_hits, counters.cache_misses, time.time())
+    with _lock:
+        _buffer.append(entry)
+        totals = _totals[(view, method, f'{status // 100}xx')]
+        totals[0] += 1
+        totals[1] += duration
+        totals[2] += entry.sql_count
+        totals[3] += entry.sql_time
+        totals[4] += entry.cache_hits
+        totals[5] += entry.cache_misses
+    return entry
+
+
+def recent_requests():
+    with _lock:
+        return list(_buffer)
+
+
+def reset():
+    with _lock:
+        _buffer.clear()
+        _totals.clear()
+
+
+def _quantile(values, q):
+    """Nearest-rank quantile of sorted values."""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for suffix, labels, value in samples:
+        lines.append(f'{name}{suffix}{_labels(**labels)} {value}')
+
+
+def render_prometheus():
+    """Metrics of this process in the Prometheus text exposition format."""
+    with _lock:
+        totals = {k: list(v) for k, v in _totals.items()}
+        buffer = list(_buffer)
+    by_view = defaultdict(lambda: [0, 0.0, 0, 0.0, 0, 0])
+    for (view, method, _), values in totals.items():
+        view_totals = by_view[(view, method)]
+        for i, value in enumerate(values):
+            view_totals[i] += value
+    durations = defaultdict(list)
+    for entry in buffer:
+        durations[(entry.view, entry.method)].append(entry.duration)
+
+    lines = []
+    _metric(lines, 'quizapp_requests_total', 'counter', 'Requests served by view, method and status class.',
+            [('', {'view': v, 'method': m, 'status': s}, t[0]) for (v, m, s), t in sorted(totals.items())])
+    samples = []
+    for (view, method), values in sorted(by_view.items()):
+        recent = sorted(durations.get((view, method), []))
+        if recent:
+            samples += [('', {'view': view, 'method': method, 'quantile': q}, _quantile(recent, q))
+                        for q in QUANTILES]
+        samples.append(('_sum', {'view': view, 'method': method}, values[1]))
+        samples.append(('_count', {'view': view, 'method': method}, values[0]))
+    _metric(lines, 'quizapp_request_duration_seconds', 'summary',
+            f'Wall time of requests, quantiles of the last {METRICS_BUFFER_SIZE} requests.', samples)
+    for name, index, help_text in (
+            ('quizapp_sql_queries_total', 2, 'SQL queries made by requests.'),
+            ('quizapp_sql_duration_seconds_total', 3, 'Time spent in SQL queries by requests.'),
+            ('quizapp_cache_hits_total', 4, 'Cache hits of requests.'),
+            ('quizapp_cache_misses_total', 5, 'Cache misses of requests.')):
+        _metric(lines, name, 'counter', help_text,
+                [('', {'view': v, 'method': m}, t[index]) for (v, m), t in sorted(by_view.items())])
+    return '\n'.join(lines) + '\n'
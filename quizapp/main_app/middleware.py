@@ -0,0 +1,49 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('main_app.metrics')
+
+# seconds, requests taking longer are logged with their slowest queries, None to disable
+METRICS_SLOW_REQUEST = getattr(settings, 'METRICS_SLOW_REQUEST', 1.0)
+METRICS_SLOW_TOP_QUERIES = getattr(settings, 'METRICS_SLOW_TOP_QUERIES', 5)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, SQL queries and cache hits of every request into main_app.metrics,
+    a production replacement of the debug toolbar. Put it first in MIDDLEWARE to time the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counters = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(counters))
+                response = self.get_response(request)
+            duration = time.perf_counter() - start
+            match = request.resolver_match
+            view = match.view_name if match else '<unresolved>'
+            entry = metrics.record(view, request.method, response.status_code, duration, counters)
+            if METRICS_SLOW_REQUEST is not None and duration >= METRICS_SLOW_REQUEST:
+                self.log_slow_request(request, entry, counters)
+        finally:
+            metrics.end_request()
+        return response
+
+    def log_slow_request(self, request, entry, counters):
+        queries = '\n'.join(f'  {t * 1000:.1f} ms: {sql}'
+                            for sql, t in counters.top_queries(METRICS_SLOW_TOP_QUERIES))
+        logger.warning('Slow request %s %s (%s) %d: %.1f ms, %d queries in %.1f ms, %d cache hits\n%s',
+                       request.method, request.get_full_path(), entry.view, entry.status, entry.duration * 1000,
+                       entry.sql_count, entry.sql_time * 1000, entry.cache_hits, queries)
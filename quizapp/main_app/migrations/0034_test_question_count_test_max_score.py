@@ -0,0 +1,36 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_question_stats(apps, schema_editor):
+    Test = apps.get_model('main_app', 'Test')
+    Questions = apps.get_model('main_app', 'Questions')
+    questions = Questions.objects.filter(test=OuterRef('pk')).order_by().values('test')
+    Test.objects.update(
+        question_count=Coalesce(Subquery(questions.annotate(c=Count('pk')).values('c')), 0),
+        max_score=Coalesce(Subquery(questions.annotate(s=Sum('value')).values('s')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0033_rename_max_grade_passedtests_max_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='max_score',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_question_stats, migrations.RunPython.noop),
+    ]
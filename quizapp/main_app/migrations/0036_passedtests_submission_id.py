@@ -0,0 +1,24 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0035_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passedtests',
+            name='submission_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='passedtests',
+            name='data_passed',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
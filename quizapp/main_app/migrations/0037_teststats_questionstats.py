@@ -0,0 +1,35 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import main_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0036_passedtests_submission_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestStats',
+            fields=[
+                ('test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main_app.test')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('grade_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('min_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('max_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('grade_histogram', models.JSONField(default=main_app.models.empty_grade_histogram)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main_app.questions')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='main_app.test')),
+            ],
+        ),
+    ]
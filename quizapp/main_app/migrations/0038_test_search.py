@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# the DDL of main_app.search as it was when the index was added, migrations must not follow later changes of it
+TABLE = 'main_app_test_search'
+
+CREATE_SQL = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        f"name, description, category, owner, tokenize='unicode61', prefix='2 3')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+        f'test_id bigint PRIMARY KEY REFERENCES main_app_test (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        f'document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING gin (document)',
+    ],
+}
+
+# {test}, {category} and {owner} are the tables, {category_id} and {owner_id} the foreign key columns
+BACKFILL_SQL = {
+    'sqlite':
+        f"INSERT INTO {TABLE} (rowid, name, description, category, owner) "
+        "SELECT t.id, t.name, COALESCE(t.description, ''), COALESCE(c.name, ''), COALESCE(u.username, '') "
+        "FROM {test} t LEFT JOIN {category} c ON c.id = t.{category_id} LEFT JOIN {owner} u ON u.id = t.{owner_id}",
+    'postgresql':
+        f"INSERT INTO {TABLE} (test_id, document) "
+        "SELECT t.id, setweight(to_tsvector('simple', t.name), 'A') || "
+        "setweight(to_tsvector('simple', COALESCE(t.description, '')), 'B') || "
+        "setweight(to_tsvector('simple', COALESCE(c.name, '')), 'C') || "
+        "setweight(to_tsvector('simple', COALESCE(u.username, '')), 'C') "
+        "FROM {test} t LEFT JOIN {category} c ON c.id = t.{category_id} LEFT JOIN {owner} u ON u.id = t.{owner_id} "
+        "ON CONFLICT (test_id) DO UPDATE SET document = EXCLUDED.document",
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        # searched with icontains
+        return
+    Test = apps.get_model('main_app', 'Test')
+    category, owner = Test._meta.get_field('category'), Test._meta.get_field('owner')
+    with schema_editor.connection.cursor() as cursor:
+        for sql in CREATE_SQL[vendor]:
+            cursor.execute(sql)
+        cursor.execute(BACKFILL_SQL[vendor].format(
+            test=Test._meta.db_table, category=category.related_model._meta.db_table,
+            owner=owner.related_model._meta.db_table, category_id=category.column, owner_id=owner.column))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0037_teststats_questionstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0038_test_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passedtests',
+            index=models.Index(fields=['user', '-data_passed', '-id'], name='passed_tests_user_passed'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['is_public', '-time_update', '-id'], name='test_public_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['owner', '-time_update', '-id'], name='test_owner_updated'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0039_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='test',
+            name='test_public_updated',
+        ),
+        migrations.AlterField(
+            model_name='test',
+            name='description',
+            field=models.CharField(blank=True, max_length=1000, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(condition=models.Q(('is_public', True), ('question_count__gt', 0)), fields=['-time_update', '-id'], name='test_catalog'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(condition=models.Q(('is_public', True), ('question_count__gt', 0)), fields=['name', 'id'], name='test_catalog_name'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0040_test_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passedtests',
+            name='duration',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
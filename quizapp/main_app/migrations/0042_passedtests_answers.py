@@ -0,0 +1,18 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0041_passedtests_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passedtests',
+            name='answers',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.urls import reverse
+from django.utils import timezone
 from quizapp import settings
 
 
@@ -17,11 +20,24 @@ class Categories(models.Model):
         return str(self.name).title()
 
 
+class TestQuerySet(models.QuerySet):
+    def with_questions(self):
+        return self.filter(question_count__gt=0)
+
+    def refresh_question_stats(self):
+        # one UPDATE for the whole queryset; update() also leaves time_update untouched
+        questions = Questions.objects.filter(test=OuterRef('pk')).order_by().values('test')
+        return self.update(
+            question_count=Coalesce(Subquery(questions.annotate(c=Count('pk')).values('c')), 0),
+            max_score=Coalesce(Subquery(questions.annotate(s=Sum('value')).values('s')), 0),
+        )
+
+
 class Test(models.Model):
     name = models.CharField(max_length=255, db_index=True, null=False, blank=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL,
                               null=True, blank=True, on_delete=models.CASCADE)
-    description = models.CharField(max_length=1000, db_index=True, null=True, blank=True)
+    description = models.CharField(max_length=1000, null=True, blank=True)
     time_create = models.DateTimeField(auto_now_add=True, verbose_name='date')
     time_update = models.DateTimeField(auto_now=True)
     is_public = models.BooleanField(default=True)
@@ -29,10 +45,31 @@ class Test(models.Model):
     show_results = models.BooleanField(default=True)
     category = models.ForeignKey('Categories', blank=True,
                                  null=True, on_delete=models.PROTECT)
+    # denormalized from Questions, maintained by main_app.signals
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    max_score = models.IntegerField(default=0, editable=False)
+
+    objects = TestQuerySet.as_manager()
+
+    class Meta:
+        # keyset pagination of the catalog and "my tests", see main_app.pagination
+        # and the audit_query_plans command
+        indexes = [
+            models.Index(fields=['owner', '-time_update', '-id'], name='test_owner_updated'),
+            # the catalog only shows public tests with questions
+            models.Index(fields=['-time_update', '-id'], name='test_catalog',
+                         condition=models.Q(is_public=True, question_count__gt=0)),
+            models.Index(fields=['name', 'id'], name='test_catalog_name',
+                         condition=models.Q(is_public=True, question_count__gt=0)),
+        ]
 
     def __str__(self):
         return f'Test "{self.name}" by {self.owner}'
 
+    @property
+    def has_questions(self):
+        return self.question_count > 0
+
     def get_edit_url(self):
         return reverse('tests:test_edit', kwargs={'pk': self.pk})
 
@@ -70,7 +107,93 @@ class PassedTests(models.Model):
     grade = models.DecimalField(decimal_places=2, max_digits=5)
     score = models.IntegerField()
     max_score = models.IntegerField()
-    data_passed = models.DateTimeField(auto_now=True)
+    data_passed = models.DateTimeField(default=timezone.now)
+    # seconds from showing the test to submitting it, measured by the server
+    duration = models.PositiveIntegerField(null=True, blank=True)
+    # id of the attempt (main_app.scoring), so an attempt has one result and flushing results_buffer is idempotent
+    submission_id = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+    # [[question id, chosen answer or null, is correct], ...] to show the result again without scoring
+    answers = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-data_passed', '-id'], name='passed_tests_user_passed'),
+        ]
+
+    def __str__(self):
+        return (f"{self.user or 'Anonymous'}'s grade is {self.grade}. "
+                f"Scored {self.score} out of {self.max_score} points.")
+
+
+class OutgoingEmail(models.Model):
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    # one address per line
+    to = models.TextField()
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    time_create = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    time_sent = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['time_sent', 'send_after'], name='outgoing_email_pending'),
+        ]
 
     def __str__(self):
-        return f"{self.user}'s grade is {self.grade}. Scored {self.score} out of {self.max_score} points."
+        return f'Email "{self.subject}" to {", ".join(self.recipients())}'
+
+    def recipients(self):
+        return self.to.splitlines()
+
+
+def empty_grade_histogram():
+    return [0] * 101
+
+
+class TestStats(models.Model):
+    test = models.OneToOneField('Test', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    grade_sum = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    min_grade = models.DecimalField(decimal_places=2, max_digits=5, null=True, blank=True)
+    max_grade = models.DecimalField(decimal_places=2, max_digits=5, null=True, blank=True)
+    # number of attempts per whole grade, grade_histogram[75] counts grades from 75.00 to 75.99
+    grade_histogram = models.JSONField(default=empty_grade_histogram)
+
+    def __str__(self):
+        return f'Statistics of {self.test}: {self.attempts} attempts.'
+
+    @property
+    def average_grade(self):
+        if not self.attempts:
+            return None
+        return round(self.grade_sum / self.attempts, 2)
+
+    @property
+    def median_grade(self):
+        """Median rounded down to a whole grade."""
+        if not self.attempts:
+            return None
+        seen = 0
+        for grade, count in enumerate(self.grade_histogram):
+            seen += count
+            if seen * 2 >= self.attempts:
+                return grade
+
+
+class QuestionStats(models.Model):
+    question = models.OneToOneField('Questions', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    test = models.ForeignKey('Test', on_delete=models.CASCADE, related_name='question_stats')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Statistics of {self.question}: {self.correct} correct out of {self.attempts}.'
+
+    @property
+    def correct_rate(self):
+        if not self.attempts:
+            return None
+        return round(self.correct / self.attempts * 100, 2)
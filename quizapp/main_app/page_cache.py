@@ -0,0 +1,95 @@
+"""
+Caching of pages rendered for anonymous visitors and of the test cards of the catalog.
+
+Anonymous visitors get the same page for the same query string, so the rendered page is cached
+under the path and the query params. Catalog pages also carry the catalog version, which
+invalidate_catalog() bumps when a public test, its questions, its category or its owner change,
+so all of them are dropped at once. Cards of tests are cached separately (for everyone but the owner)
+and are dropped one by one by invalidate_test_cards().
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.http import HttpResponse
+
+from . import metrics
+
+# seconds, 0 disables the cache
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 10 * 60)
+TEST_CARD_CACHE_TIMEOUT = getattr(settings, 'TEST_CARD_CACHE_TIMEOUT', 60 * 60)
+
+_CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def catalog_version():
+    version = cache.get(_CATALOG_VERSION_KEY)
+    if version is None:
+        # not 1, pages of an evicted version must never be read again
+        version = time.time_ns()
+        cache.add(_CATALOG_VERSION_KEY, version, None)
+        version = cache.get(_CATALOG_VERSION_KEY, version)
+    return version
+
+
+def _bump_catalog_version():
+    try:
+        cache.incr(_CATALOG_VERSION_KEY)
+    except ValueError:
+        # no version yet, so nothing is cached under it either
+        pass
+
+
+def invalidate_catalog():
+    _bump_catalog_version()
+    # once more after commit, other workers could cache the old pages while the transaction was open
+    transaction.on_commit(_bump_catalog_version)
+
+
+def test_card_key(pk):
+    return make_template_fragment_key('test_card', [pk])
+
+
+def invalidate_test_cards(pks):
+    keys = [test_card_key(pk) for pk in pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def page_cache_key(request, versioned):
+    query = urlencode(sorted((k, v) for k, values in request.GET.lists() for v in values))
+    version = catalog_version() if versioned else 0
+    return f'page:{version}:{request.path}:{hashlib.md5(query.encode()).hexdigest()}'
+
+
+class AnonymousPageCacheMixin:
+    """Serve GET requests of anonymous visitors from the cache."""
+    # catalog pages are dropped by invalidate_catalog(), other pages only expire
+    page_cache_catalog = False
+
+    def is_page_cacheable(self, request):
+        # pending messages are shown on the page once
+        return (PAGE_CACHE_TIMEOUT and request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+                and CookieStorage.cookie_name not in request.COOKIES)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = page_cache_key(request, self.page_cache_catalog)
+        cached = cache.get(key)
+        metrics.count_cache(cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        # e.g. a csrf cookie is set for the visitor, so the page is personal
+        if response.status_code == 200 and not response.cookies and not response.streaming:
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        return response
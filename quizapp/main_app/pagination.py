@@ -0,0 +1,223 @@
+"""
+Keyset (cursor) pagination.
+
+A page is selected by the values of the ordering fields of the last row of the previous page
+(WHERE time_update < %s ... LIMIT n) instead of OFFSET, and no COUNT(*) is made, so deep pages
+are as fast as the first one and rows added in the meantime don't shift them.
+The pk is always added to the ordering, so cursors are stable even when the values repeat.
+Querysets which can't be paginated by keys (e.g. ordered by the search rank) fall back to offset cursors.
+"""
+import base64
+import binascii
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts microseconds, cursors need exact values
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(payload, dict):
+        raise InvalidCursor(cursor)
+    return payload
+
+
+def _resolve(model, path):
+    """Model field of the ordering path like 'owner__username'."""
+    field = None
+    for name in path.split('__'):
+        if model is None:
+            raise FieldDoesNotExist(path)
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        model = field.related_model
+    if field.many_to_many or field.one_to_many:
+        raise FieldDoesNotExist(path)
+    return field
+
+
+def _value(obj, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        obj = getattr(obj, relation)
+        if obj is None:
+            return None
+    return obj.pk if name == 'pk' else getattr(obj, obj._meta.get_field(name).attname)
+
+
+def _after(path, desc, value, null):
+    """Rows after the value in the ordering, NULL is the smallest value. None means no rows."""
+    if value is None:
+        return None if desc else Q(**{f'{path}__isnull': False})
+    if desc:
+        after = Q(**{f'{path}__lt': value})
+        return after | Q(**{f'{path}__isnull': True}) if null else after
+    return Q(**{f'{path}__gt': value})
+
+
+def _order_by(path, desc, null):
+    if not null:
+        # NULLS FIRST/LAST would keep PostgreSQL from reading the ordering from an index
+        return F(path).desc() if desc else F(path).asc()
+    return F(path).desc(nulls_last=True) if desc else F(path).asc(nulls_first=True)
+
+
+def _equal(path, value):
+    return Q(**{f'{path}__isnull': True}) if value is None else Q(**{path: value})
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, last_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = self._get_ordering()
+
+    def _get_ordering(self):
+        """[(path, field, desc, null), ...] or None if the queryset can't be paginated by keys."""
+        query = self.queryset.query
+        ordering = query.order_by or (query.default_ordering and self.queryset.model._meta.ordering) or []
+        model = self.queryset.model
+        result = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?':
+                return None
+            path = item.lstrip('-')
+            try:
+                field = _resolve(model, path)
+            except FieldDoesNotExist:
+                # extra(select=...) and annotations
+                return None
+            # a relation in the path can be empty as well
+            null = field.null or any(_resolve(model, '__'.join(path.split('__')[:i])).null
+                                     for i in range(1, path.count('__') + 1))
+            result.append((path, field, item.startswith('-'), null))
+            if field.primary_key and '__' not in path:
+                return result
+        result.append(('pk', model._meta.pk, result[-1][2] if result else False, False))
+        return result
+
+    def page(self, cursor=None):
+        payload = decode_cursor(cursor) if cursor else {}
+        if self.ordering is None:
+            return self._offset_page(payload)
+        return self._keyset_page(payload)
+
+    def _offset_page(self, payload):
+        offset = payload.get('o', 0)
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidCursor(payload)
+        rows = list(self.queryset[offset:offset + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page],
+            next_cursor=encode_cursor({'o': offset + self.per_page}) if has_next else None,
+            previous_cursor=encode_cursor({'o': max(offset - self.per_page, 0)}) if offset else None)
+
+    def _position(self, payload):
+        values = payload.get('v')
+        if values is None:
+            return None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(payload)
+        try:
+            return [None if v is None else field.to_python(v) for v, (_, field, _, _) in zip(values, self.ordering)]
+        except ValidationError:
+            raise InvalidCursor(payload)
+
+    def _keyset_page(self, payload):
+        position = self._position(payload)
+        reverse = bool(payload.get('r'))
+        ordering = [(path, desc != reverse, null) for path, _, desc, null in self.ordering]
+        queryset = self.queryset.order_by(*[_order_by(path, desc, null) for path, desc, null in ordering])
+        if position is not None:
+            # (a < x) OR (a = x AND b < y) OR ...
+            conditions = []
+            for i, (path, desc, null) in enumerate(ordering):
+                after = _after(path, desc, position[i], null)
+                if after is not None:
+                    for (prev_path, _, _), value in zip(ordering[:i], position):
+                        after &= _equal(prev_path, value)
+                    conditions.append(after)
+            queryset = queryset.filter(reduce(operator.or_, conditions)) if conditions else queryset.none()
+            path, desc, null = ordering[0]
+            if not null and len(ordering) > 1:
+                # redundant, but lets the database seek in the index instead of scanning up to the cursor
+                queryset = queryset.filter(**{f'{path}__{"lte" if desc else "gte"}': position[0]})
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1]) if has_next and rows else None,
+            previous_cursor=self._cursor(rows[0], reverse=True) if has_previous and rows else None,
+            last_cursor=encode_cursor({'r': 1}))
+
+    def _cursor(self, obj, reverse=False):
+        payload = {'v': [_value(obj, path) for path, _, _, _ in self.ordering]}
+        if reverse:
+            payload['r'] = 1
+        return encode_cursor(payload)
+
+
+class KeysetPaginationMixin:
+    """Replaces page numbers of a ListView with cursors, page_obj is a KeysetPage."""
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = KeysetPaginator(queryset, page_size).page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return None, page, page.object_list, page.has_other_pages()
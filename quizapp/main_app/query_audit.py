@@ -0,0 +1,100 @@
+"""
+EXPLAIN of the queries made by the hot views, used by the audit_query_plans command.
+
+Every view is called with RequestFactory, the queries it makes are captured with their params
+and explained. A query reading a whole table (except small lookup tables) is a full scan.
+"""
+import json
+from typing import NamedTuple
+
+from django.db import connection
+
+# databases whose plans can be read
+SUPPORTED_VENDORS = ('postgresql', 'sqlite')
+
+
+class UnsupportedDatabase(Exception):
+    pass
+
+
+def check_vendor():
+    if connection.vendor not in SUPPORTED_VENDORS:
+        raise UnsupportedDatabase(f'Query plans of {connection.vendor} can not be audited, '
+                                  f'only of {" and ".join(SUPPORTED_VENDORS)}.')
+
+
+class Finding(NamedTuple):
+    sql: str
+    # lines of the plan
+    plan: list
+    full_scans: list
+    sorts: list
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def _sqlite_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def _sqlite_full_scans(plan):
+    scans = []
+    for detail in plan:
+        # 'SCAN main_app_test' as opposed to 'SCAN main_app_test USING INDEX ...' or 'SEARCH ...'
+        if detail.startswith('SCAN ') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail:
+            scans.append(detail.split()[1])
+    return scans
+
+
+def _postgres_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def _postgres_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _postgres_nodes(child)
+
+
+def _postgres_full_scans(plan):
+    return [n['Relation Name'] for n in _postgres_nodes(plan[0]['Plan']) if n['Node Type'] == 'Seq Scan']
+
+
+def _postgres_sorts(plan):
+    return [n['Node Type'] for n in _postgres_nodes(plan[0]['Plan']) if n['Node Type'] == 'Sort']
+
+
+def explain(sql, params, ignore_tables=()):
+    check_vendor()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            plan = _postgres_plan(cursor, sql, params)
+            full_scans, sorts = _postgres_full_scans(plan), _postgres_sorts(plan)
+            plan = json.dumps(plan, indent=2).splitlines()
+        else:
+            plan = _sqlite_plan(cursor, sql, params)
+            full_scans = _sqlite_full_scans(plan)
+            sorts = [d for d in plan if 'TEMP B-TREE' in d]
+    full_scans = [t for t in full_scans if t not in ignore_tables]
+    return Finding(sql, plan, full_scans, sorts)
+
+
+def audit_view(view, request, ignore_tables=(), **kwargs):
+    """Call the view and explain all of its queries. Returns a list of Findings and the response."""
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    return [explain(sql, params, ignore_tables) for sql, params in recorder.queries], response
@@ -0,0 +1,286 @@
+"""
+Bulk import and export of the questions of a test, used by the question editor and the API.
+
+Files are CSV with a header row or JSON lines, both with the columns of FIELDS. Exports are streamed
+row by row from a server-side cursor. Imports are parsed line by line, validated and written
+with bulk_create in batches of IMPORT_BATCH_SIZE, all in one transaction: if any row is invalid,
+nothing is imported and the errors are returned with their line numbers.
+
+Batches of the API create, update and delete many questions at once the same way: all items are
+validated against the questions of the test loaded with one query, then written with one bulk_create,
+one bulk_update and one delete, or not at all if any item is invalid.
+"""
+import csv
+import io
+import json
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+
+from .models import Questions
+from .signals import bulk_question_changes
+
+FIELDS = ('question', 'correct_answer', 'answer_1', 'answer_2', 'answer_3', 'value')
+REQUIRED_FIELDS = ('question', 'correct_answer', 'answer_1')
+# format -> content type
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+QUESTIONS_IMPORT_LIMIT = getattr(settings, 'QUESTIONS_IMPORT_LIMIT', 1000)
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+# an import stops after so many invalid rows
+MAX_ERRORS = 20
+
+
+class ImportResult(NamedTuple):
+    created: int
+    # (line number, message)
+    errors: list
+
+
+class _Rollback(Exception):
+    pass
+
+
+def file_format(name):
+    """Format of an uploaded file by its extension, None if it isn't supported."""
+    name = (name or '').lower()
+    return next((fmt for ext, fmt in EXTENSIONS.items() if name.endswith(ext)), None)
+
+
+class _Echo:
+    """File-like object which returns what is written, so csv.writer can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def export_questions(test_pk, fmt):
+    """The questions of the test in the format, chunks of text to stream."""
+    rows = Questions.objects.filter(test_id=test_pk).order_by('pk').values_list(*FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        encode = writer.writerow
+        chunk = [encode(FIELDS)]
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n'
+        chunk = []
+    for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= 100:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def export_response(test, fmt):
+    response = StreamingHttpResponse(export_questions(test.pk, fmt),
+                                     content_type=f'{FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="test-{test.pk}-questions.{fmt}"'
+    return response
+
+
+def _read_csv(text):
+    reader = csv.DictReader(text)
+    columns = reader.fieldnames or []
+    unknown = [c for c in columns if c not in FIELDS]
+    missing = [c for c in REQUIRED_FIELDS if c not in columns]
+    if unknown or missing:
+        yield 1, 'The header must be ' + ','.join(FIELDS) + ' (answer_2, answer_3 and value are optional).'
+        return
+    for row in reader:
+        if None in row:
+            yield reader.line_num, 'The row has more values than the header.'
+        else:
+            yield reader.line_num, row
+
+
+def _read_jsonl(text):
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_num, 'The line is not valid JSON.'
+            continue
+        if not isinstance(row, dict):
+            yield line_num, 'The line must be a JSON object.'
+        elif any(k not in FIELDS for k in row):
+            yield line_num, 'Unknown keys, the keys are ' + ', '.join(FIELDS) + '.'
+        else:
+            yield line_num, row
+
+
+def read_rows(file, fmt):
+    """(line number, row) of the uploaded file one by one, row is an error message if the line is invalid."""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    rows = _read_csv(text) if fmt == 'csv' else _read_jsonl(text)
+    line_num = 0
+    try:
+        for line_num, row in rows:
+            yield line_num, row
+    except (UnicodeDecodeError, csv.Error):
+        yield line_num + 1, 'The file must be UTF-8 text.'
+    finally:
+        # the uploaded file is closed by Django
+        text.detach()
+
+
+def _set_fields(question, row, fields=FIELDS):
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ('', None):
+            value = {'value': 1, 'answer_2': None, 'answer_3': None}.get(field, '')
+        setattr(question, field, value)
+
+
+def _field_errors(question):
+    """{field: [messages]} of the invalid fields of the question, None if it is valid."""
+    try:
+        question.clean_fields(exclude=['test'])
+    except ValidationError as e:
+        return e.message_dict
+    return None
+
+
+def _build_question(test, row):
+    question = Questions(test=test)
+    _set_fields(question, row)
+    errors = _field_errors(question)
+    if errors:
+        return None, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items())
+    return question, None
+
+
+def import_questions(test, file, fmt, replace=False):
+    """
+    Add the questions of the uploaded file to the test, replacing its questions if replace is set.
+    Nothing is saved if there are errors.
+    """
+    errors = []
+    created = 0
+    try:
+        with transaction.atomic(), bulk_question_changes([test.pk]):
+            if replace:
+                # the receivers are muted, questions_changed() runs once at the end
+                Questions.objects.filter(test=test).delete()
+                existing = set()
+            else:
+                existing = set(Questions.objects.filter(test=test).values_list('question', flat=True))
+            batch = []
+            for line_num, row in read_rows(file, fmt):
+                if isinstance(row, str):
+                    errors.append((line_num, row))
+                elif len(existing) >= QUESTIONS_IMPORT_LIMIT:
+                    errors.append((line_num, f'A test can have at most {QUESTIONS_IMPORT_LIMIT} questions.'))
+                    break
+                else:
+                    question, error = _build_question(test, row)
+                    if error:
+                        errors.append((line_num, error))
+                    elif question.question in existing:
+                        errors.append((line_num, 'The question is already in the test.'))
+                    else:
+                        existing.add(question.question)
+                        batch.append(question)
+                if len(errors) >= MAX_ERRORS:
+                    break
+                if errors:
+                    # nothing will be saved, the rest of the file is only validated
+                    batch = []
+                elif len(batch) >= IMPORT_BATCH_SIZE:
+                    Questions.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if errors:
+                raise _Rollback
+            Questions.objects.bulk_create(batch)
+            created += len(batch)
+    except _Rollback:
+        return ImportResult(0, errors)
+    return ImportResult(created, errors)
+
+
+class BatchResult(NamedTuple):
+    ok: bool
+    # one dict per item: {"id", "status"} if the batch is saved, {field: [messages]} or {} if it isn't
+    upsert: list
+    delete: list
+
+
+def apply_questions_batch(test, upsert, delete):
+    """
+    Create the questions of upsert without an "id", update the ones with an "id" (only the given fields)
+    and delete the questions with the ids of delete. Nothing is saved if any item is invalid.
+    """
+    unknown = 'Unknown keys, the keys are id, ' + ', '.join(FIELDS) + '.'
+    not_in_test = 'The question is not in the test.'
+    delete = list(dict.fromkeys(delete))
+    try:
+        with transaction.atomic(), bulk_question_changes([test.pk]):
+            questions = Questions.objects.filter(test=test).in_bulk()
+            delete_errors = [{} if pk in questions else {'id': [not_in_test]} for pk in delete]
+            updated_ids = [row['id'] for row in upsert if row.get('id') in questions]
+            # texts the questions will keep, to find duplicates
+            taken = {q.question for pk, q in questions.items() if pk not in delete and pk not in updated_ids}
+            count = len(questions) - sum(pk in questions for pk in delete)
+            seen = set()
+            created, updated, upsert_errors, renamed = [], [], [], []
+            for row in upsert:
+                pk = row.get('id')
+                if any(k not in FIELDS and k != 'id' for k in row):
+                    upsert_errors.append({'non_field_errors': [unknown]})
+                    continue
+                if pk is None:
+                    question = Questions(test=test)
+                    _set_fields(question, row)
+                    count += 1
+                elif pk not in questions or pk in delete or pk in seen:
+                    upsert_errors.append({'id': [not_in_test if pk not in questions else
+                                                 'The question is already changed by the batch.']})
+                    continue
+                else:
+                    seen.add(pk)
+                    question = questions[pk]
+                    text = question.question
+                    _set_fields(question, row, [f for f in FIELDS if f in row])
+                    if question.question != text:
+                        renamed.append(len(upsert_errors))
+                errors = _field_errors(question) or {}
+                if not errors and question.question in taken:
+                    errors = {'question': ['The question is already in the test.']}
+                elif pk is None and count > QUESTIONS_IMPORT_LIMIT:
+                    errors = {'non_field_errors': [f'A test can have at most {QUESTIONS_IMPORT_LIMIT} questions.']}
+                taken.add(question.question)
+                upsert_errors.append(errors)
+                if not errors:
+                    (updated if pk else created).append(question)
+            if any(upsert_errors) or any(delete_errors):
+                raise _Rollback
+            if delete:
+                Questions.objects.filter(pk__in=delete).delete()
+            try:
+                with transaction.atomic():
+                    Questions.objects.bulk_update(updated, FIELDS)
+            except IntegrityError:
+                # the unique texts are checked row by row, e.g. two questions can't swap their texts
+                for index in renamed:
+                    upsert_errors[index] = {'question': ['The question is in the test until the batch is saved.']}
+                raise _Rollback
+            Questions.objects.bulk_create(created)
+    except _Rollback:
+        return BatchResult(False, upsert_errors, delete_errors)
+    created = iter(created)
+    return BatchResult(True, [{'id': row['id'], 'status': 'updated'} if row.get('id') else
+                              {'id': next(created).pk, 'status': 'created'} for row in upsert],
+                       [{'id': pk, 'status': 'deleted'} for pk in delete])
@@ -0,0 +1,361 @@
+import hashlib
+import random
+import secrets
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import IntegrityError, transaction
+from django.utils.crypto import salted_hmac
+
+from . import metrics, results_buffer, stats
+from .models import Questions, Test, PassedTests
+
+# bump it when the layout of AnswerKey/QuestionKey changes, so old pickles are never read
+ANSWER_KEY_VERSION = 2
+ANSWER_KEY_CACHE_TIMEOUT = getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 60 * 60)
+
+# per process counters of get_answer_key(), see answer_key_cache_stats()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+ATTEMPT_SALT = 'main_app.scoring.attempt'
+# distinct orders of options per test, questions of every order are rendered once and cached
+ATTEMPT_SEEDS = getattr(settings, 'ATTEMPT_SEEDS', 16)
+# seconds an attempt can be submitted for
+ATTEMPT_MAX_AGE = getattr(settings, 'ATTEMPT_MAX_AGE', 24 * 60 * 60)
+# seconds a submitted result is kept in the cache, buffered results are read only from there until they are flushed
+RESULT_CACHE_TIMEOUT = getattr(settings, 'RESULT_CACHE_TIMEOUT', ATTEMPT_MAX_AGE)
+
+
+class InvalidSubmission(Exception):
+    pass
+
+
+class QuestionKey(NamedTuple):
+    id: int
+    question: str
+    correct_answer: str
+    answer_1: str
+    answer_2: Optional[str]
+    answer_3: Optional[str]
+    value: int
+
+    @property
+    def options(self):
+        # the correct answer is always the first one, so a chosen option is correct when its index is 0
+        return [a for a in (self.correct_answer, self.answer_1, self.answer_2, self.answer_3) if a]
+
+
+class ShuffledQuestion(NamedTuple):
+    """A question as it is shown to the user passing the test."""
+    id: int
+    question: str
+    # name of the form field, its value is the index of the chosen option as shown
+    field: str
+    # (id of the radio button, index, option), strings already, so the template doesn't localize numbers
+    options: tuple
+    value: int
+    # indexes of the shown options in QuestionKey.options, never rendered
+    order: tuple
+
+
+class Attempt(NamedTuple):
+    """Passing of a test, it is signed into the token which is submitted with the answers."""
+    id: str
+    test_id: int
+    seed: int
+    # timestamp of the server, so the duration can't be made up by the client
+    started: float
+
+    def duration(self, now=None):
+        """Whole seconds since the attempt was started."""
+        return max(0, int((now or time.time()) - self.started))
+
+
+class AnswerKey(NamedTuple):
+    test_id: int
+    name: str
+    description: Optional[str]
+    owner_id: Optional[int]
+    is_public: bool
+    access_by_link: bool
+    show_results: bool
+    questions: tuple
+    max_score: int
+
+
+class Score(NamedTuple):
+    grade: float
+    score: int
+    max_score: int
+    correct: int
+    total: int
+    answers: tuple
+    is_correct: tuple
+
+
+class SavedResult(NamedTuple):
+    """Result of a submitted attempt, enough to show it again without the submission."""
+    attempt_id: uuid.UUID
+    test_id: int
+    user_id: Optional[int]
+    grade: float
+    score: int
+    max_score: int
+    correct: int
+    total: int
+    duration: Optional[int]
+    # (question id, chosen answer or None, is correct) in the order of the questions
+    answers: tuple
+
+
+_TEST_FIELDS = ('name', 'description', 'owner_id', 'is_public', 'access_by_link', 'show_results')
+_QUESTION_FIELDS = ('id', 'question', 'correct_answer', 'answer_1', 'answer_2', 'answer_3', 'value')
+
+
+def load_answer_key(pk):
+    """
+    Load the test and all of its questions with a single query.
+    Returns None if the test doesn't exist.
+    """
+    rows = list(Questions.objects.filter(test_id=pk).order_by('pk').values_list(
+        *_QUESTION_FIELDS, 'test_id', *('test__' + f for f in _TEST_FIELDS)))
+    if rows:
+        test = rows[0][len(_QUESTION_FIELDS):]
+        questions = tuple(QuestionKey(*r[:len(_QUESTION_FIELDS)]) for r in rows)
+    else:
+        # test without questions (or no test at all), it can't be passed anyway
+        test = Test.objects.filter(pk=pk).values_list('id', *_TEST_FIELDS).first()
+        if test is None:
+            return None
+        questions = ()
+    return AnswerKey(*test, questions=questions, max_score=sum(q.value for q in questions))
+
+
+def _cache_key(pk):
+    return f'answer_key:{pk}'
+
+
+def get_answer_key(pk):
+    """
+    Same as load_answer_key(), but the compiled key is kept in the cache
+    until the test or one of its questions is changed.
+    """
+    key = cache.get(_cache_key(pk), version=ANSWER_KEY_VERSION)
+    if key is not None:
+        _cache_stats['hits'] += 1
+        metrics.count_cache(True)
+        return key
+    _cache_stats['misses'] += 1
+    metrics.count_cache(False)
+    key = load_answer_key(pk)
+    if key is not None:
+        cache.set(_cache_key(pk), key, ANSWER_KEY_CACHE_TIMEOUT, version=ANSWER_KEY_VERSION)
+    return key
+
+
+def questions_fragment_key(pk, seed):
+    """Key of the questions of pass_test.html rendered in the order of the seed."""
+    return make_template_fragment_key('pass_test_questions', [pk, seed])
+
+
+def invalidate_answer_key(pk):
+    # reaches other workers only through a shared cache, see main_app.checks
+    cache.delete(_cache_key(pk), version=ANSWER_KEY_VERSION)
+    cache.delete_many([questions_fragment_key(pk, seed) for seed in range(ATTEMPT_SEEDS)])
+
+
+def answer_key_cache_stats():
+    return dict(_cache_stats)
+
+
+def start_attempt(key):
+    return Attempt(uuid.uuid4().hex, key.test_id, secrets.randbelow(ATTEMPT_SEEDS), time.time())
+
+
+def _orders(key, seed):
+    """
+    Order of the options of every question for the seed. The generator is seeded with a keyed hash,
+    so the order can't be worked out from the seed without the SECRET_KEY.
+    """
+    rng = random.Random(salted_hmac(ATTEMPT_SALT, f'{key.test_id}:{seed}').digest())
+    for q in key.questions:
+        order = list(range(len(q.options)))
+        rng.shuffle(order)
+        yield order
+
+
+def shuffle_questions(key, seed):
+    """Questions of the key ready to be rendered, options of every one in the order of the seed."""
+    questions = []
+    for q, order in zip(key.questions, _orders(key, seed)):
+        options = tuple((f'a{n}_{q.id}', str(n), q.options[i]) for n, i in enumerate(order))
+        questions.append(ShuffledQuestion(q.id, q.question, f'q{q.id}', options, q.value, tuple(order)))
+    return questions
+
+
+def _questions_digest(key):
+    layout = ','.join(f'{q.id}:{len(q.options)}' for q in key.questions)
+    return hashlib.md5(layout.encode()).hexdigest()[:12]
+
+
+def sign_attempt(key, attempt):
+    """Token of the attempt, it is sent back with the answers."""
+    return signing.dumps([*attempt, _questions_digest(key)], salt=ATTEMPT_SALT)
+
+
+def read_attempt(key, token):
+    """
+    The attempt of the token. Raises InvalidSubmission if the token is forged or expired,
+    or the questions were changed after they were shown.
+    """
+    try:
+        *attempt, digest = signing.loads(token or '', salt=ATTEMPT_SALT, max_age=ATTEMPT_MAX_AGE)
+        attempt = Attempt(*attempt)
+    except signing.SignatureExpired:
+        raise InvalidSubmission('The time to pass the test is over, please pass it again.')
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidSubmission('The answers are damaged, please pass the test again.')
+    if attempt.test_id != key.test_id or digest != _questions_digest(key):
+        raise InvalidSubmission('The test was changed while you were passing it, please pass it again.')
+    return attempt
+
+
+def read_choices(key, data, attempt):
+    """
+    Indexes in QuestionKey.options of the options chosen in data ({"q<question id>": shown index}),
+    in the order of key.questions, None for unanswered questions.
+    """
+    choices = []
+    for q, order in zip(key.questions, _orders(key, attempt.seed)):
+        try:
+            index = int(data.get(f'q{q.id}'))
+        except (TypeError, ValueError):
+            index = None
+        choices.append(order[index] if index is not None and 0 <= index < len(order) else None)
+    return choices
+
+
+def access_error(key, user):
+    """Returns the reason why the user cannot pass the test, None if the test is accessible."""
+    msg = 'You cannot pass the test.'
+    if key is None:
+        return msg + ' Test does not exist.'
+    if not key.questions:
+        return msg + ' Test have no questions.'
+    # private test still can be passed by its owner or admin
+    if not key.access_by_link and not key.is_public and not user.is_staff and (
+            not user.is_authenticated or user.pk != key.owner_id):
+        return msg + ' Test is not accessible.'
+    return None
+
+
+def score_submission(key, choices):
+    """
+    Score options chosen by read_choices(), no queries are made.
+    """
+    score, correct = 0, 0
+    answers, is_correct = [], []
+    for q, choice in zip(key.questions, choices):
+        ok = choice == 0
+        answers.append(q.options[choice] if choice is not None else None)
+        is_correct.append(ok)
+        if ok:
+            correct += 1
+            score += q.value
+    grade = round(score / key.max_score * 100, 2) if key.max_score else 0
+    return Score(grade=grade, score=score, max_score=key.max_score, correct=correct, total=len(key.questions),
+                 answers=tuple(answers), is_correct=tuple(is_correct))
+
+
+def save_result(key, user, result, duration=None, submission_id=None, answers=None):
+    """
+    Save the result, results of anonymous users too, so every submitted attempt can be shown again.
+    Raises IntegrityError if a result with the submission_id is saved already.
+    """
+    user_id = user.pk if user.is_authenticated else None
+    question_ids = [q.id for q in key.questions]
+    correct_ids = stats.correct_question_ids(key, result)
+    if results_buffer.is_enabled():
+        # written to the database later by the flush_results command
+        return results_buffer.append(key.test_id, user_id, result.grade, result.score, result.max_score,
+                                     question_ids, correct_ids, duration=duration, submission_id=submission_id,
+                                     answers=answers)
+    with transaction.atomic():
+        passed_test = PassedTests.objects.create(test_id=key.test_id, user_id=user_id, grade=result.grade,
+                                                 score=result.score, max_score=result.max_score, duration=duration,
+                                                 submission_id=submission_id, answers=answers)
+        stats.record_results(key.test_id, [(result.grade, question_ids, correct_ids)])
+    return passed_test
+
+
+def _result_key(attempt_id):
+    return f'result:{attempt_id.hex}'
+
+
+def saved_result(key, result, attempt_id, user_id=None, duration=None):
+    answers = tuple((q.id, answer, ok) for q, answer, ok in zip(key.questions, result.answers, result.is_correct))
+    return SavedResult(attempt_id, key.test_id, user_id, result.grade, result.score, result.max_score,
+                       result.correct, result.total, duration, answers)
+
+
+def load_result(attempt_id):
+    """Result of the submitted attempt from the cache or the database, None if there is none."""
+    saved = cache.get(_result_key(attempt_id))
+    if saved is not None:
+        return saved
+    row = PassedTests.objects.filter(submission_id=attempt_id).values(
+        'test_id', 'user_id', 'grade', 'score', 'max_score', 'duration', 'answers').first()
+    if row is None:
+        return None
+    answers = tuple(tuple(a) for a in row['answers'] or ())
+    saved = SavedResult(attempt_id, row['test_id'], row['user_id'], float(row['grade']), row['score'],
+                        row['max_score'], sum(ok for _, _, ok in answers), len(answers), row['duration'], answers)
+    cache.set(_result_key(attempt_id), saved, RESULT_CACHE_TIMEOUT)
+    return saved
+
+
+def submit_attempt(key, user, attempt, choices):
+    """
+    Score the choices of the attempt and save its result. Only the first submission of an attempt
+    is scored and saved, the next ones get its result back.
+    """
+    attempt_id = uuid.UUID(attempt.id)
+    # a result dropped from the cache is found by the unique submission_id when it is saved again
+    saved = cache.get(_result_key(attempt_id))
+    if saved is not None:
+        return saved
+    result = score_submission(key, choices)
+    saved = saved_result(key, result, attempt_id, user.pk if user.is_authenticated else None, attempt.duration())
+    answers = [list(a) for a in saved.answers]
+    if results_buffer.is_enabled():
+        # buffered results are only in the cache until they are flushed, so of concurrent submissions
+        # the one which adds the result to the (shared, see main_app.checks) cache is buffered
+        if not cache.add(_result_key(attempt_id), saved, RESULT_CACHE_TIMEOUT):
+            return cache.get(_result_key(attempt_id), saved)
+        try:
+            save_result(key, user, result, saved.duration, attempt_id, answers)
+        except BaseException:
+            cache.delete(_result_key(attempt_id))
+            raise
+        return saved
+    try:
+        save_result(key, user, result, saved.duration, attempt_id, answers)
+    except IntegrityError:
+        # saved by a concurrent submission, the unique submission_id keeps the first one
+        saved = load_result(attempt_id)
+        if saved is None:
+            raise
+        return saved
+    cache.set(_result_key(attempt_id), saved, RESULT_CACHE_TIMEOUT)
+    return saved
+
+
+def result_questions(key, saved):
+    """(question, chosen answer, is correct) of the saved result, for the questions the test still has."""
+    questions = {q.id: q for q in key.questions}
+    return [(questions[pk], answer, ok) for pk, answer, ok in saved.answers if pk in questions]
@@ -0,0 +1,170 @@
+"""
+Full-text search over tests.
+
+Every test has a document (name, description, category and owner) in a separate search table:
+an FTS5 virtual table on SQLite and a table with a tsvector column and a GIN index on PostgreSQL.
+Documents are updated by signals on Test, Categories and user saves, the rebuild_search_index
+command fills the table from scratch. On other databases search falls back to icontains.
+Every word of the query is matched as a prefix, so 'test1' finds 'test1' and 'test10'.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+TABLE = 'main_app_test_search'
+
+_WORD = re.compile(r'\w+')
+
+
+def words(query):
+    return _WORD.findall(query.lower())[:16]
+
+
+def _test_id(queryset):
+    return f'{queryset.model._meta.db_table}.{queryset.model._meta.pk.column}'
+
+
+def _rows(tests):
+    for test in tests:
+        yield (test.pk, test.name, test.description or '',
+               test.category.name if test.category_id else '',
+               test.owner.username if test.owner_id else '')
+
+
+class SqliteBackend:
+    create_sql = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        f"name, description, category, owner, tokenize='unicode61', prefix='2 3')",
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def index(self, cursor, rows):
+        rows = list(rows)
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(r[0],) for r in rows])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, name, description, category, owner) VALUES (%s, %s, %s, %s, %s)', rows)
+
+    def remove(self, cursor, pks):
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+    def search(self, queryset, query_words):
+        match = ' '.join(f'"{w}"*' for w in query_words)
+        # bm25() is negative, the best match has the lowest rank
+        return queryset.extra(
+            tables=[TABLE],
+            where=[f'{TABLE}.rowid = {_test_id(queryset)}', f'{TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{TABLE}.rank'},
+        ).order_by('search_rank')
+
+
+class PostgresBackend:
+    create_sql = [
+        f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+        f'test_id bigint PRIMARY KEY REFERENCES main_app_test (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        f'document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING gin (document)',
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {TABLE}']
+
+    def index(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (test_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+            f"setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'C')) "
+            f"ON CONFLICT (test_id) DO UPDATE SET document = EXCLUDED.document", list(rows))
+
+    def remove(self, cursor, pks):
+        cursor.execute(f'DELETE FROM {TABLE} WHERE test_id = ANY(%s)', [list(pks)])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {TABLE}')
+
+    def search(self, queryset, query_words):
+        tsquery = ' & '.join(f'{w}:*' for w in query_words)
+        return queryset.extra(
+            tables=[TABLE],
+            where=[f'{TABLE}.test_id = {_test_id(queryset)}',
+                   f"{TABLE}.document @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+            select={'search_rank': f"ts_rank({TABLE}.document, to_tsquery('simple', %s))"},
+            select_params=[tsquery],
+        ).order_by('-search_rank')
+
+
+class FallbackBackend:
+    create_sql = []
+    drop_sql = []
+
+    def index(self, cursor, rows):
+        pass
+
+    def remove(self, cursor, pks):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def search(self, queryset, query_words):
+        for w in query_words:
+            queryset = queryset.filter(
+                Q(name__icontains=w) | Q(description__icontains=w) |
+                Q(category__name__icontains=w) | Q(owner__username__icontains=w))
+        return queryset
+
+
+BACKENDS = {
+    'sqlite': SqliteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(conn=None):
+    return BACKENDS.get((conn or connection).vendor, FallbackBackend)()
+
+
+def index_tests(tests):
+    """(Re)index the tests, category and owner should be selected with select_related()."""
+    tests = list(tests)
+    if tests:
+        with connection.cursor() as cursor:
+            get_backend().index(cursor, _rows(tests))
+
+
+def remove_tests(pks):
+    pks = list(pks)
+    if pks:
+        with connection.cursor() as cursor:
+            get_backend().remove(cursor, pks)
+
+
+def rebuild_index(batch_size=1000):
+    from .models import Test
+
+    with connection.cursor() as cursor:
+        get_backend().clear(cursor)
+    indexed = 0
+    tests = Test.objects.select_related('category', 'owner').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(tests.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        index_tests(batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+def search(queryset, query):
+    """
+    Filter the queryset of tests by the query. Results are ordered by relevance,
+    an explicit order_by() after search() replaces it.
+    """
+    query_words = words(query)
+    if not query_words:
+        return queryset
+    return get_backend().search(queryset, query_words)
@@ -0,0 +1,137 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import page_cache, search
+from .models import Categories, Questions, Test
+from .scoring import invalidate_answer_key
+
+_local = threading.local()
+
+
+def questions_changed(test_ids):
+    """Do what the receivers of Questions do, once for all the changed questions of the tests."""
+    test_ids = list(test_ids)
+    Test.objects.filter(pk__in=test_ids).refresh_question_stats()
+    for pk in test_ids:
+        invalidate_answer_key(pk)
+    transaction.on_commit(lambda: [invalidate_answer_key(pk) for pk in test_ids])
+    page_cache.invalidate_test_cards(test_ids)
+    if Test.objects.filter(pk__in=test_ids, is_public=True).exists():
+        page_cache.invalidate_catalog()
+
+
+@contextmanager
+def bulk_question_changes(test_ids):
+    """
+    Mute the receivers of Questions, e.g. for deleting many of them, and call questions_changed() at the end.
+    bulk_create() and bulk_update() send no signals, but still need questions_changed().
+    """
+    _local.muted = getattr(_local, 'muted', 0) + 1
+    try:
+        yield
+    finally:
+        _local.muted -= 1
+    questions_changed(test_ids)
+
+
+def _muted():
+    return getattr(_local, 'muted', 0) > 0
+
+
+def _cascaded(origin):
+    """The question is deleted with its test, e.g. by deleting the test or its owner, the receivers of Test run."""
+    return origin is not None and not isinstance(origin, Questions) and getattr(origin, 'model', None) is not Questions
+
+
+@receiver(post_save, sender=Questions)
+@receiver(post_delete, sender=Questions)
+def refresh_test_question_stats(sender, instance, origin=None, **kwargs):
+    if _muted() or _cascaded(origin):
+        return
+    Test.objects.filter(pk=instance.test_id).refresh_question_stats()
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_test_answer_key(sender, instance, **kwargs):
+    # once more after commit, other workers could cache the old rows while the transaction was open
+    invalidate_answer_key(instance.pk)
+    transaction.on_commit(lambda: invalidate_answer_key(instance.pk))
+
+
+@receiver(post_save, sender=Questions)
+@receiver(post_delete, sender=Questions)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    if _muted():
+        return
+    invalidate_answer_key(instance.test_id)
+    transaction.on_commit(lambda: invalidate_answer_key(instance.test_id))
+
+
+@receiver(post_save, sender=Test)
+def index_test(sender, instance, **kwargs):
+    search.index_tests(Test.objects.filter(pk=instance.pk).select_related('category', 'owner'))
+
+
+@receiver(post_delete, sender=Test)
+def remove_test_from_index(sender, instance, **kwargs):
+    search.remove_tests([instance.pk])
+
+
+def _refresh_tests(tests):
+    """Reindex tests and drop their cards, e.g. after their category or owner is renamed."""
+    tests = list(tests.select_related('category', 'owner'))
+    if tests:
+        search.index_tests(tests)
+        page_cache.invalidate_test_cards([t.pk for t in tests])
+        page_cache.invalidate_catalog()
+
+
+@receiver(post_save, sender=Categories)
+def reindex_category_tests(sender, instance, created, **kwargs):
+    if not created:
+        _refresh_tests(Test.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_owner_tests(sender, instance, created, update_fields=None, **kwargs):
+    # last_login is saved on every login, only the username is indexed and shown on cards
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    _refresh_tests(Test.objects.filter(owner=instance))
+
+
+@receiver(post_save, sender=Test)
+def invalidate_test_pages(sender, instance, created, **kwargs):
+    page_cache.invalidate_test_cards([instance.pk])
+    # an updated test could have been public before
+    if instance.is_public or not created:
+        page_cache.invalidate_catalog()
+
+
+@receiver(post_delete, sender=Test)
+def invalidate_deleted_test_pages(sender, instance, **kwargs):
+    page_cache.invalidate_test_cards([instance.pk])
+    if instance.is_public:
+        page_cache.invalidate_catalog()
+
+
+@receiver(post_save, sender=Questions)
+@receiver(post_delete, sender=Questions)
+def invalidate_question_test_pages(sender, instance, created=True, origin=None, **kwargs):
+    # the catalog shows only the number of questions, it changes when one is added or deleted,
+    # invalidate_deleted_test_pages() drops the pages of a deleted test
+    if not created or _muted() or _cascaded(origin):
+        return
+    page_cache.invalidate_test_cards([instance.test_id])
+    if Questions.test.is_cached(instance):
+        is_public = instance.test.is_public
+    else:
+        is_public = Test.objects.filter(pk=instance.test_id, is_public=True).exists()
+    if is_public:
+        page_cache.invalidate_catalog()
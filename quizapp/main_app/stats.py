@@ -0,0 +1,75 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from .models import Questions, QuestionStats, TestStats, PassedTests
+
+
+def _add_grade(stats, grade, count=1):
+    stats.attempts += count
+    stats.grade_sum += grade * count
+    stats.min_grade = grade if stats.min_grade is None else min(stats.min_grade, grade)
+    stats.max_grade = grade if stats.max_grade is None else max(stats.max_grade, grade)
+    stats.grade_histogram[min(int(grade), 100)] += count
+
+
+def _per_question(counter, question_ids):
+    values = {counter[q] for q in question_ids}
+    if len(values) == 1:
+        return Value(values.pop())
+    return Case(*[When(question_id=q, then=Value(counter[q])) for q in question_ids if counter[q]],
+                default=Value(0), output_field=IntegerField())
+
+
+def record_results(test_id, submissions):
+    """
+    Add submissions of one test to its statistics.
+    submissions is a list of (grade, ids of answered questions, ids of correctly answered questions).
+    """
+    attempts, correct = Counter(), Counter()
+    # callers usually save the results in the same transaction
+    with transaction.atomic(savepoint=False):
+        stats, _ = TestStats.objects.select_for_update().get_or_create(test_id=test_id)
+        for grade, question_ids, correct_ids in submissions:
+            _add_grade(stats, Decimal(str(grade)))
+            attempts.update(question_ids)
+            correct.update(correct_ids)
+        stats.save()
+        if not attempts:
+            return
+        updated = QuestionStats.objects.filter(question_id__in=attempts).update(
+            attempts=F('attempts') + _per_question(attempts, attempts),
+            correct=F('correct') + _per_question(correct, attempts))
+        if updated < len(attempts):
+            # first attempt of some questions, skipping the ones deleted in the meantime
+            existing = QuestionStats.objects.filter(question_id__in=attempts).values_list('question_id', flat=True)
+            new = Questions.objects.filter(pk__in=attempts, test_id=test_id).exclude(pk__in=existing)
+            QuestionStats.objects.bulk_create([
+                QuestionStats(question_id=q, test_id=test_id, attempts=attempts[q], correct=correct[q])
+                for q in new.values_list('pk', flat=True)
+            ], ignore_conflicts=True)
+
+
+def correct_question_ids(key, result):
+    return [q.id for q, ok in zip(key.questions, result.is_correct) if ok]
+
+
+def rebuild_test_stats(tests):
+    """
+    Recalculate grade statistics of the tests from PassedTests.
+    Questions statistics can't be restored, PassedTests has no answers.
+    """
+    rebuilt = 0
+    for test in tests:
+        stats = TestStats(test=test)
+        grades = PassedTests.objects.filter(test=test).order_by().values_list('grade').annotate(count=Count('pk'))
+        for grade, count in grades:
+            _add_grade(stats, grade, count)
+        with transaction.atomic():
+            TestStats.objects.filter(test=test).delete()
+            if stats.attempts:
+                stats.save()
+                rebuilt += 1
+    return rebuilt
@@ -0,0 +1,37 @@
+"""
+Compile all templates ahead of the first request, used by the warmup_templates command and wsgi.py.
+
+With the cached loader every worker parses a template only once, on the first request that renders it,
+warming up moves that cost to the start of the worker.
+"""
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+
+def template_names(engine):
+    names = set()
+    for loader in engine.engine.template_loaders:
+        for directory in loader.get_dirs() if hasattr(loader, 'get_dirs') else ():
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    names.add(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """Load all templates of the Django engines, returns (number of compiled templates, list of failed names)."""
+    compiled, failed = 0, []
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                # e.g. templates of libraries which aren't installed or files which aren't templates
+                failed.append(name)
+            else:
+                compiled += 1
+    return compiled, failed
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, TestCase
+from main_app.benchmark import make_answer_key, percentile, run_benchmark, run_editor_benchmark, run_session_benchmark, \
+    seed, summarize
+from main_app.models import PassedTests, Test
+from main_app.template_warmup import template_names, warm_templates
+from users.models import CustomUser
+
+
+class BenchmarkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(95, percentile(values, 95))
+        self.assertEqual(100, percentile(values, 100))
+        self.assertEqual(7, percentile([7], 99))
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        result = summarize([0.003, 0.001, 0.002], [2, 2, 5], 1)
+        self.assertEqual(3, result['requests'])
+        self.assertEqual(1, result['errors'])
+        self.assertEqual(2.0, result['p50_ms'])
+        self.assertEqual(3.0, result['p99_ms'])
+        self.assertEqual(3, result['queries_per_request'])
+
+    def test_seed_and_run(self):
+        users, test_pks = seed(users=2, tests=3, questions=5)
+        self.assertEqual(3, Test.objects.with_questions().filter(pk__in=test_pks).count())
+        for target in ('html', 'api'):
+            result = run_benchmark(target, users, test_pks, cycles=3, workers=1, seed=1)
+            self.assertEqual(3, result['get']['requests'])
+            self.assertEqual(3, result['post']['requests'])
+            self.assertEqual(0, result['get']['errors'] + result['post']['errors'])
+            self.assertGreater(result['post']['queries_per_request'], 0)
+            self.assertGreater(result['cycles_per_second'], 0)
+        self.assertEqual(6, PassedTests.objects.filter(user__in=users).count())
+
+    def test_session_benchmark(self):
+        test_pk = seed(users=1, tests=1, questions=2)[1][0]
+        CustomUser.objects.create_user(username='session', email='session@test.com', password='testpassword1!')
+        db = run_session_benchmark('db', 'fallback', 'session', 'testpassword1!', test_pk, requests=1)
+        self.assertEqual(1, db['page_view']['session_reads'])
+        self.assertGreater(db['login']['session_writes'], 0)
+        cached = run_session_benchmark('cached_db', 'cookie', 'session', 'testpassword1!', test_pk, requests=1)
+        self.assertEqual(0, cached['page_view']['session_reads'])
+        self.assertEqual(0, cached['page_view']['session_writes'])
+        self.assertLess(cached['page_view']['queries'], db['page_view']['queries'])
+
+    def test_editor_benchmark(self):
+        users, test_pks = seed(users=1, tests=1, questions=10)
+        results = run_editor_benchmark(users[0], test_pks[0], repeat=2)
+        self.assertEqual(['get', 'post_lean', 'post_full'], list(results))
+        self.assertEqual(0, sum(r['errors'] for r in results.values()))
+        self.assertLessEqual(results['post_lean']['queries_per_request'], results['post_full']['queries_per_request'])
+
+    def test_benchmark_templates(self):
+        key = make_answer_key(5)
+        self.assertEqual(5, len(key.questions))
+        self.assertEqual(5, key.max_score)
+        out = StringIO()
+        call_command('benchmark_templates', questions=[1, 5], repeat=2, verbosity=2, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual([('main_app/pass_test.html', 1), ('main_app/result.html', 1),
+                          ('main_app/pass_test.html', 5), ('main_app/result.html', 5)],
+                         [(r['template'], r['questions']) for r in results])
+        self.assertEqual(2, results[0]['uncached']['requests'])
+
+
+class TemplateWarmupTestCase(SimpleTestCase):
+    def test_all_project_templates_compile(self):
+        names = template_names(engines['django'])
+        self.assertIn('main_app/pass_test.html', names)
+        self.assertIn('users/login.html', names)
+        compiled, failed = warm_templates()
+        self.assertGreaterEqual(compiled, len([n for n in names if n.startswith(('main_app/', 'users/'))]))
+        self.assertEqual([], [n for n in failed if n.startswith(('main_app/', 'users/'))])
@@ -131,6 +131,36 @@ class TestQuestionsFormsetTestCase(TestCase):
         self.assertEqual(['This field is required.'], formset.errors[0]['correct_answer'])
         self.assertEqual(['This field is required.'], formset.errors[0]['answer_1'])
 
+    def test_unchanged_questions_post_only_their_id(self):
+        other = Questions.objects.create(question='how', correct_answer='so', answer_1='idk', test=self.test)
+        data = {
+            'question_test-TOTAL_FORMS': '2',
+            'question_test-INITIAL_FORMS': '2',
+            'question_test-MIN_NUM_FORMS': '0',
+            'question_test-MAX_NUM_FORMS': '50',
+            'question_test-0-id': str(self.question.pk),
+            'question_test-1-id': str(other.pk),
+            'question_test-1-question': 'how?',
+            'question_test-1-correct_answer': 'so',
+            'question_test-1-answer_1': 'idk',
+            'question_test-1-value': '2',
+        }
+        formset = TestQuestionsFormset(data=data, instance=self.test)
+        # the questions of the formset, the id and the unique question of the changed one
+        with self.assertNumQueries(3):
+            self.assertTrue(formset.is_valid(), formset.errors)
+        self.assertFalse(formset.forms[0].has_changed())
+        self.assertEqual('why', formset.forms[0]['question'].value())
+        formset.save()
+        self.assertEqual([('why', 'idk3', 1), ('how?', None, 2)],
+                         list(Questions.objects.order_by('pk').values_list('question', 'answer_3', 'value')))
+
+    def test_empty_form_has_no_delete_field(self):
+        formset = TestQuestionsFormset(instance=self.test)
+        self.assertIn('DELETE', formset.forms[0].fields)
+        self.assertNotIn('DELETE', formset.empty_form.fields)
+        self.assertEqual('form-control', formset.empty_form.fields['question'].widget.attrs['class'])
+
 
 class ContactFormTestCase(TestCase):
     def test_valid_data_is_valid(self):
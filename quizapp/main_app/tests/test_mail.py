@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from main_app.mail import enqueue_email, pending_emails, send_queued_emails
+from main_app.models import OutgoingEmail
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP is down')
+
+
+class ClaimCheckingEmailBackend(BaseEmailBackend):
+    """Records whether the emails being sent were still pending for other workers."""
+    pending = None
+
+    def send_messages(self, email_messages):
+        ClaimCheckingEmailBackend.pending = pending_emails().count()
+        return len(email_messages)
+
+
+@override_settings(EMAIL_OUTBOX_EAGER=False)
+class OutboxTestCase(TestCase):
+    def test_enqueue_doesnt_send_an_email(self):
+        email = enqueue_email('subject', 'body', to=['u1@test.com', 'u2@test.com'])
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(['u1@test.com', 'u2@test.com'], email.recipients())
+        self.assertIsNone(email.time_sent)
+
+    def test_contact_form_only_enqueues_an_email(self):
+        data = {'name': 'cat', 'email': 'test@test.com', 'message': 'hello world'}
+        resp = self.client.post(reverse('api:contacts'), data=data)
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(1, OutgoingEmail.objects.filter(time_sent__isnull=True).count())
+
+    def test_command_sends_pending_emails_in_batches(self):
+        for i in range(5):
+            enqueue_email('subject' + str(i), 'body', to=['u1@test.com'])
+        out = StringIO()
+        call_command('send_queued_emails', '--batch-size', '2', stdout=out)
+        self.assertEqual(5, len(mail.outbox))
+        self.assertEqual(['subject0', 'subject1', 'subject2', 'subject3', 'subject4'],
+                         [m.subject for m in mail.outbox])
+        self.assertFalse(OutgoingEmail.objects.filter(time_sent__isnull=True).exists())
+        self.assertIn('Sent 5 email(s), 0 failed.', out.getvalue())
+        self.assertEqual((0, 0), send_queued_emails())
+
+    @override_settings(EMAIL_BACKEND='main_app.tests.test_mail.FailingEmailBackend')
+    def test_failed_email_is_retried_later(self):
+        email = enqueue_email('subject', 'body', to=['u1@test.com'])
+        self.assertEqual((0, 1), send_queued_emails())
+        email.refresh_from_db()
+        self.assertEqual(1, email.attempts)
+        self.assertEqual('SMTP is down', email.last_error)
+        self.assertGreater(email.send_after, timezone.now() + timedelta(seconds=30))
+        self.assertIsNone(email.time_sent)
+        # isn't picked up again before the backoff is over
+        self.assertEqual((0, 0), send_queued_emails())
+
+    @override_settings(EMAIL_BACKEND='main_app.tests.test_mail.ClaimCheckingEmailBackend')
+    def test_emails_are_claimed_before_delivery(self):
+        email = enqueue_email('subject', 'body', to=['u1@test.com'])
+        self.assertEqual((1, 0), send_queued_emails())
+        self.assertEqual(0, ClaimCheckingEmailBackend.pending)
+        email.refresh_from_db()
+        self.assertIsNotNone(email.time_sent)
+
+    @override_settings(EMAIL_OUTBOX_EAGER=True)
+    def test_eager_mode_sends_at_once(self):
+        email = enqueue_email('subject', 'body', to=['u1@test.com'])
+        self.assertEqual(1, len(mail.outbox))
+        email.refresh_from_db()
+        self.assertIsNotNone(email.time_sent)
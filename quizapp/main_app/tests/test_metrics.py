@@ -0,0 +1,79 @@
+from collections import deque
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from main_app import metrics, middleware
+from main_app.models import Categories, Test, Questions
+from main_app.scoring import invalidate_answer_key
+from users.models import CustomUser
+
+
+class RequestMetricsMiddlewareTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='user', email='user@test.com', password='testpassword1!',
+                                                  email_confirmed=True)
+        cls.test = Test.objects.create(name='test', owner=cls.user, category=Categories.objects.create(name='c'))
+        Questions.objects.create(question='q', correct_answer='a', answer_1='b', test=cls.test)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_request_is_recorded(self):
+        self.client.get(reverse('tests:tests'))
+        self.client.get('/no-such-page/')
+        first, second = metrics.recent_requests()
+        self.assertEqual(('tests:tests', 'GET', 200), (first.view, first.method, first.status))
+        self.assertGreater(first.sql_count, 0)
+        self.assertGreater(first.duration, 0)
+        self.assertGreaterEqual(first.duration, first.sql_time)
+        self.assertEqual(('<unresolved>', 404), (second.view, second.status))
+
+    def test_cache_hits_are_counted(self):
+        self.client.force_login(self.user)
+        invalidate_answer_key(self.test.pk)
+        url = reverse('tests:pass_test', kwargs={'pk': self.test.pk})
+        self.client.get(url)
+        self.client.get(url)
+        miss, hit = [r for r in metrics.recent_requests() if r.view == 'tests:pass_test']
+        self.assertEqual((0, 1), (miss.cache_hits, miss.cache_misses))
+        self.assertEqual((1, 0), (hit.cache_hits, hit.cache_misses))
+
+    def test_ring_buffer_keeps_last_requests(self):
+        buffer, metrics._buffer = metrics._buffer, deque(maxlen=2)
+        try:
+            for _ in range(3):
+                self.client.get(reverse('tests:contacts'))
+            self.assertEqual(2, len(metrics.recent_requests()))
+            self.assertIn('quizapp_requests_total{view="tests:contacts",method="GET",status="2xx"} 3',
+                          metrics.render_prometheus())
+        finally:
+            metrics._buffer = buffer
+
+    def test_slow_request_is_logged_with_queries(self):
+        slow, middleware.METRICS_SLOW_REQUEST = middleware.METRICS_SLOW_REQUEST, 0
+        try:
+            with self.assertLogs('main_app.metrics', 'WARNING') as logs:
+                self.client.get(reverse('tests:tests'))
+        finally:
+            middleware.METRICS_SLOW_REQUEST = slow
+        self.assertIn('Slow request GET /tests/ (tests:tests) 200', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_fast_request_is_not_logged(self):
+        with self.assertNoLogs('main_app.metrics', 'WARNING'):
+            self.client.get(reverse('tests:contacts'))
+
+    def test_render_prometheus(self):
+        self.client.get(reverse('tests:tests'))
+        text = metrics.render_prometheus()
+        self.assertIn('# TYPE quizapp_request_duration_seconds summary', text)
+        self.assertIn('quizapp_request_duration_seconds{view="tests:tests",method="GET",quantile="0.99"}', text)
+        self.assertIn('quizapp_request_duration_seconds_count{view="tests:tests",method="GET"} 1', text)
+        self.assertIn('# TYPE quizapp_sql_queries_total counter', text)
+        self.assertIn('quizapp_cache_hits_total{view="tests:tests",method="GET"} 0', text)
+
+    def test_labels_are_escaped(self):
+        self.assertEqual('{view="a\\"b\\\\c"}', metrics._labels(view='a"b\\c'))
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.db.utils import IntegrityError
 from django.test import TestCase
 from main_app.models import Categories, ValidationError, Test, Questions, PassedTests
@@ -92,3 +95,48 @@ class PassedTestTestCase(TestCase):
     def test_passed_test_str_returns_long_string(self):
         s = f"user1's grade is 99.33. Scored 50 out of 200500 points."
         self.assertEqual(s, str(self.pt))
+
+
+class TestQuestionStatsTestCase(TestCase):
+    def setUp(self):
+        self.t = Test.objects.create(name='Test')
+        self.q1 = Questions.objects.create(question='why', correct_answer='because', answer_1='idk1',
+                                           value=2, test=self.t)
+        self.q2 = Questions.objects.create(question='how', correct_answer='so', answer_1='idk1',
+                                           value=3, test=self.t)
+
+    def test_creating_questions_updates_counters(self):
+        self.t.refresh_from_db()
+        self.assertEqual(2, self.t.question_count)
+        self.assertEqual(5, self.t.max_score)
+        self.assertTrue(self.t.has_questions)
+
+    def test_updating_question_value_updates_max_score(self):
+        self.q1.value = 10
+        self.q1.save()
+        self.t.refresh_from_db()
+        self.assertEqual(2, self.t.question_count)
+        self.assertEqual(13, self.t.max_score)
+
+    def test_deleting_questions_updates_counters(self):
+        self.q1.delete()
+        self.t.refresh_from_db()
+        self.assertEqual(1, self.t.question_count)
+        self.assertEqual(3, self.t.max_score)
+        self.q2.delete()
+        self.t.refresh_from_db()
+        self.assertEqual(0, self.t.question_count)
+        self.assertEqual(0, self.t.max_score)
+        self.assertFalse(self.t.has_questions)
+
+    def test_counters_dont_change_time_update(self):
+        time_update = Test.objects.get(pk=self.t.pk).time_update
+        Questions.objects.create(question='what', correct_answer='it', answer_1='idk1', test=self.t)
+        self.assertEqual(time_update, Test.objects.get(pk=self.t.pk).time_update)
+
+    def test_recount_questions_command_fixes_stale_counters(self):
+        Test.objects.filter(pk=self.t.pk).update(question_count=0, max_score=0)
+        call_command('recount_questions', stdout=StringIO())
+        self.t.refresh_from_db()
+        self.assertEqual(2, self.t.question_count)
+        self.assertEqual(5, self.t.max_score)
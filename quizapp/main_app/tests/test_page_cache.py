@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from main_app import page_cache
+from main_app.models import Categories, Test, Questions
+from users.models import CustomUser
+
+
+class AnonymousPageCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(username='owner', email='owner@test.com',
+                                                   password='testpassword1!', email_confirmed=True)
+        cls.user = CustomUser.objects.create_user(username='user', email='user@test.com',
+                                                  password='testpassword1!', email_confirmed=True)
+        cls.category = Categories.objects.create(name='history')
+        cls.test = Test.objects.create(name='roman empire', owner=cls.owner, category=cls.category)
+        cls.question = Questions.objects.create(question='q', correct_answer='a', answer_1='b', test=cls.test)
+        cls.url = reverse('tests:tests')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_served_from_cache(self):
+        first = self.client.get(self.url, {'ordering': 'name'})
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {'ordering': 'name'})
+        self.assertEqual(first.content, second.content)
+        self.assertIsNone(second.context)
+        # other params are another page
+        self.assertIsNotNone(self.client.get(self.url, {'ordering': '-name'}).context)
+
+    def test_home_page_is_cached(self):
+        self.client.get(reverse('tests:home'))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse('tests:home'))
+        self.assertContains(resp, 'Welcome to Quizapp')
+
+    def test_logged_in_users_get_rendered_pages(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        resp = self.client.get(self.url)
+        self.assertIsNotNone(resp.context)
+        self.assertContains(resp, 'user')
+
+    def test_pages_with_messages_are_not_cached(self):
+        self.client.cookies['messages'] = 'anything'
+        self.client.get(reverse('tests:home'))
+        self.assertIsNotNone(self.client.get(reverse('tests:home')).context)
+
+    def test_public_test_changes_invalidate_catalog(self):
+        self.client.get(self.url)
+        new = Test.objects.create(name='greek myths', owner=self.owner, category=self.category)
+        Questions.objects.create(question='q', correct_answer='a', answer_1='b', test=new)
+        self.assertContains(self.client.get(self.url), 'Greek Myths')
+        test = Test.objects.get(pk=self.test.pk)
+        test.name = 'byzantine empire'
+        test.save()
+        self.assertContains(self.client.get(self.url), 'Byzantine Empire')
+        new.delete()
+        self.assertNotContains(self.client.get(self.url), 'Greek Myths')
+
+    def test_private_test_and_question_edits_dont_invalidate_catalog(self):
+        version = page_cache.catalog_version()
+        private = Test.objects.create(name='private', owner=self.owner, is_public=False)
+        Questions.objects.create(question='q', correct_answer='a', answer_1='b', test=private)
+        self.question.question = 'another'
+        self.question.save()
+        self.assertEqual(version, page_cache.catalog_version())
+
+    def test_question_count_changes_invalidate_catalog(self):
+        self.client.get(self.url)
+        Questions.objects.create(question='q2', correct_answer='a', answer_1='b', test=self.test)
+        self.assertContains(self.client.get(self.url), '2 questions')
+        self.question.delete()
+        self.assertContains(self.client.get(self.url), '1 questions')
+
+    def test_deleted_questions_and_tests_invalidate_catalog(self):
+        new = Test.objects.create(name='greek myths', owner=self.owner, category=self.category)
+        Questions.objects.create(question='q', correct_answer='a', answer_1='b', test=new)
+        self.client.get(self.url)
+        Questions.objects.filter(test=self.test).delete()
+        self.assertNotContains(self.client.get(self.url), 'Roman Empire')
+        # the questions are deleted with the tests of the owner, the receivers of Test drop the pages
+        self.owner.delete()
+        self.assertNotContains(self.client.get(self.url), 'Greek Myths')
+
+    def test_category_and_owner_renames_invalidate_cards(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.category.name = 'ancient history'
+        self.category.save()
+        self.assertContains(self.client.get(self.url), 'Ancient History')
+        self.owner.username = 'historian'
+        self.owner.save()
+        self.assertContains(self.client.get(self.url), 'by historian')
+
+    def test_cards_are_cached_for_everyone_but_owner(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        # update() sends no signals, so the cached card is kept
+        Test.objects.filter(pk=self.test.pk).update(description='changed description')
+        self.assertNotContains(self.client.get(self.url), 'changed description')
+        self.client.force_login(self.owner)
+        resp = self.client.get(self.url)
+        self.assertContains(resp, 'changed description')
+        self.assertContains(resp, reverse('tests:test_detail', kwargs={'pk': self.test.pk}))
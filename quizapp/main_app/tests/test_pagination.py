@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from main_app.models import Test, Categories
+from main_app.pagination import KeysetPaginator, InvalidCursor
+from users.models import CustomUser
+
+
+class KeysetPaginatorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.c = Categories.objects.create(name='category')
+        now = timezone.now()
+        for i in range(25):
+            t = Test.objects.create(name=f'test{i % 7}', owner=cls.u, category=cls.c if i % 3 else None)
+            # a few equal values to check the pk tiebreaker
+            Test.objects.filter(pk=t.pk).update(time_update=now - timedelta(minutes=i // 2))
+
+    def walk(self, queryset, per_page=4):
+        paginator = KeysetPaginator(queryset, per_page)
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append([t.pk for t in page])
+            if not page.has_next():
+                return pages, page
+            cursor = page.next_cursor
+
+    def test_pages_follow_the_ordering(self):
+        for ordering in (['-time_update'], ['name'], ['-name', 'time_update'], ['category'], ['-category'],
+                         ['owner__username', '-pk']):
+            queryset = Test.objects.order_by(*ordering)
+            pages, _ = self.walk(queryset)
+            # the pk is added in the direction of the last field
+            tiebreaker = '-pk' if ordering[-1].startswith('-') else 'pk'
+            expected = list(queryset.order_by(*ordering, tiebreaker).values_list('pk', flat=True))
+            self.assertEqual(expected, sum(pages, []), ordering)
+            self.assertEqual([4] * 6 + [1], [len(p) for p in pages], ordering)
+
+    def test_previous_pages_go_back(self):
+        queryset = Test.objects.order_by('-time_update')
+        pages, last = self.walk(queryset)
+        paginator = KeysetPaginator(queryset, 4)
+        back = []
+        page = last
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            back.append([t.pk for t in page])
+        self.assertEqual(pages[-2::-1], back)
+
+    def test_last_page(self):
+        queryset = Test.objects.order_by('-time_update')
+        pages, _ = self.walk(queryset)
+        paginator = KeysetPaginator(queryset, 4)
+        last = paginator.page(paginator.page().last_cursor)
+        # the last page is full, counted from the end
+        self.assertEqual(sum(pages, [])[-4:], [t.pk for t in last])
+        self.assertFalse(last.has_next())
+        self.assertEqual(sum(pages, [])[-8:-4], [t.pk for t in paginator.page(last.previous_cursor)])
+
+    def test_cursor_is_stable_when_tests_are_added(self):
+        queryset = Test.objects.order_by('-time_update')
+        paginator = KeysetPaginator(queryset, 4)
+        first = paginator.page()
+        second = [t.pk for t in paginator.page(first.next_cursor)]
+        Test.objects.create(name='new', owner=self.u)
+        self.assertEqual(second, [t.pk for t in paginator.page(first.next_cursor)])
+
+    def test_no_count_and_no_offset(self):
+        paginator = KeysetPaginator(Test.objects.order_by('-time_update'), 4)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as ctx:
+            paginator.page(cursor)
+        self.assertEqual(1, len(ctx.captured_queries))
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('COUNT', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Test.objects.order_by('-time_update'), 4)
+        for cursor in ('garbage!', 'WzFd', 'eyJ2IjpbMV19', 'eyJ2IjpbInRvZGF5IiwxXX0'):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+        self.client.force_login(self.u)
+        resp = self.client.get(reverse('tests:my_tests'), {'cursor': 'garbage!'})
+        self.assertEqual(404, resp.status_code)
+        resp = self.client.get(reverse('api:tests_my'), {'cursor': 'garbage!'})
+        self.assertEqual(404, resp.status_code)
+
+    def test_api_links(self):
+        self.client.force_login(self.u)
+        resp = self.client.get(reverse('api:tests_my'), {'ordering': 'name'})
+        self.assertIsNone(resp.data['previous'])
+        seen = [t['id'] for t in resp.data['results']]
+        while resp.data['next']:
+            self.assertIn('ordering=name', resp.data['next'])
+            resp = self.client.get(resp.data['next'])
+            seen += [t['id'] for t in resp.data['results']]
+        self.assertEqual(25, len(set(seen)))
+        self.assertIsNotNone(resp.data['previous'])
@@ -0,0 +1,61 @@
+import importlib.util
+import json
+import os
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+
+from main_app.checks import check_session_cache, check_shared_cache
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+
+
+class SettingsProfileTestCase(SimpleTestCase):
+    def test_debug_tools_are_not_loaded_outside_dev(self):
+        self.assertEqual('test', settings.PROFILE)
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+        self.assertNotIn('debug_toolbar.middleware.DebugToolbarMiddleware', settings.MIDDLEWARE)
+        self.assertNotIn('rest_framework.renderers.BrowsableAPIRenderer',
+                         settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'])
+        with self.assertRaises(NoReverseMatch):
+            reverse('djdt:render_panel')
+
+    # starts interpreters on the database and the cache of the settings instead of the test ones
+    @unittest.skipUnless(os.environ.get('QUIZAPP_BENCHMARK_TESTS'), 'set QUIZAPP_BENCHMARK_TESTS=1 to run benchmarks')
+    @unittest.skipUnless(importlib.util.find_spec('debug_toolbar'), 'debug_toolbar is not installed')
+    def test_benchmark_startup_compares_profiles(self):
+        out = StringIO()
+        call_command('benchmark_startup', runs=1, requests=1, stdout=out)
+        profiles = json.loads(out.getvalue())['profiles']
+        self.assertTrue(profiles['dev']['debug_toolbar_imported'])
+        self.assertFalse(profiles['prod']['debug_toolbar_imported'])
+        self.assertLess(profiles['prod']['modules'], profiles['dev']['modules'])
+
+    @override_settings(PROFILE='prod', CACHES=LOCMEM)
+    def test_prod_requires_shared_cache(self):
+        self.assertEqual(['main_app.E001'], [e.id for e in check_shared_cache(None)])
+
+    @override_settings(PROFILE='prod', CACHES=REDIS)
+    def test_prod_with_shared_cache_passes(self):
+        self.assertEqual([], check_shared_cache(None))
+
+    @override_settings(PROFILE='dev', CACHES=LOCMEM)
+    def test_process_cache_is_allowed_outside_prod(self):
+        self.assertEqual([], check_shared_cache(None))
+
+    def test_sessions_are_read_from_the_database_without_shared_cache(self):
+        self.assertEqual('django.contrib.sessions.backends.db', settings.SESSION_ENGINE)
+        self.assertEqual([], check_session_cache(None))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', CACHES=LOCMEM)
+    def test_cached_sessions_require_shared_cache(self):
+        self.assertEqual(['main_app.W001'], [e.id for e in check_session_cache(None)])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', CACHES=REDIS)
+    def test_cached_sessions_with_shared_cache_pass(self):
+        self.assertEqual([], check_session_cache(None))
@@ -0,0 +1,46 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from main_app.models import Test, Questions, PassedTests
+from main_app.query_audit import UnsupportedDatabase, explain
+from users.models import CustomUser
+
+
+class AuditQueryPlansTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        for i in range(25):
+            t = Test.objects.create(name=f'test{i}', owner=cls.u)
+            Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=t)
+            PassedTests.objects.create(test=t, user=cls.u, grade=100, score=1, max_score=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hot_paths_use_indexes(self):
+        out = StringIO()
+        call_command('audit_query_plans', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+        self.assertIn("tests:tests {'cursor'", out.getvalue())
+        self.assertIn("api:passed {'cursor'", out.getvalue())
+
+    def test_explain_finds_full_scans(self):
+        # description is not indexed, search goes through main_app.search
+        finding = explain('SELECT id FROM main_app_test WHERE description = %s', ['cat'])
+        self.assertEqual(['main_app_test'], finding.full_scans)
+        finding = explain('SELECT id FROM main_app_test WHERE description = %s', ['cat'], ['main_app_test'])
+        self.assertEqual([], finding.full_scans)
+        finding = explain('SELECT id FROM main_app_test WHERE owner_id = %s ORDER BY time_update DESC', [1])
+        self.assertEqual([], finding.full_scans)
+
+    def test_unsupported_database_is_reported(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            with self.assertRaisesMessage(CommandError, 'Query plans of mysql can not be audited'):
+                call_command('audit_query_plans', stdout=StringIO())
+            with self.assertRaises(UnsupportedDatabase):
+                explain('SELECT id FROM main_app_test', [])
@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from main_app.benchmark import question_editor_data
+from main_app.models import Questions
+from main_app.tests.utils import QueryCountMixin, cached_sessions, get_streamed, seed_catalog, submission
+
+
+@cached_sessions()
+class MainAppQueryCountTestCase(QueryCountMixin, TestCase):
+    """
+    Number of queries of every page doesn't depend on the amount of data:
+    50 tests with 30 questions each, 100 results.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.user, cls.test = seed_catalog()
+        cls.answers = submission(cls.test.pk, ['yes'] * 30)
+
+    def setUp(self):
+        cache.clear()
+
+    def check(self, cases):
+        for limit, method, url, data in cases:
+            with self.subTest(url=url, method=method, data=data):
+                resp = self.assertMaxQueries(limit, getattr(self.client, method), url, data)
+                self.assertLess(resp.status_code, 400)
+
+    def test_anonymous_pages(self):
+        pk = {'pk': self.test.pk}
+        self.check([
+            (0, 'get', reverse('tests:home'), {}),
+            (1, 'get', reverse('tests:contacts'), {}),
+            (1, 'get', reverse('tests:tests'), {}),
+            (1, 'get', reverse('tests:tests'), {'ordering': 'name'}),
+            (1, 'get', reverse('tests:tests'), {'search': 'test1'}),
+            (1, 'get', reverse('tests:pass_test', kwargs=pk), {}),
+            # savepoint, the result, test and question statistics, release
+            (6, 'post', reverse('tests:pass_test', kwargs=pk), self.answers),
+            (4, 'post', reverse('tests:contacts'),
+             {'name': 'user', 'email': 'user@test.com', 'message': 'hello', 'captcha_0': 'x', 'captcha_1': 'PASSED'}),
+        ])
+
+    def test_owner_pages(self):
+        self.client.force_login(self.owner)
+        pk = {'pk': self.test.pk}
+        self.check([
+            (2, 'get', reverse('tests:home'), {}),
+            (3, 'get', reverse('tests:tests'), {}),
+            (3, 'get', reverse('tests:my_tests'), {}),
+            (3, 'get', reverse('tests:my_tests'), {'ordering': 'category'}),
+            (4, 'get', reverse('tests:passed_tests'), {}),
+            (7, 'get', reverse('tests:test_detail', kwargs=pk), {}),
+            (6, 'get', reverse('tests:test_edit', kwargs=pk), {}),
+            (5, 'get', reverse('tests:test_questions_edit', kwargs=pk), {}),
+            # one changed question, the others post only their id
+            (7, 'post', reverse('tests:test_questions_edit', kwargs=pk), question_editor_data(
+                self.test.pk, {Questions.objects.filter(test=self.test).first().pk: 2})),
+            (3, 'get', reverse('tests:add'), {}),
+            (3, 'get', reverse('tests:pass_test', kwargs=pk), {}),
+            (8, 'post', reverse('tests:pass_test', kwargs=pk), self.answers),
+        ])
+
+    def test_result_page(self):
+        for user in (None, self.owner):
+            if user:
+                self.client.force_login(user)
+            url = self.client.post(reverse('tests:pass_test', kwargs={'pk': self.test.pk}), self.answers).url
+            with self.subTest(user=user):
+                self.check([(2 if user else 0, 'get', url, {})])
+                # the result and the answer key are loaded from the database
+                cache.clear()
+                self.check([(4 if user else 2, 'get', url, {})])
+
+    def test_next_pages(self):
+        self.client.force_login(self.owner)
+        for name, limit in (('tests:tests', 3), ('tests:my_tests', 3), ('tests:passed_tests', 4)):
+            cursor = self.client.get(reverse(name)).context['page_obj'].next_cursor
+            self.check([(limit, 'get', reverse(name), {'cursor': cursor})])
+
+    def test_deleting_a_test(self):
+        # questions, statistics, results, questions (100 per query), the test and its search row,
+        # the receivers of the questions deleted with their test make no queries
+        self.assertMaxQueries(8, self.test.delete)
+        self.assertFalse(Questions.objects.filter(test_id=self.test.pk).exists())
+
+    def test_import_and_export_pages(self):
+        self.client.force_login(self.owner)
+        pk = {'pk': self.test.pk}
+        content = 'question,correct_answer,answer_1\n' + ''.join(f'imported{n},yes,no\n' for n in range(100))
+        self.check([
+            (2, 'get', reverse('tests:test_questions_import', kwargs=pk), {}),
+            (8, 'post', reverse('tests:test_questions_import', kwargs=pk),
+             {'file': SimpleUploadedFile('questions.csv', content.encode())}),
+            # the 130 questions of the test are deleted 100 per query
+            (11, 'post', reverse('tests:test_questions_import', kwargs=pk),
+             {'file': SimpleUploadedFile('questions.csv', content.encode()), 'replace': 'on'}),
+        ])
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(format=fmt):
+                # the questions are read while the response is streamed
+                resp, content = self.assertMaxQueries(3, get_streamed, self.client, reverse(
+                    'tests:test_questions_export', kwargs=pk), {'format': fmt})
+                self.assertEqual(200, resp.status_code)
+                rows = Questions.objects.filter(test=self.test).count() + (fmt == 'csv')
+                self.assertEqual(rows, len(content.decode().splitlines()))
@@ -0,0 +1,218 @@
+import json
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from main_app import page_cache
+from main_app.models import Test, Questions
+from main_app.questions_bulk import export_questions, import_questions, file_format, apply_questions_batch
+from main_app.scoring import get_answer_key
+from main_app.tests.utils import QueryCountMixin
+from users.models import CustomUser
+
+CSV = '''question,correct_answer,answer_1,answer_2,answer_3,value
+why,because,idk,,,2
+"how, exactly",so,idk,maybe,no,
+'''
+
+
+def upload(content, name='questions.csv'):
+    return SimpleUploadedFile(name, content.encode())
+
+
+class QuestionsBulkTestCase(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.t = Test.objects.create(name='test1', owner=cls.u)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_csv_is_imported_and_exported_back(self):
+        self.assertEqual((2, []), import_questions(self.t, upload(CSV), 'csv'))
+        self.assertEqual([('why', None, 2), ('how, exactly', 'no', 1)],
+                         list(Questions.objects.order_by('pk').values_list('question', 'answer_3', 'value')))
+        self.assertEqual(CSV.replace('no,\n', 'no,1\n').replace('\n', '\r\n'),
+                         ''.join(export_questions(self.t.pk, 'csv')))
+
+    def test_jsonl_is_imported_and_exported_back(self):
+        import_questions(self.t, upload(CSV), 'csv')
+        exported = ''.join(export_questions(self.t.pk, 'jsonl'))
+        self.assertEqual({'question': 'why', 'correct_answer': 'because', 'answer_1': 'idk', 'answer_2': None,
+                          'answer_3': None, 'value': 2}, json.loads(exported.splitlines()[0]))
+        t2 = Test.objects.create(name='test2', owner=self.u)
+        self.assertEqual(2, import_questions(t2, upload(exported, 'questions.jsonl'), 'jsonl').created)
+
+    def test_invalid_rows_are_reported_and_nothing_is_imported(self):
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.t)
+        content = CSV + ',no question,idk\nwhat,a,b,c,d,many\nwhat,a,b\nwhat,a,b\n'
+        result = import_questions(self.t, upload(content), 'csv')
+        self.assertEqual(0, result.created)
+        self.assertEqual([2, 4, 5, 7], [line for line, _ in result.errors])
+        self.assertEqual('The question is already in the test.', result.errors[0][1])
+        self.assertIn('question: This field cannot be blank.', result.errors[1][1])
+        self.assertIn('value:', result.errors[2][1])
+        self.assertEqual(1, Questions.objects.count())
+
+    def test_wrong_header_and_lines(self):
+        result = import_questions(self.t, upload('question,answer\nwhy,because\n'), 'csv')
+        self.assertEqual([1], [line for line, _ in result.errors])
+        result = import_questions(self.t, upload('{"question": "why"\n[]\n{"text": "why"}\n', 'q.jsonl'), 'jsonl')
+        self.assertEqual(['The line is not valid JSON.', 'The line must be a JSON object.'],
+                         [error for _, error in result.errors[:2]])
+        self.assertEqual(3, len(result.errors))
+
+    def test_replace_deletes_the_questions_of_the_test(self):
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.t)
+        Questions.objects.create(question='old', correct_answer='because', answer_1='idk', test=self.t)
+        self.assertEqual(2, import_questions(self.t, upload(CSV), 'csv', replace=True).created)
+        self.assertEqual(['why', 'how, exactly'], list(Questions.objects.order_by('pk').values_list('question',
+                                                                                                   flat=True)))
+
+    def test_import_refreshes_the_test(self):
+        self.assertEqual((), get_answer_key(self.t.pk).questions)
+        version = page_cache.catalog_version()
+        import_questions(self.t, upload(CSV), 'csv')
+        self.t.refresh_from_db()
+        self.assertEqual((2, 3), (self.t.question_count, self.t.max_score))
+        self.assertEqual(2, len(get_answer_key(self.t.pk).questions))
+        self.assertGreater(page_cache.catalog_version(), version)
+
+    def test_import_makes_constant_number_of_queries(self):
+        rows = ''.join(f'question {n},yes,no,,,\n' for n in range(300))
+        content = 'question,correct_answer,answer_1,answer_2,answer_3,value\n' + rows
+        # savepoint, existing questions, inserts (split by the limit of variables on SQLite), test stats,
+        # is public, release
+        result = self.assertMaxQueries(8, import_questions, self.t, upload(content), 'csv')
+        self.assertEqual(300, result.created)
+        # the questions of the test are loaded by the deletion collector instead of checking the existing ones,
+        # it deletes their stats with one query and the questions with one query per 100 of them
+        self.assertMaxQueries(12, import_questions, self.t, upload(content), 'csv', replace=True)
+        self.assertEqual(300, Questions.objects.filter(test=self.t).count())
+
+    def test_file_format(self):
+        self.assertEqual(['csv', 'jsonl', 'jsonl', None], [file_format(n) for n in ('a.CSV', 'a.jsonl', 'a.ndjson',
+                                                                                      'a.txt')])
+
+
+class QuestionsBatchTestCase(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.t = Test.objects.create(name='test1', owner=cls.u, is_public=True)
+        cls.q1 = Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=cls.t)
+        cls.q2 = Questions.objects.create(question='how', correct_answer='so', answer_1='idk', test=cls.t)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_questions_are_created_updated_and_deleted(self):
+        get_answer_key(self.t.pk)
+        result = apply_questions_batch(self.t, [{'id': self.q1.pk, 'value': 3},
+                                                {'question': 'how', 'correct_answer': 'a', 'answer_1': 'b'}],
+                                       [self.q2.pk])
+        self.assertTrue(result.ok)
+        created = Questions.objects.get(question='how', correct_answer='a')
+        self.assertEqual([{'id': self.q1.pk, 'status': 'updated'}, {'id': created.pk, 'status': 'created'}],
+                         result.upsert)
+        self.assertEqual([{'id': self.q2.pk, 'status': 'deleted'}], result.delete)
+        self.assertEqual([('why', 'because', 3), ('how', 'a', 1)],
+                         list(Questions.objects.order_by('pk').values_list('question', 'correct_answer', 'value')))
+        self.t.refresh_from_db()
+        self.assertEqual((2, 4), (self.t.question_count, self.t.max_score))
+        self.assertEqual(4, get_answer_key(self.t.pk).max_score)
+
+    def test_invalid_items_are_reported_and_nothing_is_saved(self):
+        other = Questions.objects.create(question='why', correct_answer='because', answer_1='idk',
+                                         test=Test.objects.create(name='test2', owner=self.u))
+        result = apply_questions_batch(self.t, [
+            {'id': self.q1.pk, 'question': 'how'},
+            {'id': other.pk, 'value': 2},
+            {'question': 'new', 'correct_answer': 'a', 'answer_1': 'b'},
+            {'question': 'new', 'correct_answer': 'a', 'answer_1': 'b'},
+            {'question': '', 'text': 'new'},
+            {'id': self.q2.pk, 'value': 'many'},
+        ], [other.pk, self.q2.pk])
+        self.assertFalse(result.ok)
+        # the text of the deleted question is free
+        self.assertEqual([{},
+                          {'id': ['The question is not in the test.']},
+                          {},
+                          {'question': ['The question is already in the test.']}],
+                         result.upsert[:4])
+        self.assertIn('non_field_errors', result.upsert[4])
+        self.assertEqual({'id': ['The question is already changed by the batch.']}, result.upsert[5])
+        self.assertEqual([{'id': ['The question is not in the test.']}, {}], result.delete)
+        self.assertEqual([('why', 1), ('how', 1)], list(Questions.objects.filter(test=self.t).order_by(
+            'pk').values_list('question', 'value')))
+
+    def test_questions_can_be_renamed_and_replaced(self):
+        result = apply_questions_batch(self.t, [{'id': self.q1.pk, 'question': 'what'},
+                                                {'question': 'why', 'correct_answer': 'a', 'answer_1': 'b'}], [])
+        self.assertTrue(result.ok)
+        self.assertEqual(['what', 'how', 'why'], list(Questions.objects.order_by('pk').values_list('question',
+                                                                                                  flat=True)))
+
+    def test_questions_cannot_swap_texts(self):
+        result = apply_questions_batch(self.t, [{'id': self.q1.pk, 'question': 'how'},
+                                                {'id': self.q2.pk, 'question': 'why', 'value': 2}], [])
+        self.assertFalse(result.ok)
+        self.assertEqual(2, len([errors for errors in result.upsert if 'question' in errors]))
+        self.assertEqual([('why', 1), ('how', 1)], list(Questions.objects.order_by('pk').values_list('question',
+                                                                                                    'value')))
+
+    def test_batch_makes_constant_number_of_queries(self):
+        for size in (5, 50):
+            Questions.objects.bulk_create(Questions(question=f'old {size} {n}', correct_answer='yes', answer_1='no',
+                                                    test=self.t) for n in range(size))
+            ids = list(Questions.objects.filter(question__startswith=f'old {size}').values_list('pk', flat=True))
+            upsert = [{'id': pk, 'value': 2} for pk in ids[:size // 2]]
+            upsert += [{'question': f'new {size} {n}', 'correct_answer': 'yes', 'answer_1': 'no'} for n in range(size)]
+            # savepoint, questions, deleted questions (by the collector), delete stats, delete, savepoint, update,
+            # release, insert, test stats, is public, release
+            result = self.assertMaxQueries(12, apply_questions_batch, self.t, upsert, ids[size // 2:])
+            self.assertTrue(result.ok)
+
+
+class QuestionsImportExportViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u1 = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.u2 = CustomUser.objects.create_user(username='user2', email='u2@test.com', password='testpassword1!')
+        cls.t = Test.objects.create(name='test1', owner=cls.u1)
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=cls.t)
+
+    def setUp(self):
+        cache.clear()
+        self.import_url = reverse('tests:test_questions_import', kwargs={'pk': self.t.pk})
+        self.export_url = reverse('tests:test_questions_export', kwargs={'pk': self.t.pk})
+
+    def test_owner_imports_questions(self):
+        self.client.force_login(self.u1)
+        self.assertTemplateUsed(self.client.get(self.import_url), 'main_app/test_questions_import.html')
+        resp = self.client.post(self.import_url, {'file': upload(CSV), 'replace': 'on'})
+        self.assertRedirects(resp, reverse('tests:test_questions_edit', kwargs={'pk': self.t.pk}))
+        self.assertEqual(2, Questions.objects.filter(test=self.t).count())
+
+    def test_errors_are_shown_by_line(self):
+        self.client.force_login(self.u1)
+        resp = self.client.post(self.import_url, {'file': upload(CSV)})
+        self.assertEqual(200, resp.status_code)
+        self.assertContains(resp, 'Line 2: The question is already in the test.')
+        resp = self.client.post(self.import_url, {'file': upload(CSV, 'questions.txt')})
+        self.assertContains(resp, 'Upload a .csv or .jsonl file.')
+
+    def test_owner_exports_questions(self):
+        self.client.force_login(self.u1)
+        resp = self.client.get(self.export_url, {'format': 'jsonl'})
+        self.assertEqual('application/x-ndjson; charset=utf-8', resp['Content-Type'])
+        self.assertEqual('why', json.loads(b''.join(resp.streaming_content))['question'])
+        self.assertEqual(404, self.client.get(self.export_url, {'format': 'xml'}).status_code)
+
+    def test_not_owner_is_redirected(self):
+        self.client.force_login(self.u2)
+        self.assertRedirects(self.client.get(self.export_url), '/')
+        self.assertRedirects(self.client.post(self.import_url, {'file': upload(CSV), 'replace': 'on'}), '/')
+        self.assertEqual(1, Questions.objects.filter(test=self.t).count())
@@ -0,0 +1,104 @@
+import fcntl
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from main_app import results_buffer
+from main_app.models import Test, Questions, PassedTests, TestStats
+from main_app.tests.utils import submission
+from users.models import CustomUser
+
+
+class ResultsBufferTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create(username='user1', email='u1@test.com')
+        cls.t = Test.objects.create(name='test1', owner=cls.u)
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', value=2, test=cls.t)
+        Questions.objects.create(question='how', correct_answer='so', answer_1='idk', value=2, test=cls.t)
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'results.jsonl')
+        buffer_setting = override_settings(RESULTS_BUFFER=self.path)
+        buffer_setting.enable()
+        self.addCleanup(buffer_setting.disable)
+        self.addCleanup(self.dir.cleanup)
+
+    def test_submission_is_buffered_and_grade_is_returned(self):
+        self.client.force_login(self.u)
+        resp = self.client.post(reverse('api:pass', kwargs={'pk': self.t.pk}),
+                                data=submission(self.t.pk, ['because', 'no']))
+        self.assertEqual(50.0, resp.data['results']['grade'])
+        self.assertFalse(PassedTests.objects.exists())
+        with open(self.path) as f:
+            self.assertEqual(1, len(f.readlines()))
+
+    def test_resubmitted_attempt_is_buffered_once_with_its_answers(self):
+        self.client.force_login(self.u)
+        data = submission(self.t.pk, ['because', 'no'])
+        for _ in range(2):
+            self.client.post(reverse('api:pass', kwargs={'pk': self.t.pk}), data=data)
+        results_buffer.append(self.t.pk, self.u.pk, 100, 4, 4, submission_id=results_buffer._read(self.path)[0][
+            'submission_id'])
+        self.assertEqual(1, results_buffer.flush())
+        result = PassedTests.objects.get()
+        self.assertEqual(2, result.score)
+        self.assertEqual([[q.pk, answer, ok] for q, answer, ok in zip(
+            Questions.objects.order_by('pk'), ['because', None], [True, False])], result.answers)
+
+    def test_flush_saves_buffered_results_with_bulk_create(self):
+        for score in range(3):
+            results_buffer.append(self.t.pk, self.u.pk, score * 50, score, 2, duration=score * 10)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(3, results_buffer.flush())
+        inserts = [q for q in queries if q['sql'].startswith('INSERT OR IGNORE INTO "main_app_passedtests"')]
+        self.assertEqual(1, len(inserts))
+        self.assertEqual([(0, 0), (1, 10), (2, 20)],
+                         sorted(PassedTests.objects.values_list('score', 'duration')))
+        self.assertEqual(3, TestStats.objects.get(test=self.t).attempts)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(0, results_buffer.flush())
+
+    def test_interrupted_flush_is_replayed_without_duplicates(self):
+        results_buffer.append(self.t.pk, self.u.pk, 100, 4, 4)
+        rotated = results_buffer._rotate(self.path)
+        # the crash happened after the results were saved, but before the file was removed
+        results_buffer._save(results_buffer._read(rotated), 500)
+        with open(rotated, 'a') as f:
+            f.write('{"submission_id": "cut off')
+        results_buffer.append(self.t.pk, self.u.pk, 50, 2, 4)
+        out = StringIO()
+        call_command('flush_results', stdout=out)
+        self.assertEqual([2, 4], sorted(PassedTests.objects.values_list('score', flat=True)))
+        self.assertEqual(2, TestStats.objects.get(test=self.t).attempts)
+        # only the lock of the flush is left
+        self.assertEqual(['results.jsonl.lock'], os.listdir(self.dir.name))
+
+    def test_flush_holds_the_lock_while_saving(self):
+        results_buffer.append(self.t.pk, self.u.pk, 100, 4, 4)
+        save = results_buffer._save
+
+        def locked_save(*args):
+            with open(self.path + '.lock') as lock, self.assertRaises(BlockingIOError):
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return save(*args)
+
+        with mock.patch.object(results_buffer, '_save', side_effect=locked_save):
+            self.assertEqual(1, results_buffer.flush())
+        self.assertEqual(1, PassedTests.objects.count())
+
+    def test_results_of_deleted_tests_are_skipped(self):
+        t2 = Test.objects.create(name='test2')
+        results_buffer.append(t2.pk, self.u.pk, 100, 1, 1)
+        results_buffer.append(self.t.pk, self.u.pk, 100, 4, 4)
+        t2.delete()
+        self.assertEqual(1, results_buffer.flush())
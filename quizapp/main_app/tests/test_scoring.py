@@ -0,0 +1,168 @@
+import os
+import tempfile
+import time
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from main_app import results_buffer
+from main_app.models import Test, Questions, PassedTests
+from main_app.scoring import load_answer_key, get_answer_key, access_error, score_submission, \
+    answer_key_cache_stats, shuffle_questions, start_attempt, sign_attempt, read_attempt, read_choices, \
+    submit_attempt, load_result, InvalidSubmission, ATTEMPT_MAX_AGE
+from users.models import CustomUser
+
+
+class ScoringTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create(username='user1', email='u1@test.com')
+        cls.t = Test.objects.create(name='test1', owner=cls.u, is_public=False, access_by_link=False)
+        Questions.objects.create(question='why', correct_answer='Because', answer_1='idk', value=1, test=cls.t)
+        Questions.objects.create(question='how', correct_answer='so', answer_1='idk', answer_3='no', value=3,
+                                 test=cls.t)
+        cls.empty = Test.objects.create(name='test2')
+
+    def test_answer_key_is_loaded_with_one_query(self):
+        with self.assertNumQueries(1):
+            key = load_answer_key(self.t.pk)
+        self.assertEqual('test1', key.name)
+        self.assertEqual(self.u.pk, key.owner_id)
+        self.assertEqual(['why', 'how'], [q.question for q in key.questions])
+        self.assertEqual(['so', 'idk', 'no'], key.questions[1].options)
+        self.assertEqual(4, key.max_score)
+
+    def test_shuffle_questions(self):
+        key = load_answer_key(self.t.pk)
+        questions = shuffle_questions(key, 3)
+        self.assertEqual([(q.id, q.question, q.value) for q in key.questions],
+                         [(q.id, q.question, q.value) for q in questions])
+        how = questions[1]
+        self.assertEqual(f'q{how.id}', how.field)
+        self.assertEqual(['idk', 'no', 'so'], sorted(option for _, _, option in how.options))
+        self.assertEqual([(f'a{n}_{how.id}', str(n)) for n in range(3)], [o[:2] for o in how.options])
+        self.assertEqual([key.questions[1].options[i] for i in how.order], [o for _, _, o in how.options])
+        self.assertEqual(questions, shuffle_questions(key, 3))
+        # the key itself is never shuffled
+        self.assertEqual(['so', 'idk', 'no'], key.questions[1].options)
+
+    def test_missing_test_and_test_without_questions(self):
+        self.assertIsNone(load_answer_key(0))
+        self.assertEqual((), load_answer_key(self.empty.pk).questions)
+        self.assertEqual('You cannot pass the test. Test does not exist.', access_error(None, AnonymousUser()))
+        self.assertEqual('You cannot pass the test. Test have no questions.',
+                         access_error(load_answer_key(self.empty.pk), AnonymousUser()))
+
+    def test_private_test_is_accessible_only_by_owner(self):
+        key = load_answer_key(self.t.pk)
+        self.assertEqual('You cannot pass the test. Test is not accessible.', access_error(key, AnonymousUser()))
+        self.assertIsNone(access_error(key, self.u))
+
+    def test_read_choices_maps_shown_indexes_to_options(self):
+        key = load_answer_key(self.t.pk)
+        attempt = read_attempt(key, sign_attempt(key, start_attempt(key)))
+        why, how = shuffle_questions(key, attempt.seed)
+        data = {why.field: str(why.order.index(0)), how.field: str(how.order.index(2)), 'q0': '1'}
+        self.assertEqual([0, 2], read_choices(key, data, attempt))
+        self.assertEqual([None, None], read_choices(key, {why.field: '5', how.field: 'no'}, attempt))
+
+    def test_read_attempt_rejects_forged_or_outdated_tokens(self):
+        key = load_answer_key(self.t.pk)
+        attempt = start_attempt(key)
+        changed = key._replace(questions=key.questions[:1])
+        for token in (None, 'attempt', sign_attempt(key, attempt) + 'x', sign_attempt(changed, attempt),
+                      sign_attempt(key, attempt._replace(test_id=self.empty.pk))):
+            with self.subTest(token=token), self.assertRaises(InvalidSubmission):
+                read_attempt(key, token)
+        token = sign_attempt(key, attempt)
+        with mock.patch('time.time', return_value=time.time() + ATTEMPT_MAX_AGE + 1), \
+                self.assertRaisesMessage(InvalidSubmission, 'The time to pass the test is over'):
+            read_attempt(key, token)
+
+    def test_attempt_duration(self):
+        attempt = start_attempt(load_answer_key(self.t.pk))._replace(started=100.0)
+        self.assertEqual(12, attempt.duration(112.9))
+        self.assertEqual(0, attempt.duration(99))
+
+    def test_score_submission_doesnt_make_queries(self):
+        key = load_answer_key(self.t.pk)
+        with self.assertNumQueries(0):
+            result = score_submission(key, [0, 2])
+        self.assertEqual((1, 1, 4, 25.0), (result.score, result.correct, result.max_score, result.grade))
+        self.assertEqual((True, False), result.is_correct)
+        self.assertEqual(('Because', 'no'), result.answers)
+        self.assertEqual((None, 'so'), score_submission(key, [None, 0]).answers)
+
+
+class AnswerKeyCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.t = Test.objects.create(name='test1')
+        self.q = Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=self.t)
+
+    def test_second_lookup_is_served_from_cache(self):
+        stats = answer_key_cache_stats()
+        get_answer_key(self.t.pk)
+        with self.assertNumQueries(0):
+            key = get_answer_key(self.t.pk)
+        self.assertEqual('because', key.questions[0].correct_answer)
+        self.assertEqual(stats['hits'] + 1, answer_key_cache_stats()['hits'])
+        self.assertEqual(stats['misses'] + 1, answer_key_cache_stats()['misses'])
+
+    def test_saving_question_invalidates_the_key(self):
+        get_answer_key(self.t.pk)
+        self.q.correct_answer = 'so'
+        self.q.save()
+        Questions.objects.create(question='how', correct_answer='so', answer_1='idk', value=2, test=self.t)
+        key = get_answer_key(self.t.pk)
+        self.assertEqual(['so', 'so'], [q.correct_answer for q in key.questions])
+        self.assertEqual(3, key.max_score)
+        self.q.delete()
+        self.assertEqual(1, len(get_answer_key(self.t.pk).questions))
+
+    def test_saving_test_invalidates_the_key(self):
+        get_answer_key(self.t.pk)
+        self.t.show_results = False
+        self.t.save()
+        self.assertFalse(get_answer_key(self.t.pk).show_results)
+
+
+class SubmitAttemptTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create(username='user1', email='u1@test.com')
+        cls.t = Test.objects.create(name='test1', owner=cls.u)
+        Questions.objects.create(question='why', correct_answer='because', answer_1='idk', value=1, test=cls.t)
+
+    def setUp(self):
+        cache.clear()
+        self.key = load_answer_key(self.t.pk)
+        self.attempt = start_attempt(self.key)
+
+    def test_attempt_is_saved_once_without_the_cache(self):
+        first = submit_attempt(self.key, AnonymousUser(), self.attempt, [0])
+        cache.clear()
+        second = submit_attempt(self.key, AnonymousUser(), self.attempt, [1])
+        self.assertEqual(first, second)
+        self.assertEqual(1, PassedTests.objects.get(submission_id=first.attempt_id).score)
+        self.assertEqual(first, load_result(first.attempt_id))
+
+    def test_failed_save_leaves_nothing_in_the_cache(self):
+        with mock.patch.object(PassedTests.objects, 'create', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                submit_attempt(self.key, self.u, self.attempt, [0])
+        self.assertIsNone(load_result(uuid.UUID(self.attempt.id)))
+        self.assertEqual(1, submit_attempt(self.key, self.u, self.attempt, [0]).score)
+        self.assertTrue(PassedTests.objects.filter(user=self.u).exists())
+
+    def test_failed_buffering_leaves_nothing_in_the_cache(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(RESULTS_BUFFER=os.path.join(directory, 'results.jsonl')):
+            with mock.patch.object(results_buffer, 'append', side_effect=OSError('disk is full')):
+                with self.assertRaises(OSError):
+                    submit_attempt(self.key, self.u, self.attempt, [0])
+            self.assertIsNone(load_result(uuid.UUID(self.attempt.id)))
+            self.assertEqual(1, submit_attempt(self.key, self.u, self.attempt, [0]).score)
+            self.assertEqual(1, results_buffer.flush())
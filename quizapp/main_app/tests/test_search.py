@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from main_app.models import Test, Questions, Categories
+from main_app.search import search, TABLE
+from users.models import CustomUser
+
+
+class SearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='alice', email='u1@test.com', password='testpassword1!')
+        cls.c = Categories.objects.create(name='history')
+        cls.t1 = Test.objects.create(name='Roman empire', description='emperors and wars', owner=cls.u,
+                                     category=cls.c)
+        cls.t2 = Test.objects.create(name='Wars of the world', description='empire', owner=cls.u)
+        cls.t3 = Test.objects.create(name='Python basics', description='lists and dicts')
+
+    def found(self, query):
+        return list(search(Test.objects.all(), query).values_list('pk', flat=True))
+
+    def test_search_matches_prefixes_of_all_words(self):
+        self.assertEqual({self.t1.pk, self.t2.pk}, set(self.found('emp')))
+        self.assertEqual([self.t1.pk], self.found('roman wars'))
+        self.assertEqual([self.t3.pk], self.found('py'))
+        self.assertEqual([], self.found('roman python'))
+
+    def test_search_ranks_name_matches_first(self):
+        # bm25 prefers the short name over the description
+        self.assertEqual(self.t2.pk, self.found('wars')[0])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual([self.t1.pk], self.found('"roman" (*'))
+        self.assertEqual(3, len(self.found('  *  ')))
+
+    def test_index_follows_test_changes(self):
+        self.t3.name = 'Django basics'
+        self.t3.save()
+        self.assertEqual([], self.found('python'))
+        self.assertEqual([self.t3.pk], self.found('django'))
+        self.t3.delete()
+        self.assertEqual([], self.found('django'))
+
+    def test_index_follows_category_and_owner_renames(self):
+        self.assertEqual([self.t1.pk], self.found('history'))
+        self.c.name = 'ancient'
+        self.c.save()
+        self.assertEqual([self.t1.pk], self.found('ancient'))
+        self.assertEqual([], self.found('history'))
+        self.u.username = 'bob'
+        self.u.save()
+        self.assertEqual({self.t1.pk, self.t2.pk}, set(self.found('bob')))
+        self.assertEqual([], self.found('alice'))
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        self.assertEqual([], self.found('roman'))
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 test(s).', out.getvalue())
+        self.assertEqual([self.t1.pk], self.found('roman'))
+
+    def test_search_pages_serve_from_index(self):
+        for t in (self.t1, self.t2):
+            t.is_public = True
+            t.save()
+            Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=t)
+        resp = self.client.get(reverse('tests:tests'), {'search': 'wars'})
+        self.assertEqual([self.t2, self.t1], list(resp.context['tests']))
+        resp = self.client.get(reverse('api:tests'), {'search': 'wars'})
+        self.assertEqual([self.t2.pk, self.t1.pk], [t['id'] for t in resp.data['results']])
+        resp = self.client.get(reverse('api:tests'), {'search': 'wars', 'ordering': 'name'})
+        self.assertEqual([self.t1.pk, self.t2.pk], [t['id'] for t in resp.data['results']])
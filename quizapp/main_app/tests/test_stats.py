@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from main_app.models import Test, Questions, PassedTests, TestStats, QuestionStats
+from main_app.stats import record_results
+from main_app.tests.utils import submission
+from users.models import CustomUser
+
+
+class TestStatsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = CustomUser.objects.create_user(username='user1', email='u1@test.com', password='testpassword1!')
+        cls.t = Test.objects.create(name='test1', owner=cls.u)
+        cls.q1 = Questions.objects.create(question='why', correct_answer='because', answer_1='idk', test=cls.t)
+        cls.q2 = Questions.objects.create(question='how', correct_answer='so', answer_1='idk', test=cls.t)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_submissions_update_statistics(self):
+        self.client.force_login(self.u)
+        url = reverse('tests:pass_test', kwargs={'pk': self.t.pk})
+        self.client.post(url, data=submission(self.t.pk, ['because', 'so']))
+        self.client.post(url, data=submission(self.t.pk, ['because', 'idk']))
+        self.client.post(url, data=submission(self.t.pk, ['idk', 'idk']))
+        stats = TestStats.objects.get(test=self.t)
+        self.assertEqual(3, stats.attempts)
+        self.assertEqual(50, stats.average_grade)
+        self.assertEqual(50, stats.median_grade)
+        self.assertEqual(0, stats.min_grade)
+        self.assertEqual(100, stats.max_grade)
+        self.assertEqual((3, 2), (self.q1.stats.attempts, QuestionStats.objects.get(question=self.q1).correct))
+        self.assertEqual(1, QuestionStats.objects.get(question=self.q2).correct)
+
+    def test_batch_of_submissions_is_recorded_at_once(self):
+        record_results(self.t.pk, [(100, [self.q1.pk, self.q2.pk], [self.q1.pk, self.q2.pk]),
+                                   (50, [self.q1.pk, self.q2.pk], [self.q2.pk]),
+                                   (75.5, [self.q1.pk, self.q2.pk], [self.q2.pk])])
+        stats = TestStats.objects.get(test=self.t)
+        self.assertEqual(3, stats.attempts)
+        self.assertEqual(75, stats.median_grade)
+        self.assertEqual([1, 3], [QuestionStats.objects.get(question=q).correct for q in (self.q1, self.q2)])
+
+    def test_rebuild_test_stats_command_uses_passed_tests(self):
+        for grade in (10, 20, 20, 90):
+            PassedTests.objects.create(test=self.t, user=self.u, grade=grade, score=1, max_score=2)
+        call_command('rebuild_test_stats', stdout=StringIO())
+        stats = TestStats.objects.get(test=self.t)
+        self.assertEqual(4, stats.attempts)
+        self.assertEqual(35, stats.average_grade)
+        self.assertEqual(20, stats.median_grade)
+
+    def test_detail_view_shows_statistics(self):
+        record_results(self.t.pk, [(100, [self.q1.pk, self.q2.pk], [self.q1.pk])])
+        self.client.force_login(self.u)
+        resp = self.client.get(reverse('tests:test_detail', kwargs={'pk': self.t.pk}))
+        self.assertEqual(1, resp.context['stats'].attempts)
+        self.assertContains(resp, 'Answered correctly 1 out of 1 times')
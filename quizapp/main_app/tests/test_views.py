@@ -1,12 +1,22 @@
+import time
+import uuid
+from unittest import mock
+
 from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase, SimpleTestCase
 from django.test.client import Client
 from main_app.models import Categories, Test, Questions, PassedTests
+from main_app.scoring import load_answer_key, read_attempt
+from main_app.tests.utils import cached_sessions, submission
 from django.urls import reverse
 from users.models import CustomUser
 
 
 class HomeViewTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_view_url_exists_at_desired_location(self):
         resp = self.client.get('/')
         self.assertEqual(resp.status_code, 200)
@@ -109,6 +119,9 @@ class ShowAllTestsListVIewTestCase(TestCase):
                         test=t
                     )
 
+    def setUp(self):
+        cache.clear()
+
     def test_view_url_exists_at_desired_location(self):
         resp = self.client.get('/tests/')
         self.assertEqual(resp.status_code, 200)
@@ -131,13 +144,14 @@ class ShowAllTestsListVIewTestCase(TestCase):
         self.assertEqual(12, len(resp.context['tests']))
 
     def test_one_test_in_second_page_of_pagination(self):
-        resp = self.client.get(reverse('tests:tests') + '?page=2')
+        resp = self.client.get(reverse('tests:tests'))
+        resp = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(1, len(resp.context['tests']))
 
     def test_test0_not_in_queryset_cause_its_private(self):
         resp = self.client.get(reverse('tests:tests'))
-        resp_2 = self.client.get(reverse('tests:tests') + '?page=2')
+        resp_2 = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor})
         t0 = Test.objects.get(name='test0')
         self.assertEqual(resp.status_code, 200)
         self.assertFalse(t0 in resp.context['tests'])
@@ -145,7 +159,7 @@ class ShowAllTestsListVIewTestCase(TestCase):
 
     def test_test4_not_in_queryset_cause_it_doesnt_have_any_questions(self):
         resp = self.client.get(reverse('tests:tests'))
-        resp_2 = self.client.get(reverse('tests:tests') + '?page=2')
+        resp_2 = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor})
         t4 = Test.objects.get(name='test4')
         self.assertEqual(resp.status_code, 200)
         self.assertFalse(t4 in resp.context['tests'])
@@ -202,7 +216,7 @@ class ShowAllTestsListVIewTestCase(TestCase):
         resp = self.client.get(reverse('tests:tests'), {'search': 'cat'})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(12, len(resp.context['tests']))
-        resp2 = self.client.get(reverse('tests:tests'), {'page': '2', 'search': 'cat'})
+        resp2 = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor, 'search': 'cat'})
         self.assertEqual(resp2.status_code, 200)
         # 15 - 1 (private) - 1 (without questions) - 12 (in 1 page) = 1
         self.assertEqual(1, len(resp2.context['tests']))
@@ -211,7 +225,7 @@ class ShowAllTestsListVIewTestCase(TestCase):
         resp = self.client.get(reverse('tests:tests'), {'search': 'category'})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(12, len(resp.context['tests']))
-        resp2 = self.client.get(reverse('tests:tests'), {'page': '2', 'search': 'category'})
+        resp2 = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor, 'search': 'category'})
         self.assertEqual(resp2.status_code, 200)
         # 15 - 1 (private) - 1 (without questions) - 12 (in 1 page) = 1
         self.assertEqual(1, len(resp2.context['tests']))
@@ -220,7 +234,7 @@ class ShowAllTestsListVIewTestCase(TestCase):
         resp = self.client.get(reverse('tests:tests'), {'search': 'user0'})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(12, len(resp.context['tests']))
-        resp2 = self.client.get(reverse('tests:tests'), {'page': '2', 'search': 'user0'})
+        resp2 = self.client.get(reverse('tests:tests'), {'cursor': resp.context['page_obj'].next_cursor, 'search': 'user0'})
         self.assertEqual(resp2.status_code, 200)
         # 15 - 1 (private) - 1 (without questions) - 12 (in 1 page) = 1
         self.assertEqual(1, len(resp2.context['tests']))
@@ -299,7 +313,8 @@ class ShowMyTestsListVIewTestCase(TestCase):
 
     def test_three_tests_in_second_page_of_pagination(self):
         self.client.login(username='user1', password='testpassword1!')
-        resp = self.client.get(reverse('tests:my_tests') + '?page=2')
+        resp = self.client.get(reverse('tests:my_tests'))
+        resp = self.client.get(reverse('tests:my_tests'), {'cursor': resp.context['page_obj'].next_cursor})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(3, len(resp.context['tests']))
 
@@ -701,6 +716,8 @@ class TestPassTestTestCase(TestCase):
                     test=t)
 
     def setUp(self):
+        # answer keys are cached, and the cache outlives rolled back test data
+        cache.clear()
         self.u1 = CustomUser.objects.get(username='user1')
         self.u2 = CustomUser.objects.create_user(
             username='user2',
@@ -745,43 +762,136 @@ class TestPassTestTestCase(TestCase):
         self.assertEqual(resp.status_code, 302)
         self.assertRedirects(resp, '/')
 
+    def result_url(self, test, data):
+        attempt = read_attempt(load_answer_key(test.pk), data['attempt'])
+        return reverse('tests:test_result', kwargs={'pk': test.pk, 'attempt': uuid.UUID(attempt.id)})
+
     def test_pass_test_redirects_to_results(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'why0': 'correct_answer', 'why1': 'wrong_answer1', 'timer': '123'}
+        data = submission(self.t1.pk, ['correct_answer', 'wrong_answer1'], started=time.time() - 123)
         resp = self.client.post(self.t1_url, data=data)
-        self.assertTemplateUsed(resp, 'main_app/result.html')
+        self.assertRedirects(resp, self.result_url(self.t1, data))
+        self.assertTemplateUsed(self.client.get(resp.url), 'main_app/result.html')
 
     def test_correct_answers_increase_score_and_time_is_saved_correctly(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'why0': 'correct_answer', 'why1': 'correct_answer', 'timer': '1'}
-        resp = self.client.post(self.t1_url, data=data)
-        for i in resp.context[0]:
-            if 'result' in i:
-                self.assertEqual(2, i['result'])
-            if 'time' in i:
-                self.assertEqual('1', i['time'])
-        data = {'why0': 'correct_answer', 'why1': 'wrong_answer', 'timer': '12'}
-        resp = self.client.post(self.t1_url, data=data)
-        for i in resp.context[0]:
-            if 'result' in i:
-                self.assertEqual(1, i['result'])
-            if 'time' in i:
-                self.assertEqual('12', i['time'])
-        data = {'why0': 'wrong_answer', 'why1': 'wrong_answer', 'timer': '123'}
-        resp = self.client.post(self.t1_url, data=data)
-        for i in resp.context[0]:
-            if 'result' in i:
-                self.assertEqual(0, i['result'])
-            if 'time' in i:
-                self.assertEqual('123', i['time'])
+        for answers, duration, result in ((['correct_answer', 'correct_answer'], 0, 2),
+                                          (['correct_answer', 'wrong_answer1'], 12, 1),
+                                          (['wrong_answer1', 'wrong_answer1'], 123, 0)):
+            data = submission(self.t1.pk, answers, started=time.time() - duration)
+            resp = self.client.post(self.t1_url, data=data, follow=True)
+            self.assertEqual(result, resp.context['result'])
+            self.assertEqual(duration, resp.context['time'])
 
     def test_context_is_reduced_if_not_show_results(self):
         self.client.login(username='user1', password='testpassword1!')
-        data = {'why0': 'correct_answer', 'why1': 'correct_answer', 'timer': '1'}
-        resp = self.client.post(self.t4_url, data=data)
+        data = submission(self.t4.pk, ['correct_answer', 'correct_answer'])
+        resp = self.client.post(self.t4_url, data=data, follow=True)
+        self.assertEqual(2, resp.context['result'])
         self.assertEqual(None, resp.context.get('ans', None))
         self.assertEqual(None, resp.context.get('questions', None))
 
+    def test_rendered_options_are_submitted_by_index(self):
+        resp = self.client.get(self.t1_url)
+        data = {'attempt': resp.context['attempt']}
+        for q in resp.context['questions']:
+            data[q.field] = next(index for _, index, option in q.options if option == 'correct_answer')
+        self.assertContains(resp, f'name="{resp.context["questions"][0].field}"')
+        resp = self.client.post(self.t1_url, data=data, follow=True)
+        self.assertEqual(2, resp.context['result'])
+
+    def test_resubmitted_attempt_is_saved_once(self):
+        self.client.force_login(user=self.u2)
+        data = submission(self.t1.pk, ['correct_answer', 'wrong_answer1'])
+        first = self.client.post(self.t1_url, data=data)
+        changed = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        changed['attempt'] = data['attempt']
+        self.assertEqual(first.url, self.client.post(self.t1_url, data=changed).url)
+        self.assertEqual(1, PassedTests.objects.filter(user=self.u2, test=self.t1).count())
+        self.assertEqual(1, self.client.get(first.url).context['result'])
+
+    def test_result_is_shown_again_without_rescoring(self):
+        self.client.force_login(user=self.u2)
+        data = submission(self.t1.pk, ['correct_answer', 'wrong_answer1'])
+        url = self.client.post(self.t1_url, data=data).url
+        cache.clear()
+        # the answer key, the result by its attempt, the session and the user
+        with self.assertNumQueries(4):
+            resp = self.client.get(url)
+        self.assertEqual(1, resp.context['result'])
+        self.assertEqual([('correct_answer', True), ('wrong_answer1', False)],
+                         [(answer, ok) for _, answer, ok in resp.context['questions']])
+
+    def test_results_of_users_are_shown_only_to_them(self):
+        self.client.force_login(user=self.u2)
+        url = self.client.post(self.t1_url, data=submission(self.t1.pk, ['correct_answer', None])).url
+        self.client.force_login(user=self.u1)
+        self.assertEqual(404, self.client.get(url).status_code)
+        self.client.logout()
+        self.assertEqual(404, self.client.get(url).status_code)
+        other_test = url.replace(f'/tests/{self.t1.pk}/', f'/tests/{self.t2.pk}/')
+        self.client.force_login(user=self.u2)
+        self.assertEqual(404, self.client.get(other_test).status_code)
+
+    def test_anonymous_result_is_saved_and_shown(self):
+        resp = self.client.post(self.t1_url, data=submission(self.t1.pk, ['correct_answer', None]), follow=True)
+        self.assertEqual(1, resp.context['result'])
+        result = PassedTests.objects.get()
+        self.assertIsNone(result.user)
+        # served by any worker, the cache isn't needed
+        cache.clear()
+        resp = self.client.get(reverse('tests:test_result', kwargs={'pk': self.t1.pk, 'attempt': result.submission_id}))
+        self.assertEqual(1, resp.context['result'])
+
+    def test_forged_attempt_redirects_back_to_the_test(self):
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        data['attempt'] += 'x'
+        resp = self.client.post(self.t1_url, data=data)
+        self.assertRedirects(resp, self.t1_url)
+        self.assertFalse(PassedTests.objects.exists())
+
+    def test_attempt_of_changed_test_is_rejected(self):
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        Questions.objects.create(question='why2', correct_answer='correct_answer', answer_1='wrong_answer1',
+                                 test=self.t1)
+        resp = self.client.post(self.t1_url, data=data)
+        self.assertRedirects(resp, self.t1_url)
+
+    def test_expired_attempt_is_rejected(self):
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'])
+        with mock.patch('time.time', return_value=time.time() + 2 * 24 * 60 * 60):
+            resp = self.client.post(self.t1_url, data=data)
+        self.assertRedirects(resp, self.t1_url)
+
+    def test_duration_is_measured_by_the_server(self):
+        self.client.force_login(user=self.u2)
+        data = submission(self.t1.pk, ['correct_answer', 'correct_answer'], started=time.time() - 42, timer='1')
+        self.client.post(self.t1_url, data=data)
+        self.assertEqual(42, PassedTests.objects.get(user=self.u2).duration)
+
+    def test_questions_are_rendered_once_per_seed(self):
+        with mock.patch('main_app.scoring.secrets.randbelow', return_value=3):
+            first = self.client.get(self.t1_url)
+            with mock.patch('main_app.views.shuffle_questions', return_value=[]):
+                self.assertEqual(first.content.count(b'type="radio"'),
+                                 self.client.get(self.t1_url).content.count(b'type="radio"'))
+            Questions.objects.create(question='why2', correct_answer='correct_answer', answer_1='wrong_answer1',
+                                     test=self.t1)
+            self.assertContains(self.client.get(self.t1_url), 'type="radio"', count=10)
+
+    @cached_sessions()
+    def test_submission_makes_fixed_number_of_queries(self):
+        self.client.force_login(user=self.u2)
+        # answer key is cached and statistics rows are created by the first submission
+        self.client.post(self.t1_url, data=submission(self.t1.pk, ['correct_answer', 'wrong_answer1']))
+        data = submission(self.t1.pk, ['correct_answer', 'wrong_answer1'])
+        # user (the session is cached), savepoint, insert of the result, select for update and update
+        # of test statistics, update of questions statistics, release savepoint
+        with self.assertNumQueries(7):
+            resp = self.client.post(self.t1_url, data=data)
+        self.assertEqual(302, resp.status_code)
+        self.assertEqual(2, PassedTests.objects.filter(user=self.u2, test=self.t1).count())
+
 
 class PassedTestViewTestCase(TestCase):
 
@@ -832,7 +942,8 @@ class PassedTestViewTestCase(TestCase):
         self.assertEqual(20, len(resp.context['passed_tests']))
 
     def test_one_test_in_second_page_of_pagination(self):
-        resp = self.client.get(reverse('tests:passed_tests') + '?page=2')
+        resp = self.client.get(reverse('tests:passed_tests'))
+        resp = self.client.get(reverse('tests:passed_tests'), {'cursor': resp.context['page_obj'].next_cursor})
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(1, len(resp.context['passed_tests']))
 
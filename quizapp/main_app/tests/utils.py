@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from main_app import search, stats
+from main_app.scoring import load_answer_key, shuffle_questions, sign_attempt, start_attempt
+from main_app.models import Categories, Test, Questions, PassedTests
+from users.models import CustomUser
+
+
+def cached_sessions():
+    """Sessions read from the cache as in the prod profile, so the query counts are the ones of production."""
+    return override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+
+
+def seed_catalog(tests=50, questions=30, passed=50):
+    """
+    Realistic amount of data for the query count tests: owner's public tests with questions,
+    a private test, results and statistics of the first test. Signals are bypassed by bulk_create,
+    so the denormalized counters and the search index are refreshed at the end.
+    """
+    owner = CustomUser.objects.create_user(username='owner', email='owner@test.com', password='testpassword1!',
+                                           email_confirmed=True)
+    user = CustomUser.objects.create_user(username='user', email='user@test.com', password='testpassword1!',
+                                          email_confirmed=True)
+    category = Categories.objects.create(name='category')
+    created = Test.objects.bulk_create([
+        Test(name=f'test{i}', description='description', owner=owner, category=category, is_public=i > 0)
+        for i in range(tests)
+    ])
+    Questions.objects.bulk_create([
+        Questions(question=f'question{j}', correct_answer='yes', answer_1='no', answer_2='maybe', test=t)
+        for t in created for j in range(questions)
+    ])
+    Test.objects.all().refresh_question_stats()
+    search.rebuild_index()
+    PassedTests.objects.bulk_create([
+        PassedTests(test=created[i % tests], user=u, grade=50, score=questions // 2, max_score=questions)
+        for u in (owner, user) for i in range(passed)
+    ])
+    question_ids = list(Questions.objects.filter(test=created[1]).values_list('pk', flat=True))
+    stats.record_results(created[1].pk, [(50, question_ids, question_ids[::2])] * 3)
+    return owner, user, Test.objects.get(pk=created[1].pk)
+
+
+def submission(test_pk, answers, started=None, **extra):
+    """
+    Data of a pass test submission choosing the options with the given texts, questions in the pk order.
+    Questions are left unanswered by texts which aren't their options (or None).
+    started is the timestamp of the start of the attempt, now by default.
+    """
+    key = load_answer_key(test_pk)
+    attempt = start_attempt(key)
+    if started is not None:
+        attempt = attempt._replace(started=started)
+    data = {'attempt': sign_attempt(key, attempt), **extra}
+    for q, answer in zip(shuffle_questions(key, attempt.seed), answers):
+        indexes = [index for _, index, option in q.options if option == answer]
+        if indexes:
+            data[q.field] = indexes[0]
+    return data
+
+
+def get_streamed(client, url, data=None, **extra):
+    """Get a streaming response and read all of it, so the queries made while streaming are made too."""
+    resp = client.get(url, data, **extra)
+    return resp, b''.join(resp.streaming_content)
+
+
+class QueryCountMixin:
+    def assertMaxQueries(self, limit, func, *args, **kwargs):
+        """Call func and check it made no more than limit queries, returns the result of func."""
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        executed = len(context.captured_queries)
+        self.assertLessEqual(executed, limit, '%d queries executed, %d expected\nCaptured queries were:\n%s' % (
+            executed, limit, '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(context.captured_queries, 1))))
+        return result
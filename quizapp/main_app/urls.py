@@ -12,9 +12,12 @@ urlpatterns = [
     path('tests/<int:pk>/', TestDetailView.as_view(), name='test_detail'),
     path('tests/<int:pk>/edit/', UpdateTestView.as_view(), name='test_edit'),
     path('tests/<int:pk>/questions/', TestQuestionsEditView.as_view(), name='test_questions_edit'),
+    path('tests/<int:pk>/questions/import/', TestQuestionsImportView.as_view(), name='test_questions_import'),
+    path('tests/<int:pk>/questions/export/', TestQuestionsExportView.as_view(), name='test_questions_export'),
 
     path('tests/add/', AddTestView.as_view(), name='add'),
 
     path('tests/<int:pk>/pass/', pass_test, name='pass_test'),
+    path('tests/<int:pk>/results/<uuid:attempt>/', test_result, name='test_result'),
     path('tests/passed_tests/', PassedTestView.as_view(), name='passed_tests'),
 ]
@@ -1,21 +1,25 @@
+from . import search
 from .forms import *
+from .mail import enqueue_email
 from .models import *
+from .page_cache import AnonymousPageCacheMixin, TEST_CARD_CACHE_TIMEOUT
+from .pagination import KeysetPaginationMixin
+from .questions_bulk import FORMATS, export_response, import_questions
+from .scoring import get_answer_key, access_error, shuffle_questions, start_attempt, sign_attempt, read_attempt, \
+    read_choices, submit_attempt, load_result, result_questions, InvalidSubmission, ANSWER_KEY_CACHE_TIMEOUT
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.mail import EmailMessage
-from django.db.models import Q, Prefetch
-from django.http import HttpResponseRedirect
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils.safestring import mark_safe
-from django.views.generic import CreateView, ListView, TemplateView, DetailView, FormView, UpdateView
+from django.views.generic import CreateView, ListView, TemplateView, DetailView, FormView, UpdateView, View
 from django.views.generic.detail import SingleObjectMixin
-from random import shuffle
 from quizapp.local_settings import EMAIL_FROM
-from users.models import CustomUser
 
 
-class HomeView(TemplateView):
+class HomeView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'main_app/home.html'
 
 
@@ -33,24 +37,17 @@ class ContactsView(FormView):
             email = form.cleaned_data['email']
         mail_subject = f'A Message from Quizapp Contact Us Form'
         message = f"Sender's name: {name}, sender's email: {email}\nMessage:\n{form.cleaned_data['message']}"
-        email = EmailMessage(mail_subject, message, to=[EMAIL_FROM])
-        if email.send():
-            messages.add_message(
-                self.request,
-                messages.SUCCESS,
-                'Your message was successfully sent. Thank you!'
-            )
-        else:
-            messages.add_message(
-                self.request,
-                messages.ERROR,
-                "Message wasn't sent :("
-            )
-
+        enqueue_email(mail_subject, message, to=[EMAIL_FROM])
+        messages.add_message(
+            self.request,
+            messages.SUCCESS,
+            'Your message was successfully sent. Thank you!'
+        )
         return redirect('tests:home')
 
 
-class ShowAllTestsListVIew(ListView):
+class ShowAllTestsListVIew(AnonymousPageCacheMixin, KeysetPaginationMixin, ListView):
+    page_cache_catalog = True
     model = Test
     template_name = 'main_app/show_tests_list.html'
     context_object_name = 'tests'
@@ -68,32 +65,25 @@ class ShowAllTestsListVIew(ListView):
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
-        questions = {}
-        for t in context['object_list']:
-            questions[t.pk] = Questions.objects.filter(test=t.pk).count()
-        context['questions'] = questions
         context['ordering'] = self.get_ordering()
         if context['ordering'] == 'None' or not context['ordering']:
             context['title_ordering'] = 'Updated last'
         else:
             context['title_ordering'] = self.ordering_title[context['ordering']]
         context['search'] = self.request.GET.get('search', '')
+        context['test_card_cache_timeout'] = TEST_CARD_CACHE_TIMEOUT
         return context
 
     def get_queryset(self):
         search_query = self.request.GET.get('search', '')
-        # take all tests, that have questions, then take zero index, because previous one returns in a tuple
-        tests_with_questions = [b[0] for b in [q for q in Questions.objects.values_list('test').distinct()]]
+        q = Test.objects.with_questions().filter(is_public=True).select_related('category', 'owner')
         if search_query:
-            q = Test.objects.filter(
-                Q(name__icontains=search_query) | Q(description__icontains=search_query) |
-                Q(category__name__icontains=search_query) | Q(owner__username__icontains=search_query),
-                pk__in=tests_with_questions, is_public=True).select_related('category', 'owner')
-        else:
-            q = Test.objects.filter(pk__in=tests_with_questions, is_public=True).select_related('category', 'owner')
+            q = search.search(q, search_query)
         ordering = self.get_ordering()
         if ordering == 'None' or not ordering:
-            q = q.order_by('-time_update')
+            # search results are ordered by relevance
+            if not search_query:
+                q = q.order_by('-time_update')
         else:
             q = q.order_by(ordering)
         return q
@@ -103,7 +93,7 @@ class ShowAllTestsListVIew(ListView):
         return ordering
 
 
-class ShowMyTestsListVIew(LoginRequiredMixin, ListView):
+class ShowMyTestsListVIew(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Test
     template_name = 'main_app/show_my_tests_list.html'
     context_object_name = 'tests'
@@ -128,10 +118,6 @@ class ShowMyTestsListVIew(LoginRequiredMixin, ListView):
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
-        questions = {}
-        for t in context['object_list']:
-            questions[t.pk] = Questions.objects.filter(test=t.pk).count()
-        context['questions'] = questions
         context['ordering'] = self.get_ordering()
         if context['ordering'] == 'None' or not context['ordering']:
             context['title_ordering'] = 'Updated last'
@@ -217,6 +203,12 @@ class TestDetailView(LoginRequiredMixin, DetailView):
         context = self.get_context_data(object=self.object)
         return self.render_to_response(context)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['stats'] = TestStats.objects.filter(test=self.object).first()
+        context['questions'] = self.object.question_test.select_related('stats')
+        return context
+
 
 class TestQuestionsEditView(LoginRequiredMixin, SingleObjectMixin, FormView):
     model = Questions
@@ -267,92 +259,115 @@ class TestQuestionsEditView(LoginRequiredMixin, SingleObjectMixin, FormView):
         return reverse('tests:test_detail', kwargs={'pk': self.object.pk})
 
 
+class TestOwnerRequiredMixin(SingleObjectMixin):
+    """Let only the owner of the test in, for every method."""
+    model = Test
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        self.object = self.get_object()
+        if self.object.owner_id != request.user.pk:
+            messages.add_message(
+                self.request,
+                messages.ERROR,
+                'You are not owner of the test.'
+            )
+            return redirect('tests:home')
+        return super().dispatch(request, *args, **kwargs)
+
+
+class TestQuestionsImportView(LoginRequiredMixin, TestOwnerRequiredMixin, FormView):
+    form_class = QuestionsImportForm
+    template_name = 'main_app/test_questions_import.html'
+    context_object_name = 'test'
+
+    def form_valid(self, form):
+        result = import_questions(self.object, form.cleaned_data['file'], form.cleaned_data['format'],
+                                  form.cleaned_data['replace'])
+        if result.errors:
+            for line, error in result.errors:
+                form.add_error('file', f'Line {line}: {error}')
+            return self.form_invalid(form)
+        messages.add_message(
+            self.request,
+            messages.SUCCESS,
+            f'{result.created} questions were imported.'
+        )
+        return redirect('tests:test_questions_edit', pk=self.object.pk)
+
+
+class TestQuestionsExportView(LoginRequiredMixin, TestOwnerRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in FORMATS:
+            raise Http404
+        return export_response(self.object, fmt)
+
+
+def pass_test_context(key):
+    """Context of pass_test.html, a new attempt with options of every question shuffled by its seed."""
+    attempt = start_attempt(key)
+    return {'name': key.name, 'test_id': key.test_id, 'seed': attempt.seed,
+            'questions': shuffle_questions(key, attempt.seed), 'attempt': sign_attempt(key, attempt),
+            'questions_cache_timeout': ANSWER_KEY_CACHE_TIMEOUT, 'show_results': key.show_results,
+            'description': key.description}
+
+
+def result_context(key, saved):
+    """Context of result.html, saved is a scoring.SavedResult."""
+    context = {
+        'grade': saved.grade,
+        'result': saved.score,
+        'max_result': saved.max_score,
+        'time': saved.duration,
+        'correct': saved.correct,
+        'total': saved.total,
+        'show_results': key.show_results
+    }
+    if key.show_results:
+        context['questions'] = result_questions(key, saved)
+    return context
+
+
 def pass_test(request, pk=None):
-    try:
-        test = Test.objects.get(pk=pk)
-    except Test.DoesNotExist:
-        test = None
-    questions = Questions.objects.filter(test=pk)
-
-    # before "or" - when test is private but you want to test passing (as user or admin)
-    if not (questions and test) or ((not test.access_by_link and not test.is_public) and (
-            request.user != test.owner and not request.user.is_staff)):
-        msg = 'You cannot pass the test.'
-        if not test:
-            msg += ' Test does not exist.'
-        else:
-            if not questions:
-                msg += ' Test have no questions.'
-            elif not test.access_by_link and not test.is_public:
-                msg += ' Test is not accessible.'
+    key = get_answer_key(pk)
+    error = access_error(key, request.user)
+    if error:
         messages.add_message(
             request,
             messages.ERROR,
-            msg
+            error
         )
         return redirect('tests:home')
 
     # for result
     if request.method == 'POST':
-        correct, total_questions = 0, len(questions)
-        result, max_result = 0, 0
-        ans = []
-        for q in questions:
-            ans.append(request.POST.get(q.question))
-            max_result += q.value
-            if q.correct_answer == request.POST.get(q.question):
-                correct += 1
-                result += q.value
         try:
-            PassedTests.objects.create(test=Test.objects.get(pk=pk), user=CustomUser.objects.get(pk=request.user.pk),
-                                       grade=round(result / max_result * 100, 2), score=int(result),
-                                       max_score=int(max_result))
-        except Exception as e:
-            pass
-            print(f'adding PassedTest to BD error: {e}')
-        show_results = Test.objects.get(id=pk).show_results
-        if show_results:
-            context = {
-                'grade': round(result / max_result * 100, 2),
-                'result': result,
-                'max_result': max_result,
-                'time': request.POST.get('timer'),
-                'correct': correct,
-                'total': total_questions,
-                'ans': ans,
-                'questions': questions,
-                'show_results': show_results
-            }
-        else:
-            context = {
-                'grade': round(result / max_result * 100, 2),
-                'result': result,
-                'max_result': max_result,
-                'time': request.POST.get('timer'),
-                'correct': correct,
-                'total': total_questions,
-                'show_results': show_results
-            }
-        return render(request, 'main_app/result.html', context)
+            attempt = read_attempt(key, request.POST.get('attempt'))
+        except InvalidSubmission as e:
+            messages.add_message(request, messages.ERROR, str(e))
+            return redirect('tests:pass_test', pk=pk)
+        saved = submit_attempt(key, request.user, attempt, read_choices(key, request.POST, attempt))
+        # a refresh of the result page doesn't submit the answers again
+        return redirect('tests:test_result', pk=pk, attempt=saved.attempt_id)
 
     # for test
-    answers = {}
-    len_a = []
-    for q in questions:
-        a = []
-        for i in [q.correct_answer, q.answer_1, q.answer_2, q.answer_3]:
-            if i:
-                a.append(i)
-        shuffle(a)
-        len_a.append(len(a))
-        answers[q.question] = a
-
-    context = {'questions': questions, 'answers': answers, 'len_a': len_a,
-               'show_results': Test.objects.get(id=pk).show_results, 'description': Test.objects.get(id=pk).description}
-    return render(request, 'main_app/pass_test.html', context)
-
-
-class PassedTestView(LoginRequiredMixin, ListView):
+    return render(request, 'main_app/pass_test.html', pass_test_context(key))
+
+
+def test_result(request, pk, attempt):
+    """Result of a submitted attempt, results of users are shown only to them."""
+    key = get_answer_key(pk)
+    saved = load_result(attempt)
+    if key is None or saved is None or saved.test_id != key.test_id:
+        raise Http404
+    if saved.user_id is not None and saved.user_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return render(request, 'main_app/result.html', result_context(key, saved))
+
+
+class PassedTestView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = PassedTests
     template_name = 'main_app/passed_tests.html'
     context_object_name = 'passed_tests'
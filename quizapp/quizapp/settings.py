@@ -37,7 +37,6 @@ INSTALLED_APPS = [
     'django_filters',
 
     'captcha',
-    'debug_toolbar',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -50,6 +49,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'main_app.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,7 +57,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 ROOT_URLCONF = 'quizapp.urls'
@@ -93,6 +92,27 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# answer keys, users of API tokens, pages and cards of the catalog are dropped from the cache when they change,
+# so with several workers the cache must be shared by them (redis, memcached), see main_app.checks.
+# The prod profile uses redis unless another shared cache is set here or in local_settings.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# the prod profile reads sessions from its shared cache and writes them through to the database ("cached_db"),
+# so logged in page views don't query django_session. A cache of every process would keep serving sessions
+# flushed by a logout on another worker, so sessions are only read from the database here, see main_app.checks
+# and "manage.py benchmark_sessions".
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# messages are short, so they always fit into a cookie and never load or save the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -151,11 +171,45 @@ AUTH_USER_MODEL = 'users.CustomUser'
 #
 PASSWORD_RESET_TIMEOUT = 14400
 
+# emails are put into main_app.models.OutgoingEmail and sent by "manage.py send_queued_emails --loop"
+EMAIL_OUTBOX_EAGER = False
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# seconds before the first retry, doubled after every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = 60
+# seconds other workers leave emails being sent alone, they are sent again if the worker dies meanwhile
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 10 * 60
+
 LOGIN_REDIRECT_URL = '/users/login/'
 LOGIN_URL = '/users/login/'
 
 CAPTCHA_LENGTH = 6
 
+# seconds to keep compiled answer keys of tests in the cache, see main_app.scoring
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+
+# compile all templates when a worker starts (quizapp/wsgi.py) instead of on the first requests
+TEMPLATE_WARMUP = False
+
+# seconds to cache pages rendered for anonymous visitors and cards of the catalog, see main_app.page_cache
+PAGE_CACHE_TIMEOUT = 10 * 60
+TEST_CARD_CACHE_TIMEOUT = 60 * 60
+
+# file to buffer passed tests in, they are saved by "manage.py flush_results --loop"
+# e.g. RESULTS_BUFFER = BASE_DIR / 'results_buffer.jsonl', None saves every result at once
+RESULTS_BUFFER = None
+
+# per process request metrics, see main_app.metrics, served to staff by /api/v1/metrics/
+METRICS_BUFFER_SIZE = 1000
+# requests taking longer (seconds) are logged to "main_app.metrics" with their slowest queries, None to disable
+METRICS_SLOW_REQUEST = 1.0
+METRICS_SLOW_TOP_QUERIES = 5
+
+# seconds to cache users of API tokens, see api.authentication, None disables
+TOKEN_AUTH_CACHE_TIMEOUT = 5 * 60
+# the in-process copy of other workers isn't invalidated, so it is kept for a short time only
+TOKEN_AUTH_LOCAL_TIMEOUT = 30
+TOKEN_AUTH_LOCAL_SIZE = 1024
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -165,14 +219,41 @@ REST_FRAMEWORK = {
 
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
 
-if 'test' in sys.argv:
+# "dev", "test" or "prod", taken from the QUIZAPP_PROFILE environment variable,
+# by default "test" when running tests, "dev" when DEBUG is on and "prod" otherwise
+PROFILE = os.environ.get('QUIZAPP_PROFILE') or ('test' if 'test' in sys.argv else 'dev' if DEBUG else 'prod')
+
+if PROFILE == 'dev':
+    # the toolbar and the browsable API are heavy to import and to run, so they are never loaded in production
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+elif PROFILE == 'prod':
+    # templates are compiled once per worker and never checked for changes
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+    TEMPLATE_WARMUP = True
+    if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': os.environ.get('QUIZAPP_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+            }
+        }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+elif PROFILE == 'test':
     CAPTCHA_TEST_MODE = True
+    EMAIL_OUTBOX_EAGER = True
@@ -1,4 +1,4 @@
-import quizapp.settings
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
 
@@ -15,5 +15,5 @@ urlpatterns = [
     path('captcha/', include('captcha.urls')),
 ]
 
-if quizapp.local_settings.DEBUG:
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     urlpatterns = [path('__debug__/', include('debug_toolbar.urls'))] + urlpatterns
@@ -1,8 +1,10 @@
 from .models import CustomUser
 from django import forms
+from django.template.loader import render_to_string
 from django.contrib.auth import password_validation
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm, AuthenticationForm, PasswordResetForm, \
     SetPasswordForm
+from main_app.mail import enqueue_email
 
 
 class RegisterUserForm(UserCreationForm):
@@ -52,6 +54,12 @@ class PasswordResetFormCustom(PasswordResetForm):
         widget=forms.EmailInput(attrs={"autocomplete": "email", 'class': 'form-control'}),
     )
 
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(render_to_string(subject_template_name, context).splitlines())
+        body = render_to_string(email_template_name, context)
+        enqueue_email(subject, body, to=[to_email], from_email=from_email)
+
 
 class SetPasswordFormCustom(SetPasswordForm):
     new_password1 = forms.CharField(
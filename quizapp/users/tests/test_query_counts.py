@@ -0,0 +1,44 @@
+from django.contrib.auth.tokens import default_token_generator
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from main_app.tests.utils import QueryCountMixin, seed_catalog
+from users.tokens import account_activation_token
+
+
+class UsersQueryCountTestCase(QueryCountMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.user, cls.test = seed_catalog()
+        cls.uid = urlsafe_base64_encode(force_bytes(cls.owner.pk))
+
+    def check(self, cases):
+        for limit, method, url, data in cases:
+            with self.subTest(url=url, method=method, data=data):
+                resp = self.assertMaxQueries(limit, getattr(self.client, method), url, data)
+                self.assertLess(resp.status_code, 400)
+
+    def test_anonymous_pages(self):
+        self.check([
+            (0, 'get', reverse('users:sign_up'), {}),
+            (0, 'get', reverse('users:login'), {}),
+            (10, 'post', reverse('users:login'), {'username': 'owner', 'password': 'testpassword1!'}),
+            (2, 'get', reverse('users:password_reset'), {}),
+            (3, 'post', reverse('users:password_reset'), {'email': 'owner@test.com'}),
+            (2, 'get', reverse('users:password_reset_done'), {}),
+            (3, 'get', reverse('users:password_reset_confirm', kwargs={
+                'uidb64': self.uid, 'token': default_token_generator.make_token(self.owner)}), {}),
+            (5, 'get', reverse('users:activate', kwargs={
+                'uidb64': self.uid, 'token': account_activation_token.make_token(self.owner)}), {}),
+        ])
+
+    def test_user_pages(self):
+        self.client.force_login(self.owner)
+        self.check([
+            (4, 'get', reverse('users:my_profile'), {}),
+            (2, 'get', reverse('users:my_profile_update'), {}),
+            (2, 'get', reverse('users:password_change'), {}),
+            (5, 'get', reverse('users:activate_email', kwargs={'user': 'owner', 'to_email': 'owner@test.com'}), {}),
+            (4, 'get', reverse('users:logout'), {}),
+        ])
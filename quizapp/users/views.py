@@ -4,8 +4,6 @@ from django.contrib.auth import login, logout, update_session_auth_hash, get_use
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordChangeView, PasswordResetView, PasswordResetConfirmView
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
-from django.db.models import Prefetch
 from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy
@@ -13,6 +11,7 @@ from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.safestring import mark_safe
 from django.views.generic import CreateView, UpdateView, TemplateView
+from main_app.mail import enqueue_email
 from main_app.models import Test, PassedTests
 from users.forms import LoginUserForm, RegisterUserForm, UpdateUserForm, PasswordResetFormCustom, SetPasswordFormCustom
 from users.models import CustomUser
@@ -56,14 +55,10 @@ def activate_email(request, user, to_email):
         'token': account_activation_token.make_token(user),
         'protocol': 'https' if request.is_secure() else 'http',
     })
-    email = EmailMessage(mail_subject, message, to=[to_email])
-    if email.send():
-        messages.add_message(request, messages.SUCCESS,
-                             mark_safe(f'Dear <b>{user}</b>, we sent activation link to your '
-                                       f'email <b>{email}</b>, please click on it to confirm and complete registration.'))
-    else:
-        messages.add_message(request, messages.ERROR,
-                             f'Problem sending email to {to_email}, check if you type it correctly!')
+    enqueue_email(mail_subject, message, to=[to_email])
+    messages.add_message(request, messages.SUCCESS,
+                         mark_safe(f'Dear <b>{user}</b>, we sent activation link to your '
+                                   f'email <b>{to_email}</b>, please click on it to confirm and complete registration.'))
     if return_in_the_end:
         return redirect('tests:home')
 
@@ -89,9 +84,9 @@ def login_user(request):
             user = auth.authenticate(username=username, password=password)
         if user is not None:
             auth.login(request, user)
+            # set_expiry() marks the session as modified, it is saved once with the login
             if request.POST.get('remember_me') == 'False' or not request.POST.get('remember_me'):
                 request.session.set_expiry(0)
-                request.session.modified = True
             messages.add_message(request, messages.SUCCESS,
                                  f'You have successfully logged in.')
             return redirect('tests:home')
@@ -113,11 +108,10 @@ class MyProfileView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['user_data'] = CustomUser.objects.get(pk=self.request.user.pk)
+        context['user_data'] = self.request.user
         context['created_tests'] = Test.objects.filter(owner=self.request.user.pk).order_by('-time_update')[
                                    :6].select_related('category')
-        context['passed_tests'] = PassedTests.objects.prefetch_related(
-            Prefetch('test', queryset=Test.objects.all().select_related('owner'))).filter(
+        context['passed_tests'] = PassedTests.objects.select_related('test__owner').filter(
             user=self.request.user.pk).order_by('-data_passed')[:6]
         return context
 